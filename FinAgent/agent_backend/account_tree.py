@@ -0,0 +1,170 @@
+# account_tree.py
+#
+# Account hierarchy as a closure: every (ancestor, descendant) pair of
+# PARENT_ACCOUNT_MAP is computed once, in memory and in the account_closure
+# table, so "all descendants / ancestors of X" is a dict lookup or a single
+# indexed join instead of recursive SQL. account_rollup stores, per company
+# and period, the sum of the leaf facts under every parent account.
+#
+# The sum is only a total when a parent's leaves are disjoint parts of it,
+# so every refresh compares it with the parent's own reported fact and
+# prints the parents that differ by more than ROLLUP_CHECK_TOLERANCE
+# (relative to the reported value).
+
+import os
+
+from create_hierarchy_map import PARENT_ACCOUNT_MAP
+from db_pool import get_pool
+from sql_cache import bump_sql_version
+
+ROLLUP_CHECK_TOLERANCE = float(os.getenv('ROLLUP_CHECK_TOLERANCE', '0.005'))
+
+
+class AccountTree:
+    """
+    Ancestor/descendant index over a code -> parent code map.
+
+    All lookups are precomputed tuples: ancestors nearest-first, descendants
+    in depth-first order (children before grandchildren of the next child).
+    """
+
+    def __init__(self, parent_map: dict[str, str | None] = PARENT_ACCOUNT_MAP):
+        self.parent_map = dict(parent_map)
+        for code, parent in parent_map.items():
+            if parent and parent not in self.parent_map:
+                self.parent_map[parent] = None
+
+        self.children: dict[str, tuple[str, ...]] = {code: () for code in self.parent_map}
+        for code, parent in self.parent_map.items():
+            if parent:
+                self.children[parent] += (code,)
+        self.roots = tuple(c for c, p in self.parent_map.items() if not p)
+
+        self._ancestors: dict[str, tuple[str, ...]] = {}
+        for code in self.parent_map:
+            chain, parent = [], self.parent_map[code]
+            while parent:
+                if parent == code or parent in chain:
+                    raise ValueError(f"Cycle in account hierarchy at {code}")
+                chain.append(parent)
+                parent = self.parent_map[parent]
+            self._ancestors[code] = tuple(chain)
+
+        self._descendants: dict[str, tuple[str, ...]] = {}
+        for code in self.parent_map:
+            out, stack = [], list(reversed(self.children[code]))
+            while stack:
+                child = stack.pop()
+                out.append(child)
+                stack.extend(reversed(self.children[child]))
+            self._descendants[code] = tuple(out)
+
+    def ancestors(self, code: str) -> tuple[str, ...]:
+        return self._ancestors.get(code, ())
+
+    def descendants(self, code: str) -> tuple[str, ...]:
+        return self._descendants.get(code, ())
+
+    def leaves(self, code: str) -> tuple[str, ...]:
+        """Descendants without children (the account itself if it is a leaf)."""
+        if not self.children.get(code):
+            return (code,)
+        return tuple(d for d in self._descendants[code] if not self.children[d])
+
+    def depth(self, code: str) -> int:
+        return len(self.ancestors(code))
+
+    def is_leaf(self, code: str) -> bool:
+        return not self.children.get(code)
+
+    def closure_rows(self) -> list[tuple[str, str, int]]:
+        """(ancestor, descendant, distance) for every pair, including (x, x, 0)."""
+        rows = []
+        for code, ancestors in self._ancestors.items():
+            rows.append((code, code, 0))
+            rows.extend((anc, code, dist) for dist, anc in enumerate(ancestors, 1))
+        return rows
+
+
+ACCOUNT_TREE = AccountTree()
+
+
+def fill_account_closure(tree: AccountTree = ACCOUNT_TREE) -> int:
+    """Replace account_closure with the tree's pairs (by account_id); returns the row count."""
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT code, account_id FROM account;")
+        ids = dict(cur.fetchall())
+        rows = [(ids[a], ids[d], dist) for a, d, dist in tree.closure_rows() if a in ids and d in ids]
+        cur.execute("TRUNCATE account_closure;")
+        cur.executemany(
+            "INSERT INTO account_closure (ancestor_id, descendant_id, depth) VALUES (%s, %s, %s);",
+            rows
+        )
+        bump_sql_version(cur)
+    print(f"Filled account_closure with {len(rows)} pairs.")
+    return len(rows)
+
+
+def refresh_account_rollups(company_ids: list[int] | None = None) -> int:
+    """
+    Recompute account_rollup for `company_ids` (default: all): for every
+    parent account, company and period, the sum of the facts of its leaf
+    descendants. Returns the number of rollup rows written.
+
+    Rollups that disagree with the parent's reported fact are reported by
+    check_account_rollups.
+    """
+    scope = "" if company_ids is None else "WHERE company_id = ANY(%(ids)s)"
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(f"DELETE FROM account_rollup {scope};", {'ids': company_ids})
+        cur.execute(
+            f"""
+            INSERT INTO account_rollup (company_id, account_id, period_id, value, leaf_count)
+            SELECT f.company_id, c.ancestor_id, f.period_id, SUM(f.value), COUNT(*)
+            FROM (SELECT * FROM financial_fact {scope}) f
+            JOIN account_closure c ON c.descendant_id = f.account_id AND c.depth > 0
+            WHERE NOT EXISTS (
+              SELECT 1 FROM account_closure k WHERE k.ancestor_id = f.account_id AND k.depth > 0
+            )
+            GROUP BY f.company_id, c.ancestor_id, f.period_id;
+            """,
+            {'ids': company_ids}
+        )
+        n = cur.rowcount
+        check_account_rollups(cur, company_ids)
+        bump_sql_version(cur)
+    which = 'all companies' if company_ids is None else f"{len(company_ids)} companies"
+    print(f"Refreshed account rollups for {which}: {n} rows.")
+    return n
+
+
+def check_account_rollups(cur, company_ids: list[int] | None = None,
+                          tolerance: float = ROLLUP_CHECK_TOLERANCE) -> dict[str, int]:
+    """
+    Compare account_rollup with the reported fact of the same parent account,
+    company and period; prints and returns the number of mismatches per parent
+    code. A parent that always mismatches usually has overlapping leaves
+    (a subtotal and its own components under the same parent).
+    """
+    scope = "" if company_ids is None else "AND r.company_id = ANY(%(ids)s)"
+    cur.execute(
+        f"""
+        SELECT a.code, COUNT(*) FILTER (
+                 WHERE ABS(r.value - f.value) > %(tol)s * GREATEST(ABS(f.value), 1)),
+               COUNT(*)
+        FROM account_rollup r
+        JOIN financial_fact f
+          ON f.company_id = r.company_id AND f.account_id = r.account_id AND f.period_id = r.period_id
+        JOIN account a ON a.account_id = r.account_id
+        WHERE TRUE {scope}
+        GROUP BY a.code
+        ORDER BY a.code;
+        """,
+        {'ids': company_ids, 'tol': tolerance}
+    )
+    mismatches = {code: bad for code, bad, _ in cur.fetchall() if bad}
+    if mismatches:
+        worst = ', '.join(f"{code} ({bad})" for code, bad in
+                          sorted(mismatches.items(), key=lambda kv: -kv[1])[:10])
+        print(f"Rollup differs from the reported value for {len(mismatches)} parent accounts: {worst}")
+    return mismatches
@@ -1,138 +1,143 @@
+import asyncio
+import json
 import os
-import psycopg2
+from contextlib import aclosing
 from psycopg2.extras import execute_values, RealDictCursor
 import openai
 from dotenv import load_dotenv
-import numpy as np
-from openai import OpenAI
-from read_and_fill_facts import read_and_fill_facts, insert_total_liabilities
-from create_hierarchy_map import update_parent_accounts
+from openai import OpenAI, AsyncOpenAI
 from agents import Agent, Runner, gen_trace_id, trace, function_tool, ModelSettings
 from data import SAMPLE_ACCOUNTS, SAMPLE_COMPANIES
+from embedding_service import EMBEDDING_MODEL, get_embedding_service, get_query_embedding_cache
+from embedding_store import EmbeddingStore, open_embedding_store, write_embedding_store
+from vector_index import AccountVectorIndex, VectorIndex, load_index, use_memory_index
+from hybrid_search import (
+    HYBRID_CANDIDATES, HYBRID_SEARCH, LexicalIndex, exact_hits, invert_translations, parse_aliases
+)
+from db_pool import DB_HNSW_EF_SEARCH, get_pool
+from async_db import get_async_pool, ensure_vector_codec
+from search_statements import ACCOUNT_SEARCH_WITH_CHILDREN, COMPANY_SEARCH, execute_prepared
+from pgvector_codec import Vector, as_float32
+from sql_guard import run_guarded_query
+from sql_cache import get_sql_cache
+from bulk_loader import copy_upsert_rows
+from fact_views import describe_fact_views
+from account_tree import ACCOUNT_TREE
+from derived_metrics import describe_derived_metrics
+from fact_cube import get_fact_cube
+from read_and_fill_facts import ACCOUNT_TRANSLATIONS
+from chat_stream import run_events
+from session_store import get_session_store
 # Load environment variables
 load_dotenv()
 
-# Database connection parameters
-DB_PARAMS = {
-    'dbname': 'database_trial',
-    'user': 'postgres',
-    'password': 'postgres',
-    'host': 'postgres',
-    'port': '5432'
-}
-
 # Initialize OpenAI client
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
 # Data directory
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# In-memory vector indexes, loaded in initialize_agent (None = use pgvector)
+account_index: AccountVectorIndex | None = None
+company_index: VectorIndex | None = None
+# Exact/alias + trigram layers over the same rows (None = vector search only)
+account_lexicon: LexicalIndex | None = None
+company_lexicon: LexicalIndex | None = None
+
 # --- EMBEDDING UTILS ---
+def _fetch_embedding(text: str) -> list[float]:
+    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    return resp.data[0].embedding
+
 def get_embedding(text: str) -> list[float]:
-    #print(text)
-    resp = client.embeddings.create(model='text-embedding-ada-002', input=text)
+    # repeated search phrases are served from the LRU/TTL (+ disk) query cache
+    return get_query_embedding_cache().get_or_compute(text, _fetch_embedding)
+
+async def _fetch_embedding_async(text: str) -> list[float]:
+    resp = await async_client.embeddings.create(model=EMBEDDING_MODEL, input=text)
     return resp.data[0].embedding
 
-# --- NPY SAVE/LOAD ---
+async def get_embedding_async(text: str) -> list[float]:
+    return await get_query_embedding_cache().aget_or_compute(text, _fetch_embedding_async)
+
+# --- EMBEDDING STORE SAVE/LOAD ---
 def save_embeddings(data: list[dict], id_field: str, filename: str):
-    """Save ids, names, descriptions, embeddings to .npy files"""
-    ids, names, descs, embs = [], [], [], []
+    """Save ids, names, descriptions and embeddings as an EmbeddingStore"""
+    ids, names, descs, texts = [], [], [], []
     for item in data:
         ids.append(item[id_field])
         names.append(item['name'])
         descs.append(item['description'])
-        txt = f"{item[id_field]} | {item['name']} | {item['description']}"
-        embs.append(get_embedding(txt))
-    arr = np.array(embs)
-    base = os.path.join(DATA_DIR, filename)
-    np.save(f"{base}_{id_field}s.npy", np.array(ids))
-    np.save(f"{base}_names.npy", np.array(names))
-    np.save(f"{base}_descs.npy", np.array(descs))
-    np.save(f"{base}_embs.npy", arr)
+        texts.append(f"{item[id_field]} | {item['name']} | {item['description']}")
+    # batched + content-addressed cache: unchanged descriptions are never re-embedded
+    arr = get_embedding_service().embed_many(texts)
+    write_embedding_store(os.path.join(DATA_DIR, filename), ids, names, descs, arr)
     print(f"Saved {filename} embeddings.")
 
 
-def load_embeddings(filename: str, id_field: str) -> list[dict]:
-    """Load items with embeddings from .npy files"""
-    base = os.path.join(DATA_DIR, filename)
-    ids = np.load(f"{base}_{id_field}s.npy", allow_pickle=True)
-    names = np.load(f"{base}_names.npy", allow_pickle=True)
-    descs = np.load(f"{base}_descs.npy", allow_pickle=True)
-    arr = np.load(f"{base}_embs.npy", allow_pickle=True)
-    data = []
-    for i in range(len(ids)):
-        data.append({
-            id_field: ids[i],
-            'name': names[i],
-            'description': descs[i],
-            'embedding': arr[i].tolist()
-        })
-    return data
+def load_embeddings(filename: str, id_field: str) -> EmbeddingStore:
+    """Open the saved catalogue (memory-mapped embeddings, no per-row lists)"""
+    store = open_embedding_store(DATA_DIR, filename, id_field)
+    if store is None:
+        raise FileNotFoundError(f"No saved embeddings for {filename} in {DATA_DIR}")
+    return store
 
 # --- DB INSERTS ---
-def insert_table(data: list[dict], table: str, id_field: str, cols: list[str]):
-    conn = psycopg2.connect(**DB_PARAMS)
-    cur = conn.cursor()
-    vals = []
-    for item in data:
-        vec = '[' + ','.join(map(str, item['embedding'])) + ']'
-        row = [item[id_field], item['name'], item['description'], vec]
-        vals.append(tuple(row))
-    cols_list = ', '.join(cols)
-    sql = f"INSERT INTO {table} ({cols_list}) VALUES %s"
-    execute_values(cur, sql, vals)
-    conn.commit()
-    cur.close()
-    conn.close()
-    print(f"Inserted {len(vals)} rows into {table}.")
+def insert_table(store: EmbeddingStore, table: str, id_field: str, cols: list[str]):
+    kinds = ['vector' if c == 'embedding' else 'text' for c in cols]
+    # COPY into a staging table, then upsert on the natural key so re-running
+    # a load never fails or duplicates; embeddings are encoded from the mapped rows
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        n = copy_upsert_rows(cur, table, cols, kinds, store.rows(), conflict_column=id_field)
+    print(f"Inserted {n} rows into {table}.")
 
 # --- INDEX & SEARCH HELPERS ---
 def create_hnsw(table: str, column: str = 'embedding', m: int = 16, ef_con: int = 256):
-    conn = psycopg2.connect(**DB_PARAMS)
-    cur = conn.cursor()
-    cur.execute(f"DROP INDEX IF EXISTS {table}_{column}_hnsw_idx;")
-    cur.execute(
-        f"CREATE INDEX IF NOT EXISTS {table}_{column}_hnsw_idx ON {table} USING hnsw ({column} vector_cosine_ops) WITH (m={m}, ef_construction={ef_con});"
-    )
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {table}_{column}_hnsw_idx;")
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_hnsw_idx ON {table} USING hnsw ({column} vector_cosine_ops) WITH (m={m}, ef_construction={ef_con});"
+        )
     print(f"Created HNSW index on {table}.{column}.")
 
 
+def set_ef_search(cur, ef_search: int):
+    """Override hnsw.ef_search for the current transaction only; the pool already sets the default."""
+    if ef_search != DB_HNSW_EF_SEARCH:
+        cur.execute("SET LOCAL hnsw.ef_search = %s;", (ef_search,))
+
 def search_hnsw(table: str, query: str, id_field: str, ef_search: int = 200, limit: int = 5):
-    vec = get_embedding(query)
-    vec_lit = '[' + ','.join(map(str, vec)) + ']'
-    conn = psycopg2.connect(**DB_PARAMS)
-    cur = conn.cursor()
-    cur.execute("SET vector.hnsw.ef_search = %s;", (ef_search,))
-    cur.execute(
-        f"SELECT {id_field}, name FROM {table} ORDER BY embedding <=> %s::vector LIMIT {limit};",
-        (vec_lit,)
-    )
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    vec = Vector(get_embedding(query))
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        set_ef_search(cur, ef_search)
+        cur.execute(
+            f"SELECT {id_field}, name FROM {table} ORDER BY embedding <=> %s LIMIT {limit};",
+            (vec,)
+        )
+        rows = cur.fetchall()
     print(f"\n[{table}] Top {limit} for '{query}':")
     for r in rows:
         print(f" - {r[0]}: {r[1]}")
 
-def fill_periods_table():
-    """
-    Populate `period` with entries from Q1 2006 up through Q1 2025,
-    inserting only (quarter, year).
-    """
-    conn = psycopg2.connect(**DB_PARAMS)
-    cur = conn.cursor()
-
-    # 1) Build list of (quarter, year) tuples
+def period_records() -> list[tuple[int, int]]:
+    """(quarter, year) tuples from Q1 2006 up through Q1 2025."""
     records = []
     for year in range(2006, 2026):
         # stop at Q1 for 2025
         max_q = 1 if year == 2025 else 4
         for quarter in range(1, max_q + 1):
             records.append((quarter, year))
+    return records
+
+def fill_periods_table():
+    """
+    Populate `period` with entries from Q1 2006 up through Q1 2025,
+    inserting only (quarter, year).
+    """
+    # 1) Build list of (quarter, year) tuples
+    records = period_records()
 
     # 2) Bulk‐insert into period; assume you've added a UNIQUE(year, quarter) constraint
     print(records)
@@ -142,11 +147,8 @@ def fill_periods_table():
         VALUES %s
         ON CONFLICT DO NOTHING
     """
-    execute_values(cur, sql, records)
-
-    conn.commit()
-    cur.close()
-    conn.close()
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        execute_values(cur, sql, records)
 
     print(f"Inserted up to {len(records)} period rows (duplicates skipped).")
 
@@ -156,183 +158,361 @@ def _search_hnsw(table: str,
                  query: str,
                  ef_search: int = 200,
                  limit: int = 5) -> list[dict]:
-    vec = get_embedding(query)
-    vec_lit = "[" + ",".join(map(str, vec)) + "]"
+    vec = Vector(get_embedding(query))
 
-    with psycopg2.connect(**DB_PARAMS) as conn, \
+    with get_pool().connection() as conn, \
          conn.cursor(cursor_factory=RealDictCursor) as cur:
-        cur.execute("SET vector.hnsw.ef_search = %s;", (ef_search,))
+        set_ef_search(cur, ef_search)
         cols = ", ".join(select_cols)
         cur.execute(
             f"SELECT {cols} FROM {table} "
-            f"ORDER BY embedding <=> %s::vector LIMIT %s;",
-            (vec_lit, limit)
+            f"ORDER BY embedding <=> %s LIMIT %s;",
+            (vec, limit)
         )
         return cur.fetchall()
+
+
+def _search_companies(query: str, ef_search: int = 200, limit: int = 5) -> list[dict]:
+    """Companies (ticker, name, description) most similar to `query`, via the prepared company search."""
+    vec = Vector(get_embedding(query))
+
+    with get_pool().connection() as conn, \
+         conn.cursor(cursor_factory=RealDictCursor) as cur:
+        set_ef_search(cur, ef_search)
+        execute_prepared(cur, 'company_search', (vec, limit))
+        return cur.fetchall()
+
+
 def search_accounts_with_children(
     query: str,
     ef_search: int = 200,
     limit: int = 5
 ) -> list[dict]:
     """
-    1) Find up to `limit` accounts most similar to `query` via HNSW on embeddings.
-    2) For each matched account fetch all direct children.
+    Find up to `limit` accounts most similar to `query` via HNSW on embeddings,
+    together with their direct children, in one prepared statement.
     Returns a list of dicts with keys:
       - code, name, description, parent_code
+      - ancestors: codes from the parent up to the root (from ACCOUNT_TREE, no SQL)
       - children: list of dicts with keys code, name, description, parent_code
     """
     # embed the query
-    vec = get_embedding(query)
-    vec_lit = "[" + ",".join(map(str, vec)) + "]"
+    vec = Vector(get_embedding(query))
 
-    with psycopg2.connect(**DB_PARAMS) as conn, \
+    with get_pool().connection() as conn, \
          conn.cursor(cursor_factory=RealDictCursor) as cur:
 
         # set search effort
-        cur.execute("SET vector.hnsw.ef_search = %s;", (ef_search,))
+        set_ef_search(cur, ef_search)
 
-        # 1) fetch top-N matches, including parent code
-        cur.execute(
-            """
-            SELECT
-              a.account_id,
-              a.code,
-              a.name,
-              a.description,
-              p.code AS parent_code
-            FROM account a
-            LEFT JOIN account p
-              ON a.parent_account_id = p.account_id
-            ORDER BY a.embedding <=> %s::vector
-            LIMIT %s;
-            """,
-            (vec_lit, limit)
-        )
+        # matches and their direct children in one prepared statement
+        execute_prepared(cur, 'account_search_with_children', (vec, limit))
         matches = cur.fetchall()
-        matched_ids = [r['account_id'] for r in matches]
-        if not matched_ids:
-            return []
 
-        # 2) fetch all direct children of those matches
-        cur.execute(
-            """
-            SELECT
-              a.account_id,
-              a.code,
-              a.name,
-              a.description,
-              p.code AS parent_code
-            FROM account a
-            LEFT JOIN account p
-              ON a.parent_account_id = p.account_id
-            WHERE a.parent_account_id = ANY(%s);
-            """,
-            (matched_ids,)
-        )
-        children = cur.fetchall()
-
-    # group children by their parent_code
-    children_by_parent: dict[str, list[dict]] = {}
-    for child in children:
-        parent_code = child['parent_code']
-        children_by_parent.setdefault(parent_code, []).append({
-            'code':         child['code'],
-            'name':         child['name'],
-            'description':  child['description'],
-            'parent_code':  child['parent_code']
-        })
-
-    # build final result, dropping numeric IDs
-    result: list[dict] = []
-    for acct in matches:
-        result.append({
+    return [
+        {
             'code':         acct['code'],
             'name':         acct['name'],
             'description':  acct['description'],
             'parent_code':  acct['parent_code'],
-            'children':     children_by_parent.get(acct['code'], [])
-        })
+            'ancestors':    list(ACCOUNT_TREE.ancestors(acct['code'])),
+            'children':     acct['children']
+        }
+        for acct in matches
+    ]
+# --- ASYNC VARIANTS (used by the agent tools; they never block the event loop) ---
+async def _search_hnsw_async(table: str,
+                             select_cols: list[str],
+                             query: str,
+                             ef_search: int = 200,
+                             limit: int = 5) -> list[dict]:
+    vec = as_float32(await get_embedding_async(query))
+
+    pool = await get_async_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        if ef_search != DB_HNSW_EF_SEARCH:
+            await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)};")
+        cols = ", ".join(select_cols)
+        rows = await conn.fetch(
+            f"SELECT {cols} FROM {table} "
+            f"ORDER BY embedding <=> $1 LIMIT $2;",
+            vec, limit
+        )
+    return [dict(r) for r in rows]
+
+async def _search_companies_async(query: str, ef_search: int = 200, limit: int = 5) -> list[dict]:
+    """Async version of _search_companies (driver-prepared COMPANY_SEARCH)."""
+    vec = as_float32(await get_embedding_async(query))
+
+    pool = await get_async_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        if ef_search != DB_HNSW_EF_SEARCH:
+            await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)};")
+        rows = await conn.fetch(COMPANY_SEARCH, vec, limit)
+    return [dict(r) for r in rows]
 
+async def search_accounts_with_children_async(
+    query: str,
+    ef_search: int = 200,
+    limit: int = 5
+) -> list[dict]:
+    """Async version of search_accounts_with_children, same result shape."""
+    vec = as_float32(await get_embedding_async(query))
+
+    pool = await get_async_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        if ef_search != DB_HNSW_EF_SEARCH:
+            await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)};")
+        # driver-prepared; the vector goes over the wire in binary
+        matches = await conn.fetch(ACCOUNT_SEARCH_WITH_CHILDREN, vec, limit)
+
+    return [
+        {
+            'code':         acct['code'],
+            'name':         acct['name'],
+            'description':  acct['description'],
+            'parent_code':  acct['parent_code'],
+            'ancestors':    list(ACCOUNT_TREE.ancestors(acct['code'])),
+            'children':     json.loads(acct['children'])
+        }
+        for acct in matches
+    ]
+
+async def query_with_sql_async(sql_query: str) -> dict:
+    """Run `sql_query` read-only under sql_guard's limits; repeat statements are served from sql_cache."""
+    cache = get_sql_cache()
+    if not cache.max_bytes:
+        return await run_guarded_query(sql_query)
+    key, cached, version = await cache.get(sql_query)
+    if cached is not None:
+        return cached
+    result = await run_guarded_query(sql_query)
+    cache.put(key, result, version)
     return result
+
+COMPANY_COLS = ["ticker", "name", "description"]
+
+
+async def similar_companies(query: str, limit: int = 5) -> list[dict]:
+    """Exact ticker/name/alias hits without embedding; otherwise vector results fused with the lexical ranking."""
+    lex = company_lexicon
+    exact = exact_hits(lex, query, limit, lambda i: lex.record(i, COMPANY_COLS))
+    if exact:
+        return exact
+    k = HYBRID_CANDIDATES if lex is not None else limit
+    if use_memory_index(company_index):
+        hits = company_index.search(await get_embedding_async(query), k=k, cols=COMPANY_COLS)
+    else:
+        hits = await _search_companies_async(query, limit=k)
+    if lex is None:
+        return hits
+    return lex.fuse(query, hits, limit, lambda i: lex.record(i, COMPANY_COLS))
+
+
+async def similar_accounts(query: str, limit: int = 5) -> list[dict]:
+    """Same as similar_companies for accounts: codes, names and Turkish sheet labels match exactly."""
+    lex = account_lexicon
+    exact = exact_hits(lex, query, limit, account_index.account if lex is not None else None)
+    if exact:
+        return exact
+    k = HYBRID_CANDIDATES if lex is not None else limit
+    if use_memory_index(account_index):
+        hits = account_index.search_with_children(await get_embedding_async(query), limit=k)
+    else:
+        hits = await search_accounts_with_children_async(query, limit=k)
+    if lex is None:
+        return hits
+    return lex.fuse(query, hits, limit, account_index.account)
+
+
 @function_tool
-def get_similar_companies(company_name_prompt: str) -> list[dict]:
+async def get_similar_companies(company_name_prompt: str) -> list[dict]:
     """
     Get similar companies based on the given company name prompt.
-    It will query the company table with embedding vector search and return the top 5 results.
+    An exact ticker, name or alias (with or without Turkish characters) returns that company directly;
+    otherwise embedding search and name matching are combined and the top 5 results returned.
 
     Args:
         company_name_prompt: Company name or ticker of the company to search for.
     Returns:
         A list of similar companies with their ticker, name, and description.
     """
-    return _search_hnsw(table="company", select_cols=["ticker", "name", "description"], query=company_name_prompt, limit=5)
+    return await similar_companies(company_name_prompt)
 
 @function_tool
-def get_similar_accounts(account_query_prompt: str) -> list[dict]:
+async def get_similar_accounts(account_query_prompt: str) -> list[dict]:
     """
     Get similar accounts based on the given account query prompt. 
-    It will query the account table with embedding vector search and return the top 5 results.
+    An exact account code, name or Turkish statement label returns that account directly;
+    otherwise embedding search and name matching are combined and the top 5 results returned.
     If the account is a parent account, it will also return the children accounts.
 
     Args:
         account_query_prompt: Account query prompt.
     Returns:
-        A list of similar accounts with their code, name, and description. If the account is a parent account, it will also return the children accounts.
+        A list of similar accounts with their code, name, description and ancestors (parent up to the root account). If the account is a parent account, it will also return the children accounts.
     """
-    return search_accounts_with_children(account_query_prompt)
+    return await similar_accounts(account_query_prompt)
     #return _search_hnsw( table="account", select_cols=["account_id", "code", "name", "description"], query=account_query_prompt,limit=5)
 
 @function_tool
-def query_with_sql(sql_query: str) -> list[dict]:
+async def query_with_sql(sql_query: str) -> str:
     """
-    Query the database with the given SQL query. 
-    It will return the results of the query.
+    Query the database with the given SQL query (one read-only SELECT).
+    It will return the results of the query. Long-running or very expensive queries are rejected
+    and large results are truncated, so filter and aggregate in SQL.
 
     Args:
         sql_query: SQL query to execute.
     Returns:
-        A list of results from the query.   
+        JSON {columns: [{name, type}], rows, row_count, truncated[, note]} or {error} if the query was rejected or failed.
     """
-    conn = psycopg2.connect(**DB_PARAMS)
-    cur = conn.cursor()
-    cur.execute(sql_query)
-    results = cur.fetchall()
-    cur.close()
-    conn.close()
-    return results
+    return compact_json(await query_with_sql_async(sql_query))
 
-def initialize_agent():
-    global agent
-    if agent is not None:
-        return agent
+async def _fact_cube():
+    # first call loads the cube; later calls apply fact_change_log entries (throttled)
+    return await asyncio.to_thread(get_fact_cube)
 
-    # 1) Save embeddings for accounts & companies
-    #save_embeddings(SAMPLE_ACCOUNTS, 'code', 'account')
-    #save_embeddings(SAMPLE_COMPANIES, 'ticker', 'company')
+def _compact(v: float | None) -> float | int | None:
+    # NUMERIC(18,2) facts: whole numbers as ints, everything else to 2 decimals
+    if v is None:
+        return None
+    v = round(v, 2)
+    return int(v) if v.is_integer() else v
 
-    # 2) Insert into DB
-    insert_table(load_embeddings('account', 'code'), 'account', 'code', ['code', 'name', 'description', 'embedding'])
-    insert_table(load_embeddings('company', 'ticker'), 'company', 'ticker', ['ticker', 'name', 'description', 'embedding'])
+def _period(year: int, quarter: int) -> str:
+    return f"{year}Q{quarter}"
 
-    update_parent_accounts()
+def compact_json(obj) -> str:
+    """Tool output: JSON without whitespace, Turkish names unescaped."""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
 
-    fill_periods_table()
+@function_tool
+async def get_fact(ticker: str, account_code: str, year: int, quarter: int) -> str:
+    """
+    Get the value of one account for one company in one quarter.
+
+    Args:
+        ticker: Company ticker, e.g. KCHOL.
+        account_code: Account code, e.g. TOTAL_ASSETS.
+        year: Year, e.g. 2024.
+        quarter: Quarter 1-4.
+    Returns:
+        JSON {ticker, account, period, value}; value is null when the company does not report it.
+    """
+    cube = await _fact_cube()
+    value = cube.value(ticker, account_code, year, quarter)
+    return compact_json({'ticker': ticker.upper(), 'account': account_code.upper(),
+                         'period': _period(year, quarter), 'value': _compact(value)})
+
+@function_tool
+async def get_series(ticker: str, account_code: str, start_year: int | None = None,
+                     end_year: int | None = None, last_n: int | None = None) -> str:
+    """
+    Get the quarterly values of one account for one company, oldest first.
+
+    Args:
+        ticker: Company ticker, e.g. KCHOL.
+        account_code: Account code, e.g. TOTAL_ASSETS.
+        start_year: First year to include (default: earliest available).
+        end_year: Last year to include (default: latest available).
+        last_n: Only the latest n quarters with a value, e.g. 3 for "the last three quarters".
+    Returns:
+        JSON {ticker, account, values: {"2024Q1": value, ...}}; quarters without a value are omitted.
+    """
+    cube = await _fact_cube()
+    series = cube.time_series(ticker, account_code,
+                              (start_year, 1) if start_year else None,
+                              (end_year, 4) if end_year else None)
+    if last_n:
+        series = series[-last_n:]
+    return compact_json({'ticker': ticker.upper(), 'account': account_code.upper(),
+                         'values': {_period(p['year'], p['quarter']): _compact(p['value']) for p in series}})
 
-    read_and_fill_facts()
+@function_tool
+async def rank_companies(account_code: str, year: int, quarter: int, n: int = 5,
+                         ascending: bool = False, ticker: str | None = None) -> str:
+    """
+    Rank companies by the value of one account in one quarter (top-N / cross-section).
 
-    insert_total_liabilities()
+    Args:
+        account_code: Account code, e.g. TOTAL_ASSETS or DEBT_TO_ASSETS.
+        year: Year, e.g. 2024.
+        quarter: Quarter 1-4.
+        n: Number of companies to return; use a large n to get every company.
+        ascending: True to rank the smallest values first.
+        ticker: Optionally also return where this company ranks.
+    Returns:
+        JSON {account, period, of, columns, rows[, company]}; rows follow columns [rank, ticker, name, value],
+        'of' is the number of companies with a value, 'company' is the requested ticker's {rank, value}.
+    """
+    cube = await _fact_cube()
+    top = cube.top_n(account_code, year, quarter, n=n, ascending=ascending)
+    out = {'account': account_code.upper(), 'period': _period(year, quarter),
+           'of': len(cube.cross_section(account_code, year, quarter)),
+           'columns': ['rank', 'ticker', 'name', 'value'],
+           'rows': [[r['rank'], r['ticker'], r['name'], _compact(r['value'])] for r in top]}
+    if ticker:
+        position = cube.rank(ticker, account_code, year, quarter, ascending=ascending)
+        out['company'] = {'ticker': position['ticker'], 'rank': position['rank'],
+                          'value': _compact(position['value'])}
+    return compact_json(out)
 
-    # 3) Create HNSW indexes
-    create_hnsw('account')
-    create_hnsw('company')
+@function_tool
+async def get_change(account_code: str, year: int, quarter: int, compare_to: str = 'previous_quarter',
+                     by: str = 'change', n: int = 5, ascending: bool = False, ticker: str | None = None) -> str:
+    """
+    Period-over-period change of one account, ranked across companies; e.g. the companies whose
+    total liabilities fell the most in 2024Q1 (ascending=True), or one company's year-over-year growth.
 
-    agent = Agent(
+    Args:
+        account_code: Account code, e.g. TOTAL_LIABILITIES.
+        year: Year of the later quarter, e.g. 2024.
+        quarter: Later quarter 1-4.
+        compare_to: 'previous_quarter' or 'same_quarter_last_year'.
+        by: Rank by absolute 'change' or by percentage change 'pct'.
+        n: Number of companies to return.
+        ascending: True to list the largest decreases first.
+        ticker: Only return this company.
+    Returns:
+        JSON {account, period, previous_period, columns, rows}; rows follow columns
+        [rank, ticker, value, previous, change, pct].
+    """
+    lags = {'previous_quarter': 1, 'same_quarter_last_year': 4}
+    if compare_to not in lags:
+        raise ValueError(f"compare_to must be one of {list(lags)}")
+    cube = await _fact_cube()
+    previous, rows = cube.change(account_code, year, quarter, lag=lags[compare_to], by=by, ascending=ascending)
+    rows = [r for r in rows if r['ticker'] == ticker.upper()] if ticker else rows[:max(0, n)]
+    return compact_json({'account': account_code.upper(), 'period': _period(year, quarter),
+                         'previous_period': _period(*previous),
+                         'columns': ['rank', 'ticker', 'value', 'previous', 'change', 'pct'],
+                         'rows': [[r['rank'], r['ticker'], _compact(r['value']), _compact(r['previous']),
+                                   _compact(r['change']), _compact(r['pct'])] for r in rows]})
+
+SEARCH_TOOLS = [get_similar_companies, get_similar_accounts]
+FACT_TOOLS = [get_fact, get_series, rank_companies, get_change]
+
+def create_agent(tools: list | None = None, model: str = "gpt-4o-mini") -> Agent:
+    """The analyst agent with `tools` (default: search, SQL and the typed fact tools)."""
+    if tools is None:
+        tools = SEARCH_TOOLS + [query_with_sql] + FACT_TOOLS
+    fact_tools = [t.name for t in tools if t in FACT_TOOLS]
+    typed_tools = (
+        " 4. " + ", ".join(fact_tools) + "\n"
+        "Once you know the ticker and account code, prefer the tools in 4 over query_with_sql: "
+        "get_fact for one value, get_series for a company's quarters, rank_companies for top-N and cross-sections, "
+        "get_change for quarter-over-quarter or year-over-year changes. They answer from memory in one call; "
+        "use query_with_sql only for what they cannot express.\n"
+    ) if fact_tools else ""
+    return Agent(
         name="Financial Statements Agent",
         instructions="You are a helpful professional financial analyst with expertise in financial statements and sql queries."
             "You will use the following tools to answer the user's question:"
             "1. get_similar_companies"
             "2. get_similar_accounts"
             "3. query_with_sql"
+            + typed_tools +
             "Before you use query_with_sql, If you need to get correct company or acounts table information, you can use get_similar_companies or get_similar_accounts tools."
             "Account can have children accounts. Parent account is the total of all its children accounts. if you need to get the total of all accounts, you should use the parent account."
             "Database Structure:\n"
@@ -343,11 +523,37 @@ def initialize_agent():
             "You you query the dabase if you need to get account and/or company information. You must use get_similar_companies or get_similar_accounts tools to get the correct company or account information.\n"
             "Some of the accounts are subcategories of other accounts. If you need to get the total of all accounts, you should use the parent account. If you need to get the subcategories of an account, you should use the account itself.\n"
             "You don't need to sum up the values of the accounts. You can use the account itself to get the total value. If you need to get the total value of a category, you should use the parent account.\n"
-            "For example TOTAL_LIABILITIES is the sum of TOTAL_SHORT_TERM_LIABILITIES and TOTAL_LONG_TERM_LIABILITIES. So if you need to get the total liabilities, you should use TOTAL_LIABILITIES not to sum up TOTAL_SHORT_TERM_LIABILITIES and TOTAL_LONG_TERM_LIABILITIES.\n",
-        model="gpt-4o-mini",
+            "For example TOTAL_LIABILITIES is the sum of TOTAL_SHORT_TERM_LIABILITIES and TOTAL_LONG_TERM_LIABILITIES. So if you need to get the total liabilities, you should use TOTAL_LIABILITIES not to sum up TOTAL_SHORT_TERM_LIABILITIES and TOTAL_LONG_TERM_LIABILITIES.\n"
+            + describe_fact_views()
+            + describe_derived_metrics(),
+        model=model,
         #model_settings=ModelSettings(temperature=0.2),
-        tools=[get_similar_companies, get_similar_accounts, query_with_sql]
+        tools=tools
     )
+
+def initialize_agent():
+    global agent, account_index, company_index, account_lexicon, company_lexicon
+    if agent is not None:
+        return agent
+
+    # 1-2) Bring the database up to date: catalogue embedding stores, schema
+    #      migrations, then only the catalogue/fact deltas; HNSW indexes are
+    #      rebuilt only when embeddings change
+    from bootstrap import run_bootstrap  # imports this module, so not at top level
+    run_bootstrap()
+
+    # 4) Load in-memory indexes for the search tools (pgvector stays the fallback)
+    account_index = load_index(DATA_DIR, 'account', 'code', index_cls=AccountVectorIndex)
+    company_index = load_index(DATA_DIR, 'company', 'ticker')
+    if HYBRID_SEARCH and account_index is not None:
+        account_lexicon = LexicalIndex(account_index.rows, 'code', invert_translations(ACCOUNT_TRANSLATIONS))
+    if HYBRID_SEARCH and company_index is not None:
+        company_lexicon = LexicalIndex(company_index.rows, 'ticker', parse_aliases(SAMPLE_COMPANIES, 'ticker'))
+
+    # 5) Load the fact cube behind the typed fact tools
+    get_fact_cube()
+
+    agent = create_agent()
     print("Agent initialized")
     #message="What is the total value of Koç Holding's Current Assets in the fourth quarter of 2024?"
     #result = await Runner.run(agent, input=message)
@@ -361,11 +567,43 @@ async def initialize_agent_global():
     global agent
     if agent is None:
         agent = initialize_agent()
+        await ensure_vector_codec()
     return agent
 
-async def send_message(message: str):
+async def send_message(message: str, session_id: str | None = None):
+    """
+    Run the agent on `message`. With a session id the run continues that
+    conversation (earlier turns and resolved entities, see session_store.py).
+    """
     await initialize_agent_global()
-    result = await Runner.run(agent, input=message)
+    if session_id is None:
+        result = await Runner.run(agent, input=message)
+        return result.final_output
+    store = get_session_store()
+    session = await store.get(session_id)
+    async with session.lock:
+        result = await Runner.run(agent, input=session.input_for(message))
+        await store.record_turn(session, message, result.new_items)
     return result.final_output
 
-    
\ No newline at end of file
+async def stream_message(message: str, session_id: str | None = None):
+    """
+    send_message as a stream of chat events (see chat_stream.py). The run
+    starts on first iteration and is cancelled if iteration stops early;
+    only a completed run is added to the session.
+    """
+    await initialize_agent_global()
+    if session_id is None:
+        async with aclosing(run_events(Runner.run_streamed(agent, input=message))) as events:
+            async for event in events:
+                yield event
+        return
+    store = get_session_store()
+    session = await store.get(session_id)
+    async with session.lock:
+        result = Runner.run_streamed(agent, input=session.input_for(message))
+        async with aclosing(run_events(result)) as events:
+            async for event in events:
+                if event['event'] == 'final':
+                    await store.record_turn(session, message, result.new_items)
+                yield event
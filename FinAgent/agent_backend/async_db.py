@@ -0,0 +1,80 @@
+# async_db.py
+#
+# asyncio-native counterpart of db_pool.py, used by the agent tools so a slow
+# query or embedding call in one conversation does not stall the event loop
+# for every other in-flight /chat request.
+
+import asyncpg
+from db_pool import DB_PARAMS, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_HNSW_EF_SEARCH
+from pgvector_codec import register_asyncpg_vector
+
+_pool: asyncpg.Pool | None = None
+# set when a connection was opened before the vector extension existed
+_vector_codec_missing = False
+
+
+async def _init_connection(conn) -> None:
+    """Send/receive pgvector values in binary (float32 buffers, no text literals)."""
+    global _vector_codec_missing
+    try:
+        await register_asyncpg_vector(conn)
+    except ValueError:
+        _vector_codec_missing = True
+
+
+async def init_async_pool(min_size: int = DB_POOL_MIN,
+                          max_size: int = DB_POOL_MAX,
+                          timeout: float = DB_POOL_TIMEOUT) -> asyncpg.Pool:
+    """Create the shared asyncpg pool (called once at FastAPI startup)."""
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            database=DB_PARAMS['dbname'],
+            user=DB_PARAMS['user'],
+            password=DB_PARAMS['password'],
+            host=DB_PARAMS['host'],
+            port=int(DB_PARAMS['port']),
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            # applied once per connection, like db_pool's session_settings
+            server_settings={'hnsw.ef_search': str(DB_HNSW_EF_SEARCH)},
+            init=_init_connection,
+        )
+    return _pool
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """Shared pool; created with defaults on first use outside FastAPI."""
+    return _pool or await init_async_pool()
+
+
+async def ensure_vector_codec() -> None:
+    """Reopen pool connections created before CREATE EXTENSION vector (e.g. before bootstrap)."""
+    global _vector_codec_missing
+    if _pool is not None and _vector_codec_missing:
+        _vector_codec_missing = False
+        await _pool.expire_connections()
+
+
+async def close_async_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def async_pool_stats() -> dict:
+    """Saturation metrics in the same shape as ConnectionPool.stats()."""
+    if _pool is None:
+        return {}
+    size, idle = _pool.get_size(), _pool.get_idle_size()
+    max_size = _pool.get_max_size()
+    return {
+        'size': size,
+        'idle': idle,
+        'in_use': size - idle,
+        'min': _pool.get_min_size(),
+        'max': max_size,
+        'saturation': (size - idle) / max_size,
+    }
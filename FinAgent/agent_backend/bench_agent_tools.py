@@ -0,0 +1,141 @@
+# bench_agent_tools.py
+#
+# Typed fact tools versus free-form SQL.
+#
+#   --tools  (no LLM) one call per access pattern: the typed tool against the
+#            fact_wide query the model would write for query_with_sql
+#   default  runs the test questions from vector_database/main.py through two
+#            agents, one with only search + query_with_sql and one that also
+#            has get_fact / get_series / rank_companies / get_change, and
+#            reports model turns, tool calls and end-to-end latency.
+#            Needs a bootstrapped database and OPENAI_API_KEY.
+#
+#   python bench_agent_tools.py --tools --runs 200
+#   python bench_agent_tools.py --model gpt-4o-mini
+
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from agents import Runner, RunContextWrapper
+from agents.items import ToolCallItem
+from agents.exceptions import MaxTurnsExceeded
+import agent_wrapper
+from agent_wrapper import SEARCH_TOOLS, FACT_TOOLS, create_agent, query_with_sql
+from async_db import init_async_pool, close_async_pool
+
+# The numbered test questions in vector_database/main.py
+QUESTIONS = [
+    "2022 yılının üçüncü çeyreğinde Toplam Kısa Vadeli Yükümlülükleri en yüksek 3 şirket hangileridir?",
+    "2024 ikinci çeyrekte Toplam Uzun Vadeli Yükümlülükleri en fazla olan 3 şirketi sıralar mısın?",
+    "Son üç çeyrekte  ŞişeCam'nin Toplam Özkaynakları nasıl değişti?",
+    "2021 dördüncü çeyreğinde Toplam Duran Varlıkları en yüksek olan 5 şirket hangileridir?",
+    "Sabancı Holding (SAHOL) ile Koç Holding (KCHOL) arasında 2023 üçüncü çeyrekte Toplam Kısa Vadeli Yükümlülükleri karşılaştırması yap.",
+    "2020 yılının birinci çeyreğinde Toplam Varlıkları en fazla olan şirket hangisidir?",
+    "2024 birinci çeyrekte Toplam Yükümlülükleri en fazla azalan şirket hangisidir?",
+    "2022–2024 yılları arasında Tofaş'ın (TOASO) Toplam Duran Varlıkları yıllık bazda nasıl gelişti?",
+    "2023 ikinci çeyrek verilerine göre özkaynakları en büyük olan 5 şirketi listele.",
+]
+
+# (typed tool, its arguments, the equivalent SQL for query_with_sql)
+PATTERNS = {
+    'value': (
+        'get_fact', {'ticker': 'KCHOL', 'account_code': 'TOTAL_ASSETS', 'year': 2024, 'quarter': 4},
+        "SELECT value FROM fact_wide WHERE ticker = 'KCHOL' AND account_code = 'TOTAL_ASSETS' "
+        "AND year = 2024 AND quarter = 4;"),
+    'series': (
+        'get_series', {'ticker': 'TOASO', 'account_code': 'TOTAL_FIXED_ASSETS', 'start_year': 2022, 'end_year': 2024},
+        "SELECT year, quarter, value FROM fact_wide WHERE ticker = 'TOASO' AND account_code = 'TOTAL_FIXED_ASSETS' "
+        "AND year BETWEEN 2022 AND 2024 ORDER BY year, quarter;"),
+    'top_n': (
+        'rank_companies', {'account_code': 'TOTAL_SHORT_TERM_LIABILITIES', 'year': 2022, 'quarter': 3, 'n': 3},
+        "SELECT ticker, company_name, value FROM fact_wide WHERE account_code = 'TOTAL_SHORT_TERM_LIABILITIES' "
+        "AND year = 2022 AND quarter = 3 ORDER BY value DESC LIMIT 3;"),
+    'change': (
+        'get_change', {'account_code': 'TOTAL_LIABILITIES', 'year': 2024, 'quarter': 1, 'n': 1, 'ascending': True},
+        "SELECT a.ticker, a.value, b.value, a.value - b.value AS change FROM fact_wide a "
+        "JOIN fact_wide b ON b.ticker = a.ticker AND b.account_code = a.account_code AND b.year = 2023 AND b.quarter = 4 "
+        "WHERE a.account_code = 'TOTAL_LIABILITIES' AND a.year = 2024 AND a.quarter = 1 ORDER BY change LIMIT 1;"),
+}
+
+
+async def invoke(tool, args: dict) -> str:
+    return str(await tool.on_invoke_tool(RunContextWrapper(context=None), json.dumps(args)))
+
+
+async def bench_tools(runs: int) -> None:
+    tools = {t.name: t for t in FACT_TOOLS}
+    print(f"{'pattern':<10}{'tool':<16}{'typed ms':>10}{'sql ms':>10}{'typed chars':>13}{'sql chars':>11}")
+    for name, (tool_name, args, sql) in PATTERNS.items():
+        typed_out, sql_out = await invoke(tools[tool_name], args), await invoke(query_with_sql, {'sql_query': sql})
+        timings = {}
+        for label, call in (('typed', lambda: invoke(tools[tool_name], args)),
+                            ('sql', lambda: invoke(query_with_sql, {'sql_query': sql}))):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                await call()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[label] = np.mean(samples)
+        print(f"{name:<10}{tool_name:<16}{timings['typed']:>10.3f}{timings['sql']:>10.3f}"
+              f"{len(typed_out):>13}{len(sql_out):>11}")
+
+
+async def ask(agent, question: str, max_turns: int) -> dict:
+    start = time.perf_counter()
+    try:
+        result = await Runner.run(starting_agent=agent, input=question, max_turns=max_turns)
+        turns = len(result.raw_responses)
+        calls = [item.raw_item.name for item in result.new_items if isinstance(item, ToolCallItem)]
+        ok = True
+    except MaxTurnsExceeded:
+        turns, calls, ok = max_turns, [], False
+    return {'seconds': time.perf_counter() - start, 'turns': turns, 'calls': calls, 'ok': ok}
+
+
+async def bench_agents(model: str, max_turns: int) -> None:
+    agents = {
+        'sql': create_agent(SEARCH_TOOLS + [query_with_sql], model=model),
+        'typed': create_agent(model=model),
+    }
+    totals = {label: [] for label in agents}
+    for i, question in enumerate(QUESTIONS, 1):
+        print(f"\n[{i}] {question}")
+        for label, agent in agents.items():
+            r = await ask(agent, question, max_turns)
+            totals[label].append(r)
+            status = '' if r['ok'] else '  (max turns exceeded)'
+            print(f"  {label:<6} turns={r['turns']:<3} tools={len(r['calls']):<3} {r['seconds']:6.2f}s  "
+                  f"{', '.join(r['calls'])}{status}")
+
+    print(f"\n{'agent':<8}{'mean turns':>12}{'mean tools':>12}{'mean s':>10}{'p95 s':>10}{'failed':>8}")
+    for label, rows in totals.items():
+        seconds = [r['seconds'] for r in rows]
+        print(f"{label:<8}{np.mean([r['turns'] for r in rows]):>12.2f}"
+              f"{np.mean([len(r['calls']) for r in rows]):>12.2f}"
+              f"{np.mean(seconds):>10.2f}{np.percentile(seconds, 95):>10.2f}"
+              f"{sum(not r['ok'] for r in rows):>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tools', action='store_true', help="time the tools only, without an LLM")
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--model', default='gpt-4o-mini')
+    parser.add_argument('--max-turns', type=int, default=20)
+    args = parser.parse_args()
+
+    await init_async_pool()
+    try:
+        agent_wrapper.get_fact_cube()
+        if args.tools:
+            await bench_tools(args.runs)
+        else:
+            await bench_agents(args.model, args.max_turns)
+    finally:
+        await close_async_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
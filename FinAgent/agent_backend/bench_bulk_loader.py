@@ -0,0 +1,99 @@
+# bench_bulk_loader.py
+#
+# Load throughput of execute_values versus COPY (text and binary) for
+# synthetic financial facts and for 1536-d embedding rows. Everything is
+# written to temp tables and rolled back, so it is safe against a live DB.
+#
+#   python bench_bulk_loader.py --facts 1000000 --vectors 5000
+
+import argparse
+import time
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+from db_pool import DB_PARAMS
+from fact_pipeline import FACT_COLUMNS, FACT_DTYPE
+from bulk_loader import copy_fact_records, copy_rows
+
+
+def synthetic_facts(n: int, rng: np.random.Generator) -> np.ndarray:
+    records = np.empty(n, dtype=FACT_DTYPE)
+    records['company_id'] = rng.integers(1, 600, n)
+    records['period_id'] = rng.integers(1, 78, n)
+    records['account_id'] = rng.integers(1, 120, n)
+    records['value'] = np.round(rng.uniform(-1e9, 1e10, n), 2)
+    return records
+
+
+def timed(conn, setup_sql: str, load) -> float:
+    with conn.cursor() as cur:
+        cur.execute(setup_sql)
+        start = time.perf_counter()
+        load(cur)
+        elapsed = time.perf_counter() - start
+    conn.rollback()
+    return elapsed
+
+
+def bench_facts(conn, n: int, rng) -> list[tuple[str, float]]:
+    records = synthetic_facts(n, rng)
+    setup = "CREATE TEMP TABLE bench_fact (LIKE financial_fact INCLUDING DEFAULTS);"
+    insert_sql = f"INSERT INTO bench_fact ({', '.join(FACT_COLUMNS)}) VALUES %s"
+    # plain appends; the last row adds the unique index and upsert path the loaders use
+    indexed = "CREATE TEMP TABLE bench_fact (LIKE financial_fact INCLUDING DEFAULTS INCLUDING INDEXES);"
+    return [
+        ('execute_values', timed(conn, setup, lambda cur: execute_values(
+            cur, insert_sql, records.tolist(), page_size=1000))),
+        ('COPY text', timed(conn, setup, lambda cur: copy_fact_records(
+            cur, records, table='bench_fact', fmt='text', upsert=False))),
+        ('COPY binary', timed(conn, setup, lambda cur: copy_fact_records(
+            cur, records, table='bench_fact', fmt='binary', upsert=False))),
+        ('COPY upsert', timed(conn, indexed, lambda cur: copy_fact_records(
+            cur, records, table='bench_fact', fmt='binary'))),
+    ]
+
+
+def bench_vectors(conn, n: int, rng) -> list[tuple[str, float]]:
+    embs = rng.standard_normal((n, 1536)).astype(np.float32)
+    rows = [(f"CODE_{i}", f"Name {i}", f"Description of item {i}", embs[i]) for i in range(n)]
+    cols = ['code', 'name', 'description', 'embedding']
+    kinds = ['text', 'text', 'text', 'vector']
+    setup = "CREATE TEMP TABLE bench_vec AS SELECT code, name, description, embedding FROM account WITH NO DATA;"
+
+    def legacy(cur):
+        # the string-joined pgvector literals insert_table used to build
+        vals = [(c, nm, d, '[' + ','.join(map(str, e)) + ']') for c, nm, d, e in rows]
+        execute_values(cur, f"INSERT INTO bench_vec ({', '.join(cols)}) VALUES %s", vals)
+
+    return [
+        ('execute_values', timed(conn, setup, legacy)),
+        ('COPY text', timed(conn, setup, lambda cur: copy_rows(cur, 'bench_vec', cols, kinds, rows, fmt='text'))),
+        ('COPY binary', timed(conn, setup, lambda cur: copy_rows(cur, 'bench_vec', cols, kinds, rows, fmt='binary'))),
+    ]
+
+
+def report(title: str, n: int, results: list[tuple[str, float]]) -> None:
+    base = results[0][1]
+    print(f"\n{title} ({n} rows)")
+    print(f"{'loader':<16}{'seconds':>10}{'rows/sec':>14}{'speedup':>10}")
+    for name, seconds in results:
+        print(f"{name:<16}{seconds:>10.3f}{n / seconds:>14.0f}{base / seconds:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--facts', type=int, default=1_000_000)
+    parser.add_argument('--vectors', type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        report('financial_fact', args.facts, bench_facts(conn, args.facts, rng))
+        report('embedding rows', args.vectors, bench_vectors(conn, args.vectors, rng))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# bench_chat_stream.py
+#
+# Time to first byte for /chat against /chat/stream, over HTTP through
+# uvicorn. The agent runs on a scripted model standing in for the OpenAI
+# Responses API: one tool call (--tool-ms) after --think-ms, then an answer
+# of --tokens tokens, the first after --think-ms and the rest --token-ms
+# apart, so a turn has the shape of a real multi-tool answer without a key.
+#
+#   /chat          first byte = whole answer
+#   /chat/stream   first byte ('start'), first tool event, first token, done
+#
+# The last row disconnects after the first tool_start and checks that the
+# run was cancelled rather than finishing the tool and the answer.
+#
+#   python bench_chat_stream.py --think-ms 800 --tool-ms 1500 --tokens 120 --token-ms 20
+
+import argparse
+import asyncio
+import os
+import socket
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'fake')
+
+import httpx
+import uvicorn
+from agents import Agent, function_tool, set_tracing_disabled
+from agents.items import ModelResponse
+from agents.models.interface import Model
+from agents.usage import Usage
+from openai.types.responses import (
+    Response, ResponseCompletedEvent, ResponseFunctionToolCall, ResponseOutputItemDoneEvent,
+    ResponseOutputMessage, ResponseOutputText, ResponseTextDeltaEvent
+)
+import agent_wrapper
+from chat_stream import chat_stream_stats
+from main import app
+
+TOOL_STATS = {'finished': 0}
+
+
+def scripted_model(think: float, tool: float, tokens: int, token: float) -> Model:
+    words = [f"word{i} " for i in range(tokens)]
+
+    class ScriptedModel(Model):
+        """Calls the tool once, then answers with `tokens` streamed tokens."""
+
+        def _answered_tool(self, input) -> bool:
+            return any(isinstance(item, dict) and item.get('type') == 'function_call_output' for item in input)
+
+        def _output(self, input):
+            if not self._answered_tool(input):
+                return [ResponseFunctionToolCall(id='fc_1', call_id='call_1', name='lookup_facts',
+                                                 arguments='{"ticker": "KCHOL"}', type='function_call',
+                                                 status='completed')]
+            return [ResponseOutputMessage(id='msg_1', role='assistant', status='completed', type='message',
+                                          content=[ResponseOutputText(text=''.join(words), annotations=[],
+                                                                      type='output_text')])]
+
+        async def get_response(self, system_instructions, input, model_settings, tools, output_schema,
+                               handoffs, tracing, *, previous_response_id):
+            await asyncio.sleep(think + (token * (tokens - 1) if self._answered_tool(input) else 0))
+            return ModelResponse(output=self._output(input), usage=Usage(), response_id=None)
+
+        async def stream_response(self, system_instructions, input, model_settings, tools, output_schema,
+                                  handoffs, tracing, *, previous_response_id):
+            await asyncio.sleep(think)
+            if self._answered_tool(input):
+                for i, word in enumerate(words):
+                    if i:
+                        await asyncio.sleep(token)
+                    yield ResponseTextDeltaEvent(content_index=0, delta=word, item_id='msg_1',
+                                                 output_index=0, type='response.output_text.delta')
+            output = self._output(input)
+            for i, item in enumerate(output):
+                yield ResponseOutputItemDoneEvent(item=item, output_index=i, type='response.output_item.done')
+            response = Response.model_construct(id='resp_1', output=output, usage=None)
+            yield ResponseCompletedEvent(response=response, type='response.completed')
+
+    return ScriptedModel()
+
+
+def make_agent(args) -> Agent:
+    @function_tool
+    async def lookup_facts(ticker: str) -> str:
+        await asyncio.sleep(args.tool_ms / 1000)
+        TOOL_STATS['finished'] += 1
+        return f"facts for {ticker}"
+
+    model = scripted_model(args.think_ms / 1000, args.tool_ms / 1000, args.tokens, args.token_ms / 1000)
+    return Agent(name="bench", instructions="", model=model, tools=[lookup_facts])
+
+
+async def plain_chat(client: httpx.AsyncClient) -> dict:
+    start = time.perf_counter()
+    async with client.stream('POST', '/chat', json={'message': 'q'}) as response:
+        first = None
+        async for _ in response.aiter_bytes():
+            first = first or time.perf_counter() - start
+    return {'first byte': first, 'done': time.perf_counter() - start}
+
+
+async def streamed_chat(client: httpx.AsyncClient, stop_at: str | None = None) -> dict:
+    start = time.perf_counter()
+    marks = {}
+    async with client.stream('POST', '/chat/stream', json={'message': 'q'}) as response:
+        async for line in response.aiter_lines():
+            marks.setdefault('first byte', time.perf_counter() - start)
+            if not line.startswith('event: '):
+                continue
+            name = line[len('event: '):]
+            if name == 'tool_start':
+                marks.setdefault('first tool', time.perf_counter() - start)
+            elif name == 'delta':
+                marks.setdefault('first token', time.perf_counter() - start)
+            if name == stop_at:
+                break
+    marks['done'] = time.perf_counter() - start
+    return marks
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--think-ms', type=float, default=800)
+    parser.add_argument('--tool-ms', type=float, default=1500)
+    parser.add_argument('--tokens', type=int, default=120)
+    parser.add_argument('--token-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    set_tracing_disabled(True)
+    agent_wrapper.agent = make_agent(args)   # skips initialize_agent (no DB needed)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, lifespan='off', log_level='warning'))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    rows = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            rows.append(('/chat', await plain_chat(client)))
+            rows.append(('/chat/stream', await streamed_chat(client)))
+            before = TOOL_STATS['finished']
+            rows.append(('/chat/stream, drop', await streamed_chat(client, stop_at='tool_start')))
+            await asyncio.sleep(args.tool_ms / 1000 + 0.5)   # long enough for the tool to have finished
+            tool_ran = TOOL_STATS['finished'] - before
+    finally:
+        server.should_exit = True
+        await serving
+
+    print(f"think={args.think_ms:.0f}ms tool={args.tool_ms:.0f}ms tokens={args.tokens}x{args.token_ms:.0f}ms")
+    cols = ['first byte', 'first tool', 'first token', 'done']
+    print(f"{'endpoint':<22}" + ''.join(f"{c + ' ms':>16}" for c in cols))
+    for name, marks in rows:
+        print(f"{name:<22}" + ''.join(f"{marks[c] * 1000:>16.0f}" if c in marks else f"{'':>16}" for c in cols))
+    print(f"dropped stream: tool finished {tool_ran} time(s); stream stats {chat_stream_stats()}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
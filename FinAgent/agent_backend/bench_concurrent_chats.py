@@ -0,0 +1,87 @@
+# bench_concurrent_chats.py
+#
+# Load test for the agent tools under concurrent conversations. Each
+# simulated chat performs the usual tool sequence (company lookup, account
+# lookup, one SQL query) inside a single event loop, the way concurrent /chat
+# requests share the FastAPI loop:
+#
+#   blocking - the previous synchronous psycopg2/OpenAI helpers
+#   async    - the function tools as registered on the agent
+#
+# With blocking helpers wall time grows linearly with the number of chats;
+# with the async tools it stays close to a single chat. Needs Postgres
+# (DB_HOST etc.); embeddings come from the local fake endpoint.
+#
+#   python bench_concurrent_chats.py --chats 20 --sql-sleep 0.2
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault('QUERY_EMBEDDING_CACHE_PATH', '')
+from fake_embedding_server import start_fake_server
+
+server, base_url, _ = start_fake_server(latency_ms=float(os.getenv('FAKE_EMBEDDING_LATENCY_MS', '100')))
+os.environ['OPENAI_BASE_URL'] = base_url
+os.environ.setdefault('OPENAI_API_KEY', 'fake')
+
+from agents import RunContextWrapper
+import agent_wrapper
+from async_db import init_async_pool, close_async_pool
+
+
+async def blocking_chat(tag: str, sql: str):
+    agent_wrapper._search_companies(f"company {tag}")
+    agent_wrapper.search_accounts_with_children(f"account {tag}")
+    with agent_wrapper.get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(sql)
+        cur.fetchall()
+
+
+async def async_chat(tag: str, sql: str):
+    ctx = RunContextWrapper(context=None)
+    await agent_wrapper.get_similar_companies.on_invoke_tool(
+        ctx, json.dumps({'company_name_prompt': f"company {tag}"}))
+    await agent_wrapper.get_similar_accounts.on_invoke_tool(
+        ctx, json.dumps({'account_query_prompt': f"account {tag}"}))
+    await agent_wrapper.query_with_sql.on_invoke_tool(
+        ctx, json.dumps({'sql_query': sql}))
+
+
+async def run(chat, chats: int, sql: str, label: str) -> float:
+    # distinct query text per chat and per round, so nothing is served from the embedding cache
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(f"{label} {i}", sql) for i in range(chats)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--sql-sleep', type=float, default=0.2)
+    args = parser.parse_args()
+    sql = f"SELECT pg_sleep({args.sql_sleep}), count(*) FROM company;"
+
+    await init_async_pool(max_size=args.chats)
+    try:
+        # warm up both pools and the HTTP client before timing
+        await run(async_chat, args.chats, sql, 'warmup')
+        await run(blocking_chat, 1, sql, 'warmup')
+        single = await run(async_chat, 1, sql, 'single')
+        blocking = await run(blocking_chat, args.chats, sql, 'blocking')
+        concurrent = await run(async_chat, args.chats, sql, 'async')
+    finally:
+        await close_async_pool()
+        server.shutdown()
+
+    print(f"chats={args.chats} sql_sleep={args.sql_sleep}s")
+    print(f"{'mode':<16}{'wall s':>10}{'x single chat':>16}")
+    print(f"{'single chat':<16}{single:>10.3f}{1.0:>16.1f}")
+    print(f"{'blocking':<16}{blocking:>10.3f}{blocking / single:>16.1f}")
+    print(f"{'async':<16}{concurrent:>10.3f}{concurrent / single:>16.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
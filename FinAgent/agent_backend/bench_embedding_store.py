@@ -0,0 +1,128 @@
+# bench_embedding_store.py
+#
+# Memory and time to load a synthetic catalogue, each variant in a fresh
+# process:
+#
+#   legacy load_embeddings   four .npy files -> list of dicts with the
+#                            embedding as a Python list (arr[i].tolist())
+#   legacy index             .npy files -> VectorIndex over a normalized copy
+#   store                    EmbeddingStore: mapped float32 matrix + string table
+#   store + index            VectorIndex sharing the store's mapped matrix
+#   store -> COPY rows       encoding every row the way insert_table does
+#
+# heap MB is tracemalloc's peak (Python objects and NumPy buffers); rss MB is
+# the growth in resident memory, which for the store is mostly clean, shared
+# page cache rather than private heap (the COPY variant has already dropped
+# its mapping when measured). load s is timed under tracemalloc, which
+# inflates the allocation-heavy legacy loader most.
+#
+#   python bench_embedding_store.py --rows 20000
+
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from embedding_store import open_embedding_store, write_embedding_store
+from vector_index import VectorIndex
+from bulk_loader import encode_row_binary
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def legacy_load(base: str) -> list[dict]:
+    ids = np.load(f"{base}_codes.npy", allow_pickle=True)
+    names = np.load(f"{base}_names.npy", allow_pickle=True)
+    descs = np.load(f"{base}_descs.npy", allow_pickle=True)
+    arr = np.load(f"{base}_embs.npy", allow_pickle=True)
+    return [{'code': ids[i], 'name': names[i], 'description': descs[i], 'embedding': arr[i].tolist()}
+            for i in range(len(ids))]
+
+
+def legacy_index(base: str) -> VectorIndex:
+    ids = np.load(f"{base}_codes.npy", allow_pickle=True)
+    names = np.load(f"{base}_names.npy", allow_pickle=True)
+    descs = np.load(f"{base}_descs.npy", allow_pickle=True)
+    embs = np.load(f"{base}_embs.npy", allow_pickle=True)
+    rows = [{'code': str(i), 'name': str(n), 'description': str(d)} for i, n, d in zip(ids, names, descs)]
+    matrix = embs / np.linalg.norm(embs, axis=1, keepdims=True)   # what VectorIndex used to keep
+    return VectorIndex(rows, np.ascontiguousarray(matrix, dtype=np.float32))
+
+
+def store_index(base: str) -> VectorIndex:
+    store = open_embedding_store(os.path.dirname(base), os.path.basename(base), 'code')
+    return VectorIndex(store.records(), store.matrix)
+
+
+def store_copy_rows(base: str) -> int:
+    store = open_embedding_store(os.path.dirname(base), os.path.basename(base), 'code')
+    kinds = ['text', 'text', 'text', 'vector']
+    return sum(len(encode_row_binary(row, kinds)) for row in store.rows())
+
+
+VARIANTS = {
+    'legacy load_embeddings': legacy_load,
+    'legacy index': legacy_index,
+    'store': lambda base: open_embedding_store(os.path.dirname(base), os.path.basename(base), 'code'),
+    'store + index': store_index,
+    'store -> COPY rows': store_copy_rows,
+}
+
+
+def measure(name: str, base: str, out) -> None:
+    rss = rss_mb()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = VARIANTS[name](base)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lookup = ''
+    if isinstance(result, VectorIndex):
+        q = np.random.default_rng(1).standard_normal(result.matrix.shape[1]).astype(np.float32)
+        t = time.perf_counter()
+        for _ in range(100):
+            result.top_k(q, 5)
+        lookup = f"{(time.perf_counter() - t) / 100 * 1000:.2f}"
+    out.put((seconds, peak / 2**20, rss_mb() - rss, lookup))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--dim', type=int, default=1536)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embs = rng.standard_normal((args.rows, args.dim)).astype(np.float32)
+    codes = [f"ACCOUNT_{i}" for i in range(args.rows)]
+    names = [f"Account number {i}" for i in range(args.rows)]
+    descs = [f"Synthetic description of account {i} used for the memory benchmark." for i in range(args.rows)]
+
+    ctx = mp.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'account')
+        np.save(f"{base}_codes.npy", np.array(codes))
+        np.save(f"{base}_names.npy", np.array(names))
+        np.save(f"{base}_descs.npy", np.array(descs))
+        write_embedding_store(base, codes, names, descs, embs)
+        del embs
+
+        print(f"rows={args.rows} dim={args.dim} matrix={args.rows * args.dim * 4 / 2**20:.1f} MB")
+        print(f"{'variant':<24}{'load s':>10}{'heap MB':>10}{'rss MB':>10}{'top5 ms':>10}")
+        for name in VARIANTS:
+            out = ctx.Queue()
+            proc = ctx.Process(target=measure, args=(name, base, out))
+            proc.start()
+            seconds, heap, rss, lookup = out.get()
+            proc.join()
+            print(f"{name:<24}{seconds:>10.3f}{heap:>10.1f}{rss:>10.1f}{lookup:>10}")
+
+
+if __name__ == '__main__':
+    main()
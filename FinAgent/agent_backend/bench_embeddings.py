@@ -0,0 +1,69 @@
+# bench_embeddings.py
+#
+# Rows/sec of the legacy one-request-per-row embedding loop versus
+# EmbeddingService (cold cache, then warm cache), against the local fake
+# endpoint from fake_embedding_server.py.
+#
+#   python bench_embeddings.py --rows 600 --latency-ms 150
+
+import argparse
+import os
+import tempfile
+import time
+from openai import OpenAI
+from embedding_service import EmbeddingCache, EmbeddingService
+from fake_embedding_server import start_fake_server
+
+
+def synthetic_rows(n: int) -> list[str]:
+    return [
+        f"T{i:04d} | Company {i} A.Ş. | Synthetic description of listed company number {i}."
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=600)
+    parser.add_argument('--latency-ms', type=float, default=150.0)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    args = parser.parse_args()
+
+    server, base_url, counter = start_fake_server(latency_ms=args.latency_ms)
+    client = OpenAI(api_key='fake', base_url=base_url)
+    texts = synthetic_rows(args.rows)
+
+    try:
+        # legacy: one blocking round-trip per row, as save_embeddings used to do
+        start = time.perf_counter()
+        for t in texts:
+            client.embeddings.create(model='text-embedding-ada-002', input=t)
+        legacy = time.perf_counter() - start
+        legacy_requests = counter['requests']
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = EmbeddingCache(os.path.join(tmp, 'cache.sqlite3'))
+            service = EmbeddingService(client=client, batch_size=args.batch_size,
+                                       max_in_flight=args.max_in_flight, cache=cache)
+            start = time.perf_counter()
+            service.embed_many(texts)
+            cold = time.perf_counter() - start
+            cold_requests = counter['requests'] - legacy_requests
+
+            start = time.perf_counter()
+            service.embed_many(texts)
+            warm = time.perf_counter() - start
+            cache.close()
+    finally:
+        server.shutdown()
+
+    print(f"rows={args.rows} latency={args.latency_ms}ms batch={args.batch_size} in_flight={args.max_in_flight}")
+    print(f"{'mode':<22}{'seconds':>10}{'rows/sec':>12}{'requests':>10}")
+    print(f"{'per-row loop':<22}{legacy:>10.3f}{args.rows / legacy:>12.1f}{legacy_requests:>10}")
+    print(f"{'service, cold cache':<22}{cold:>10.3f}{args.rows / cold:>12.1f}{cold_requests:>10}")
+    print(f"{'service, warm cache':<22}{warm:>10.3f}{args.rows / warm:>12.1f}{0:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# bench_fact_queries.py
+#
+# Typical agent access patterns on financial_fact, against the unique
+# covering index versus the original layout (three single-column indexes,
+# rebuilt here as a temp copy of the table). Prints the scan each plan uses
+# on the fact table, heap fetches, and mean/p95 latency.
+#
+#   python bench_fact_queries.py --runs 500
+
+import argparse
+import json
+import random
+import time
+import numpy as np
+import psycopg2
+from db_pool import DB_PARAMS
+
+QUERIES = {
+    # "account X for company Y across all quarters"
+    'series': """
+        SELECT p.year, p.quarter, f.value
+        FROM {table} f JOIN period p ON p.period_id = f.period_id
+        WHERE f.company_id = %(company)s AND f.account_id = %(account)s
+        ORDER BY p.year, p.quarter
+    """,
+    # one cell
+    'point': """
+        SELECT value FROM {table}
+        WHERE company_id = %(company)s AND account_id = %(account)s AND period_id = %(period)s
+    """,
+    # one account and period across a handful of companies
+    'compare': """
+        SELECT company_id, value FROM {table}
+        WHERE company_id = ANY(%(companies)s) AND account_id = %(account)s AND period_id = %(period)s
+    """,
+}
+
+
+def fact_scans(plan: dict, table: str) -> list[str]:
+    """'<Node Type> (heap fetches N)' for every plan node that reads `table`."""
+    found = []
+    if plan.get('Relation Name') == table:
+        fetches = plan.get('Heap Fetches')
+        found.append(plan['Node Type'] + (f" (heap fetches {fetches})" if fetches is not None else ''))
+    for child in plan.get('Plans', []):
+        found.extend(fact_scans(child, table))
+    return found
+
+
+def make_params(keys: list[tuple[int, int, int]], companies: list[int]) -> dict:
+    company, account, period = random.choice(keys)
+    return {'company': company, 'account': account, 'period': period,
+            'companies': random.sample(companies, min(5, len(companies)))}
+
+
+def run(cur, table: str, keys, companies, runs: int) -> None:
+    print(f"\n[{table}]")
+    print(f"{'query':<10}{'mean ms':>10}{'p95 ms':>10}  plan on {table}")
+    for name, sql in QUERIES.items():
+        sql = sql.format(table=table)
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, make_params(keys, companies))
+        raw = cur.fetchone()[0]
+        plan = (raw if isinstance(raw, list) else json.loads(raw))[0]['Plan']
+        timings = []
+        for _ in range(runs):
+            params = make_params(keys, companies)
+            start = time.perf_counter()
+            cur.execute(sql, params)
+            cur.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{name:<10}{np.mean(timings):>10.3f}{np.percentile(timings, 95):>10.3f}  "
+              f"{', '.join(fact_scans(plan, table))}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=500)
+    args = parser.parse_args()
+    random.seed(0)
+
+    conn = psycopg2.connect(**DB_PARAMS)
+    conn.autocommit = True   # VACUUM cannot run inside a transaction
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM financial_fact;")
+            print(f"financial_fact rows: {cur.fetchone()[0]}")
+            cur.execute("SELECT company_id, account_id, period_id FROM financial_fact;")
+            keys = cur.fetchall()
+            if not keys:
+                print("financial_fact is empty; run bootstrap first.")
+                return
+            companies = sorted({k[0] for k in keys})
+
+            cur.execute("""
+                CREATE TEMP TABLE legacy_fact AS SELECT * FROM financial_fact;
+                CREATE INDEX ON legacy_fact(company_id);
+                CREATE INDEX ON legacy_fact(period_id);
+                CREATE INDEX ON legacy_fact(account_id);
+            """)
+            cur.execute("VACUUM (ANALYZE) legacy_fact;")
+            cur.execute("VACUUM (ANALYZE) financial_fact;")
+
+            run(cur, 'legacy_fact', keys, companies, args.runs)
+            run(cur, 'financial_fact', keys, companies, args.runs)
+            cur.execute("DROP TABLE legacy_fact;")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# bench_fact_transform.py
+#
+# Sheet → fact transform over a synthetic full-market dataset: the original
+# per-column iterrows loop versus fact_pipeline.transform_sheet. Sheets are
+# generated in memory, so only the transform is timed (not openpyxl).
+#
+#   python bench_fact_transform.py --companies 600
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from fact_pipeline import FactLookups, transform_sheet
+from read_and_fill_facts import ACCOUNT_TRANSLATIONS, parse_period
+from synthetic_data import synthetic_sheet
+
+
+def legacy_transform(df: pd.DataFrame, company_id: int, account_map: dict, period_map: dict) -> list[tuple]:
+    """The loop read_and_fill_facts used before fact_pipeline, kept for comparison."""
+    records = []
+    df = df.copy()
+    first_col = df.columns[0]
+    df.rename(columns={first_col: 'account_name'}, inplace=True)
+    df['account_name'] = df['account_name'].astype(str).str.strip()
+    df['account_code'] = df['account_name'].map(ACCOUNT_TRANSLATIONS)
+    df.dropna(subset=['account_code'], inplace=True)
+    for col in df.columns.drop(['account_name', 'account_code']):
+        try:
+            year, quarter = parse_period(col)
+        except ValueError:
+            continue
+        period_id = period_map.get((year, quarter))
+        if not period_id:
+            continue
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        sub = df[['account_code', col]].dropna(subset=[col])
+        for _, row in sub.iterrows():
+            account_id = account_map.get(row['account_code'])
+            if not account_id:
+                continue
+            records.append((company_id, period_id, account_id, row[col]))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--companies', type=int, default=600)
+    args = parser.parse_args()
+
+    codes = sorted(set(ACCOUNT_TRANSLATIONS.values()))
+    account_map = {code: i + 1 for i, code in enumerate(codes)}
+    period_map = {}
+    for year in range(2006, 2026):
+        for quarter in range(1, (1 if year == 2025 else 4) + 1):
+            period_map[(year, quarter)] = len(period_map) + 1
+
+    rng = np.random.default_rng(0)
+    sheets = [synthetic_sheet(rng) for _ in range(args.companies)]
+
+    start = time.perf_counter()
+    legacy = [legacy_transform(df, i + 1, account_map, period_map) for i, df in enumerate(sheets)]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lookups = FactLookups(ACCOUNT_TRANSLATIONS, account_map, period_map)
+    columnar = [transform_sheet(df, i + 1, lookups) for i, df in enumerate(sheets)]
+    columnar_s = time.perf_counter() - start
+
+    n_legacy = sum(len(r) for r in legacy)
+    n_columnar = sum(len(r) for r in columnar)
+    same = n_legacy == n_columnar and all(
+        np.array_equal(np.array(l, dtype=float), np.array(c.tolist(), dtype=float))
+        for l, c in zip(legacy, columnar)
+    )
+
+    print(f"companies={args.companies} facts={n_columnar} identical_output={same}")
+    print(f"{'transform':<16}{'seconds':>10}{'facts/sec':>14}")
+    print(f"{'iterrows loop':<16}{legacy_s:>10.3f}{n_legacy / legacy_s:>14.0f}")
+    print(f"{'columnar':<16}{columnar_s:>10.3f}{n_columnar / columnar_s:>14.0f}")
+    print(f"speedup: {legacy_s / columnar_s:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
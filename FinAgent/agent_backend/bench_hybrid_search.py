@@ -0,0 +1,116 @@
+# bench_hybrid_search.py
+#
+# get_similar_companies / get_similar_accounts with and without the hybrid
+# lexical layer, over the saved catalogues (or, when data/ has none, stores
+# built in a temporary directory from data.py with fake_embedding_server's
+# deterministic vectors; never written to data/). Query embeddings are faked with
+# a fixed delay (--latency-ms) standing in for the ada-002 round trip, so the
+# table shows how many lookups skip it and what that does to latency. Top-1
+# is only scored for classes with a known answer, and only the hybrid rows
+# are meaningful: with fake query vectors the vector ranking is arbitrary.
+#
+#   python bench_hybrid_search.py --latency-ms 150
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import numpy as np
+import agent_wrapper as aw
+from data import SAMPLE_ACCOUNTS, SAMPLE_COMPANIES
+from embedding_store import write_embedding_store
+from fake_embedding_server import fake_vector
+from hybrid_search import LexicalIndex, invert_translations, parse_aliases
+from read_and_fill_facts import ACCOUNT_TRANSLATIONS
+from vector_index import AccountVectorIndex, load_index
+
+TURKISH_UPPER = str.maketrans({'i': 'İ', 'ı': 'I'})
+
+
+def query_sets() -> dict[str, tuple[str, list[tuple[str, str | None]]]]:
+    """name -> (company|account, [(query, expected id or None)])"""
+    tickers = [(c['ticker'], c['ticker']) for c in SAMPLE_COMPANIES]
+    tickers += [(c['ticker'].lower(), c['ticker']) for c in SAMPLE_COMPANIES]
+    names = []
+    for c in SAMPLE_COMPANIES:
+        names.append((c['name'], c['ticker']))
+        names.append((c['name'].translate(TURKISH_UPPER).upper(), c['ticker']))
+        names += [(a.strip(), c['ticker']) for a in c['aliases'].split(',')[1:]]
+    labels = [(label, code) for label, code in list(ACCOUNT_TRANSLATIONS.items())[:40]]
+    labels += [(label.translate(TURKISH_UPPER).upper(), code) for label, code in list(ACCOUNT_TRANSLATIONS.items())[:40]]
+    return {
+        'company ticker': ('company', tickers),
+        'company name/alias': ('company', names),
+        'company free text': ('company', [(q, None) for q in ('national airline', 'oil refinery', 'glass maker')]),
+        'account TR label': ('account', labels),
+        'account free text': ('account', [(q, None) for q in ('cash at bank', 'money owed by customers')]),
+    }
+
+
+async def run(kind: str, queries, lexicons: bool, latency: float):
+    aw.company_lexicon = LexicalIndex(aw.company_index.rows, 'ticker', parse_aliases(SAMPLE_COMPANIES, 'ticker')) \
+        if lexicons else None
+    aw.account_lexicon = LexicalIndex(aw.account_index.rows, 'code', invert_translations(ACCOUNT_TRANSLATIONS)) \
+        if lexicons else None
+    calls = 0
+    rng = np.random.default_rng(0)
+
+    async def fake_embedding(text: str) -> list[float]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(latency)
+        return rng.standard_normal(aw.company_index.matrix.shape[1]).astype(np.float32)
+
+    aw.get_embedding_async = fake_embedding
+    correct = 0
+    start = time.perf_counter()
+    for text, expected in queries:
+        if kind == 'company':
+            top = (await aw.similar_companies(text))[0]['ticker']
+        else:
+            top = (await aw.similar_accounts(text))[0]['code']
+        correct += top == expected
+    return calls, (time.perf_counter() - start) / len(queries) * 1000, correct
+
+
+def write_fake_catalogues(data_dir: str) -> None:
+    for filename, id_field, items in (('account', 'code', SAMPLE_ACCOUNTS), ('company', 'ticker', SAMPLE_COMPANIES)):
+        ids = [it[id_field] for it in items]
+        names = [it['name'] for it in items]
+        descs = [it['description'] for it in items]
+        vectors = [fake_vector(f"{i} | {n} | {d}") for i, n, d in zip(ids, names, descs)]
+        write_embedding_store(os.path.join(data_dir, filename), ids, names, descs, vectors)
+
+
+def load_indexes(data_dir: str) -> bool:
+    aw.company_index = load_index(data_dir, 'company', 'ticker')
+    aw.account_index = load_index(data_dir, 'account', 'code', index_cls=AccountVectorIndex)
+    return aw.company_index is not None and aw.account_index is not None
+
+
+async def report(latency_ms: float):
+    print(f"embedding latency {latency_ms:.0f} ms")
+    print(f"{'queries':<22}{'n':>5}{'mode':>9}{'embeds':>8}{'ms/query':>10}{'top-1':>8}")
+    for name, (kind, queries) in query_sets().items():
+        for mode, lexicons in (('vector', False), ('hybrid', True)):
+            calls, ms, correct = await run(kind, queries, lexicons, latency_ms / 1000)
+            top1 = '' if queries[0][1] is None else f"{correct}/{len(queries)}"
+            print(f"{name:<22}{len(queries):>5}{mode:>9}{calls:>8}{ms:>10.2f}{top1:>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency-ms', type=float, default=150.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not load_indexes(aw.DATA_DIR):
+            print(f"No saved catalogues in {aw.DATA_DIR}; using fake-vector catalogues.")
+            write_fake_catalogues(tmp)
+            load_indexes(tmp)
+        await report(args.latency_ms)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
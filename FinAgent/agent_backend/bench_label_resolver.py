@@ -0,0 +1,82 @@
+# bench_label_resolver.py
+#
+# Label -> account code mapping over a synthetic label column shaped like a
+# full-market load (every ACCOUNT_TRANSLATIONS label, a share of them
+# perturbed the way exports vary: Turkish upper case, ASCII-only letters,
+# spacing around parentheses, doubled spaces, a dropped letter), repeated
+# for --periods periods and --files workbooks:
+#
+#   exact map   labels.str.strip().map(ACCOUNT_TRANSLATIONS), the old path
+#   resolver    LabelResolver.resolve_column, cold (fresh resolver per run)
+#               and warm (resolutions cached, as for every file after the first)
+#
+#   python bench_label_resolver.py --files 50 --periods 76 --perturbed 0.3
+
+import argparse
+import random
+import time
+import numpy as np
+import pandas as pd
+from read_and_fill_facts import ACCOUNT_TRANSLATIONS
+from label_resolver import LabelResolver
+
+TURKISH_UPPER = str.maketrans({'i': 'İ', 'ı': 'I'})
+ASCII = str.maketrans('çğıöşüÇĞİÖŞÜ', 'cgiosuCGIOSU')
+
+
+def perturb(label: str, rng: random.Random) -> str:
+    kind = rng.randrange(5)
+    if kind == 0:
+        return label.translate(TURKISH_UPPER).upper()
+    if kind == 1:
+        return label.translate(ASCII)
+    if kind == 2:
+        return label.replace('(', '( ').replace(')', ' )')
+    if kind == 3:
+        return ' ' + label.replace(' ', '  ')
+    i = rng.randrange(1, len(label) - 1)
+    return label[:i] + label[i + 1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--periods', type=int, default=76)
+    parser.add_argument('--perturbed', type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    expected, files = [], []
+    for _ in range(args.files):
+        labels = []
+        for label in ACCOUNT_TRANSLATIONS:
+            labels.append(perturb(label, rng) if rng.random() < args.perturbed else label)
+        files.append(pd.Series(pd.Categorical(np.tile(labels, args.periods))))
+        expected.append(np.tile(list(ACCOUNT_TRANSLATIONS.values()), args.periods))
+    rows = sum(len(f) for f in files)
+
+    def run(fn) -> tuple[float, int, int]:
+        start, results = time.perf_counter(), [fn(labels) for labels in files]
+        seconds = time.perf_counter() - start
+        right = wrong = 0
+        for codes, want in zip(results, expected):
+            codes = np.asarray(pd.Series(codes).astype(object).where(pd.notna(codes), None))
+            right += int((codes == want).sum())
+            wrong += int(((codes != want) & (codes != None)).sum())   # noqa: E711
+        return seconds, right, wrong
+
+    resolver = LabelResolver(ACCOUNT_TRANSLATIONS)
+    variants = [
+        ('exact map', lambda labels: labels.astype(str).str.strip().map(ACCOUNT_TRANSLATIONS)),
+        ('resolver, cold', lambda labels: LabelResolver(ACCOUNT_TRANSLATIONS).resolve_column(labels)[0]),
+        ('resolver, warm', lambda labels: resolver.resolve_column(labels)[0]),
+    ]
+    print(f"files={args.files} rows={rows} perturbed={args.perturbed:.0%} of labels")
+    print(f"{'path':<18}{'seconds':>10}{'rows/sec':>14}{'correct':>10}{'wrong':>8}")
+    for name, fn in variants:
+        seconds, right, wrong = run(fn)
+        print(f"{name:<18}{seconds:>10.3f}{rows / seconds:>14.0f}{right / rows:>10.1%}{wrong / rows:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# bench_search_statements.py
+#
+# Account search with children, database side only (random query vectors,
+# no embedding calls):
+#
+#   legacy    match query + children query, vector as a text literal,
+#             parsed and planned on every call
+#   prepared  one CTE statement from search_statements; psycopg2 runs it as
+#             a server-side PREPAREd statement, asyncpg as a driver-prepared
+#             statement with the vector in binary
+#
+#   python bench_search_statements.py --runs 500
+
+import argparse
+import asyncio
+import json
+import time
+import asyncpg
+import numpy as np
+from psycopg2.extras import RealDictCursor
+from db_pool import DB_PARAMS, get_pool
+from async_db import init_async_pool, close_async_pool
+from search_statements import ACCOUNT_SEARCH_WITH_CHILDREN, execute_prepared
+from pgvector_codec import Vector
+
+MATCHES = """
+    SELECT a.account_id, a.code, a.name, a.description, p.code AS parent_code
+    FROM account a LEFT JOIN account p ON a.parent_account_id = p.account_id
+    ORDER BY a.embedding <=> {vec}::vector LIMIT {limit};
+"""
+CHILDREN = """
+    SELECT a.code, a.name, a.description, p.code AS parent_code
+    FROM account a LEFT JOIN account p ON a.parent_account_id = p.account_id
+    WHERE a.parent_account_id = ANY({ids});
+"""
+
+
+def text_literal(vec: np.ndarray) -> str:
+    return "[" + ",".join(map(str, vec.tolist())) + "]"
+
+
+def legacy_sync(cur, vec, limit):
+    cur.execute(MATCHES.format(vec='%s', limit='%s'), (text_literal(vec), limit))
+    matches = cur.fetchall()
+    cur.execute(CHILDREN.format(ids='%s'), ([m['account_id'] for m in matches],))
+    children = cur.fetchall()
+    return [m['code'] for m in matches], sorted(c['code'] for c in children)
+
+
+def prepared_sync(cur, vec, limit):
+    execute_prepared(cur, 'account_search_with_children', (Vector(vec), limit))
+    rows = cur.fetchall()
+    return [r['code'] for r in rows], sorted(c['code'] for r in rows for c in r['children'])
+
+
+async def legacy_async(conn, vec, limit):
+    matches = await conn.fetch(MATCHES.format(vec='$1', limit='$2'), text_literal(vec), limit)
+    children = await conn.fetch(CHILDREN.format(ids='$1::int[]'), [m['account_id'] for m in matches])
+    return [m['code'] for m in matches], sorted(c['code'] for c in children)
+
+
+async def prepared_async(conn, vec, limit):
+    rows = await conn.fetch(ACCOUNT_SEARCH_WITH_CHILDREN, vec, limit)
+    return [r['code'] for r in rows], sorted(c['code'] for r in rows for c in json.loads(r['children']))
+
+
+def report(label: str, samples: list[float]) -> None:
+    print(f"{label:<18}{np.mean(samples):>10.3f}{np.percentile(samples, 50):>10.3f}{np.percentile(samples, 95):>10.3f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.runs, 1536)).astype(np.float32)
+
+    print(f"{'variant':<18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    with get_pool().connection() as conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+        assert legacy_sync(cur, vectors[0], args.limit) == prepared_sync(cur, vectors[0], args.limit)
+        for label, fn in (('legacy sync', legacy_sync), ('prepared sync', prepared_sync)):
+            samples = []
+            for vec in vectors:
+                start = time.perf_counter()
+                fn(cur, vec, args.limit)
+                samples.append((time.perf_counter() - start) * 1000)
+            report(label, samples)
+
+    # the pool's connections carry the binary vector codec; legacy runs on a plain one
+    plain = await asyncpg.connect(database=DB_PARAMS['dbname'], user=DB_PARAMS['user'],
+                                  password=DB_PARAMS['password'], host=DB_PARAMS['host'],
+                                  port=int(DB_PARAMS['port']))
+    pool = await init_async_pool()
+    try:
+        async with pool.acquire() as conn:
+            assert await legacy_async(plain, vectors[0], args.limit) == await prepared_async(conn, vectors[0], args.limit)
+            for label, fn, c in (('legacy async', legacy_async, plain), ('prepared async', prepared_async, conn)):
+                samples = []
+                for vec in vectors:
+                    start = time.perf_counter()
+                    await fn(c, vec, args.limit)
+                    samples.append((time.perf_counter() - start) * 1000)
+                report(label, samples)
+    finally:
+        await plain.close()
+        await close_async_pool()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
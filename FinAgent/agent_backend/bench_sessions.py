@@ -0,0 +1,100 @@
+# bench_sessions.py
+#
+# Session store cost and effect over synthetic conversations. Every turn
+# looks like a typical answer: a company search, an account search (5 hits
+# each, with descriptions), one get_fact and a short answer.
+#
+#   input size   characters of run input at each turn when replaying every
+#                earlier item verbatim, against the compacted session
+#                (resolved entities + trimmed history)
+#   store        get + record_turn per turn for --sessions conversations,
+#                in memory and with the SQLite backend, with the LRU capped
+#                at --max-sessions so most lookups go through eviction and
+#                reload from disk
+#
+#   python bench_sessions.py --turns 20 --sessions 5000 --max-sessions 500
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'fake')
+
+from agents import Agent
+from agents.items import MessageOutputItem, ToolCallItem, ToolCallOutputItem
+from openai.types.responses import ResponseFunctionToolCall, ResponseOutputMessage, ResponseOutputText
+from session_store import Session, SessionDisk, SessionStore, _items_chars
+
+AGENT = Agent(name="bench")
+
+
+def tool_pair(n: int, name: str, args: dict, output) -> list:
+    call = ResponseFunctionToolCall(id=f"fc_{n}", call_id=f"call_{n}", name=name, type='function_call',
+                                    arguments=json.dumps(args), status='completed')
+    out = {'type': 'function_call_output', 'call_id': f"call_{n}", 'output': str(output)}
+    return [ToolCallItem(agent=AGENT, raw_item=call), ToolCallOutputItem(agent=AGENT, raw_item=out, output=output)]
+
+
+def turn_items(turn: int) -> tuple[str, list]:
+    desc = "Synthetic description of the entity, about as long as the catalogue ones. " * 3
+    companies = [{'ticker': f"T{turn}{i}", 'name': f"Company {turn}-{i} A.Ş.", 'description': desc} for i in range(5)]
+    accounts = [{'code': f"ACC_{turn}_{i}", 'name': f"Account {turn}-{i}", 'description': desc,
+                 'ancestors': ['TOTAL_ASSETS'], 'children': [f"ACC_{turn}_{i}_{j}" for j in range(4)]}
+                for i in range(5)]
+    fact = json.dumps({'ticker': f"T{turn}0", 'account': f"ACC_{turn}_0", 'period': '2024Q4', 'value': 1234567})
+    answer = ResponseOutputMessage(id=f"msg_{turn}", role='assistant', status='completed', type='message',
+                                   content=[ResponseOutputText(text="The value is 1,234,567 TRY. " * 10,
+                                                               annotations=[], type='output_text')])
+    items = (tool_pair(3 * turn, 'get_similar_companies', {'company_name_prompt': f"company {turn}"}, companies)
+             + tool_pair(3 * turn + 1, 'get_similar_accounts', {'account_query_prompt': f"account {turn}"}, accounts)
+             + tool_pair(3 * turn + 2, 'get_fact', {'ticker': f"T{turn}0", 'account_code': f"ACC_{turn}_0",
+                                                    'year': 2024, 'quarter': 4}, fact)
+             + [MessageOutputItem(agent=AGENT, raw_item=answer)])
+    return f"What about company {turn} in 2024Q4?", items
+
+
+async def store_run(store: SessionStore, sessions: int, turns: int, conversations: list) -> float:
+    start = time.perf_counter()
+    for t in range(turns):
+        for s in range(sessions):
+            session = await store.get(f"session-{s}")
+            session.input_for(conversations[t][0])
+            await store.record_turn(session, *conversations[t])
+    return (time.perf_counter() - start) / (sessions * turns) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--max-sessions', type=int, default=500)
+    args = parser.parse_args()
+    conversations = [turn_items(t) for t in range(args.turns)]
+
+    print(f"{'turn':>6}{'replay chars':>16}{'session chars':>16}{'turns kept':>12}")
+    session, replay = Session('size'), []
+    for t, (message, items) in enumerate(conversations, start=1):
+        replay_input = replay + [{'role': 'user', 'content': message}]
+        session_input = session.input_for(message)
+        if t in (1, 2, 5, 10, args.turns):
+            print(f"{t:>6}{_items_chars(replay_input):>16}{_items_chars(session_input):>16}{len(session.turns):>12}")
+        replay = replay_input + [item.to_input_item() for item in items]
+        session.record_turn(message, items)
+
+    print(f"\nsessions={args.sessions} turns={args.turns} max_sessions={args.max_sessions}")
+    print(f"{'store':<10}{'ms/turn':>10}{'evictions':>11}{'disk hits':>11}")
+    memory = SessionStore(max_sessions=args.max_sessions)
+    ms = await store_run(memory, args.sessions, args.turns, conversations)
+    print(f"{'memory':<10}{ms:>10.3f}{memory.evictions:>11}{memory.disk_hits:>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = SessionStore(max_sessions=args.max_sessions, disk=SessionDisk(os.path.join(tmp, 'sessions.sqlite3')))
+        ms = await store_run(disk, args.sessions, args.turns, conversations)
+        print(f"{'sqlite':<10}{ms:>10.3f}{disk.evictions:>11}{disk.disk_hits:>11}")
+        disk.disk.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# bench_sql_cache.py
+#
+# query_with_sql latency for repeated lookups with and without the result
+# cache, over a few typical statements written with different spacing and
+# keyword case (all normalize to the same key).
+#
+#   python bench_sql_cache.py --runs 500
+
+import argparse
+import asyncio
+import time
+import numpy as np
+import agent_wrapper
+from sql_cache import get_sql_cache, normalize_sql
+from sql_guard import run_guarded_query
+from async_db import init_async_pool, close_async_pool
+
+VARIANTS = [
+    "SELECT year, quarter, value FROM fact_wide WHERE ticker = 'KCHOL' AND account_code = 'TOTAL_ASSETS' ORDER BY year, quarter;",
+    "select year,quarter,value\n  from fact_wide\n where ticker='KCHOL' and account_code='TOTAL_ASSETS'\n order by year, quarter",
+    "SELECT year, quarter, value -- KCHOL assets\nFROM FACT_WIDE WHERE TICKER = 'KCHOL' AND ACCOUNT_CODE = 'TOTAL_ASSETS' ORDER BY YEAR, QUARTER",
+]
+
+
+async def timed(call, runs: int) -> list[float]:
+    samples = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await call(VARIANTS[i % len(VARIANTS)])
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=500)
+    args = parser.parse_args()
+    assert len({normalize_sql(v) for v in VARIANTS}) == 1
+
+    await init_async_pool()
+    try:
+        uncached = await timed(run_guarded_query, args.runs)
+        cached = await timed(agent_wrapper.query_with_sql_async, args.runs)
+    finally:
+        await close_async_pool()
+
+    print(f"{'mode':<10}{'mean us':>12}{'p50 us':>12}{'p95 us':>12}")
+    for label, samples in (('uncached', uncached), ('cached', cached)):
+        print(f"{label:<10}{np.mean(samples):>12.1f}{np.percentile(samples, 50):>12.1f}"
+              f"{np.percentile(samples, 95):>12.1f}")
+    print(get_sql_cache().stats())
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
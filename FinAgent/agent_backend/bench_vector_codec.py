@@ -0,0 +1,136 @@
+# bench_vector_codec.py
+#
+# pgvector encodings on the read and write paths, against the
+# '[' + ','.join(map(str, vec)) + ']' literals the helpers used to build:
+#
+#   insert  execute_values with str() literals / with the Vector adapter /
+#           binary COPY (what insert_table uses)
+#   search  psycopg2 with str() literals / with the Vector adapter, asyncpg
+#           with str() literals / with the binary codec the pool registers
+#
+#   python bench_vector_codec.py --vectors 2000 --queries 500
+
+import argparse
+import asyncio
+import time
+import asyncpg
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+from db_pool import DB_PARAMS
+from async_db import init_async_pool, close_async_pool
+from bulk_loader import copy_rows
+from pgvector_codec import Vector, encode_vector_binary, vector_text
+
+SEARCH = "SELECT code FROM account ORDER BY embedding <=> {param} LIMIT 5"
+
+
+def legacy_literal(vec) -> str:
+    return '[' + ','.join(map(str, vec)) + ']'
+
+
+def bench_encoding(vectors: np.ndarray) -> None:
+    as_lists = vectors.astype(np.float64).tolist()   # what the embedding API returns
+    print(f"\nencoding one vector ({vectors.shape[1]} dims)")
+    print(f"{'encoder':<22}{'us/vector':>12}{'bytes':>10}")
+    for name, fn, data in (('str() literal', legacy_literal, as_lists),
+                           ('vector_text', vector_text, vectors),
+                           ('binary', encode_vector_binary, vectors)):
+        start = time.perf_counter()
+        for v in data:
+            out = fn(v)
+        per = (time.perf_counter() - start) / len(data) * 1e6
+        print(f"{name:<22}{per:>12.1f}{len(out):>10}")
+
+
+def bench_insert(conn, vectors: np.ndarray) -> None:
+    cols = ['code', 'name', 'description', 'embedding']
+    rows = [(f"CODE_{i}", f"Name {i}", f"Description {i}", v) for i, v in enumerate(vectors)]
+    variants = {
+        'str() literal': lambda cur: execute_values(
+            cur, "INSERT INTO bench_vec VALUES %s",
+            [(c, n, d, legacy_literal(v.astype(np.float64).tolist())) for c, n, d, v in rows]),
+        'Vector adapter': lambda cur: execute_values(
+            cur, "INSERT INTO bench_vec VALUES %s", [(c, n, d, Vector(v)) for c, n, d, v in rows]),
+        'COPY binary': lambda cur: copy_rows(cur, 'bench_vec', cols, ['text', 'text', 'text', 'vector'],
+                                             rows, fmt='binary'),
+    }
+    print(f"\ninsert ({len(rows)} rows)")
+    print(f"{'path':<22}{'seconds':>12}{'rows/sec':>12}")
+    for name, load in variants.items():
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE bench_vec AS SELECT code, name, description, embedding "
+                        "FROM account WITH NO DATA;")
+            start = time.perf_counter()
+            load(cur)
+            seconds = time.perf_counter() - start
+        conn.rollback()
+        print(f"{name:<22}{seconds:>12.3f}{len(rows) / seconds:>12.0f}")
+
+
+def bench_search_sync(conn, queries: np.ndarray) -> list[tuple[str, float]]:
+    as_lists = queries.astype(np.float64).tolist()
+    results = []
+    with conn.cursor() as cur:
+        for name, sql, encode, data in (
+                ('psycopg2 str()', SEARCH.format(param='%s::vector'), legacy_literal, as_lists),
+                ('psycopg2 Vector', SEARCH.format(param='%s'), Vector, queries)):
+            start = time.perf_counter()
+            for v in data:
+                cur.execute(sql, (encode(v),))
+                cur.fetchall()
+            results.append((name, time.perf_counter() - start))
+    conn.rollback()
+    return results
+
+
+async def bench_search_async(queries: np.ndarray) -> list[tuple[str, float]]:
+    as_lists = queries.astype(np.float64).tolist()
+    plain = await asyncpg.connect(database=DB_PARAMS['dbname'], user=DB_PARAMS['user'],
+                                  password=DB_PARAMS['password'], host=DB_PARAMS['host'],
+                                  port=int(DB_PARAMS['port']))
+    pool = await init_async_pool()
+    results = []
+    try:
+        start = time.perf_counter()
+        for v in as_lists:
+            await plain.fetch(SEARCH.format(param='$1::vector'), legacy_literal(v))
+        results.append(('asyncpg str()', time.perf_counter() - start))
+        async with pool.acquire() as conn:
+            start = time.perf_counter()
+            for v in queries:
+                await conn.fetch(SEARCH.format(param='$1'), v)
+            results.append(('asyncpg binary', time.perf_counter() - start))
+    finally:
+        await plain.close()
+        await close_async_pool()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, 1536)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, 1536)).astype(np.float32)
+
+    bench_encoding(queries)
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        bench_insert(conn, vectors)
+        search = bench_search_sync(conn, queries)
+    finally:
+        conn.close()
+    search += asyncio.run(bench_search_async(queries))
+
+    print(f"\nsearch ({args.queries} queries, top 5 accounts)")
+    print(f"{'path':<22}{'ms/query':>12}{'queries/sec':>12}")
+    for name, seconds in search:
+        print(f"{name:<22}{seconds / args.queries * 1000:>12.3f}{args.queries / seconds:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
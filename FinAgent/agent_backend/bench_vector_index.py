@@ -0,0 +1,80 @@
+# bench_vector_index.py
+#
+# Per-query latency of the in-memory VectorIndex versus the pgvector path
+# (search_accounts_with_children / _search_companies) for account and company
+# lookups. Query embeddings are precomputed so only the search is timed.
+# The database half is skipped when Postgres is not reachable.
+#
+#   python bench_vector_index.py --queries 200
+
+import argparse
+import os
+import time
+import numpy as np
+
+os.environ.setdefault('OPENAI_API_KEY', 'fake')
+os.environ.setdefault('QUERY_EMBEDDING_CACHE_PATH', '')
+
+import psycopg2
+from data import SAMPLE_ACCOUNTS, SAMPLE_COMPANIES
+from vector_index import AccountVectorIndex, VectorIndex, load_index
+import agent_wrapper
+
+
+def synthetic_index(items: list[dict], id_field: str, index_cls: type, dim: int = 1536):
+    rng = np.random.default_rng(0)
+    rows = [{id_field: it[id_field], 'name': it['name'], 'description': it['description']} for it in items]
+    return index_cls(rows, rng.standard_normal((len(rows), dim)).astype(np.float32))
+
+
+def timed(fn, queries) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    account_index = load_index(agent_wrapper.DATA_DIR, 'account', 'code', index_cls=AccountVectorIndex) \
+        or synthetic_index(SAMPLE_ACCOUNTS, 'code', AccountVectorIndex)
+    company_index = load_index(agent_wrapper.DATA_DIR, 'company', 'ticker') \
+        or synthetic_index(SAMPLE_COMPANIES, 'ticker', VectorIndex)
+
+    rng = np.random.default_rng(1)
+    vecs = rng.standard_normal((args.queries, account_index.matrix.shape[1])).astype(np.float32)
+    texts = [f"benchmark query {i}" for i in range(args.queries)]
+    # prime the query-embedding cache so the DB path skips the embedding call
+    cache = agent_wrapper.get_query_embedding_cache()
+    for t, v in zip(texts, vecs):
+        cache.get_or_compute(t, lambda _t, v=v: v.tolist())
+
+    results = [
+        ('accounts, in-memory', timed(lambda i: account_index.search_with_children(vecs[i]), range(args.queries))),
+        ('companies, in-memory', timed(lambda i: company_index.search(vecs[i], 5, ['ticker', 'name', 'description']), range(args.queries))),
+    ]
+
+    try:
+        psycopg2.connect(**agent_wrapper.DB_PARAMS, connect_timeout=2).close()
+        db_available = True
+    except psycopg2.OperationalError as e:
+        db_available = False
+        print(f"Postgres not reachable, skipping pgvector path: {e}".strip())
+
+    if db_available:
+        results += [
+            ('accounts, pgvector', timed(agent_wrapper.search_accounts_with_children, texts)),
+            ('companies, pgvector', timed(agent_wrapper._search_companies, texts)),
+        ]
+
+    print(f"accounts={len(account_index)} companies={len(company_index)} queries={args.queries}")
+    print(f"{'path':<24}{'us/query':>12}")
+    for name, us in results:
+        print(f"{name:<24}{us:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
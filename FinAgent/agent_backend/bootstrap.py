@@ -0,0 +1,448 @@
+# bootstrap.py
+#
+# Idempotent, incremental database bootstrap. Every load step records a
+# fingerprint of its inputs (source-file hash, embedding model, schema
+# version) in `bootstrap_state`; on startup only steps whose fingerprint
+# changed are re-applied, so a restart against a populated database is a
+# handful of cheap queries. HNSW indexes are rebuilt only when embeddings
+# were (re)loaded.
+#
+# The catalogue embedding stores in data/ are not versioned: they are built
+# from data.py with the configured EMBEDDING_MODEL when missing or when the
+# catalogue text or model changed.
+#
+#   python bootstrap.py            # apply pending migrations and deltas
+#   python bootstrap.py --force    # re-run every step
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import psycopg2
+from psycopg2.extras import Json
+from db_pool import DB_PARAMS, get_pool
+from embedding_service import EMBEDDING_MODEL
+from embedding_store import ensure_embedding_store, store_files
+from data import SAMPLE_ACCOUNTS, SAMPLE_COMPANIES
+from create_hierarchy_map import PARENT_ACCOUNT_MAP, update_parent_accounts
+from fact_views import FACT_PIVOT_MAX_DEPTH, refresh_fact_views
+from account_tree import fill_account_closure, refresh_account_rollups
+from derived_metrics import DERIVED_METRICS, recompute_derived
+from label_resolver import resolver_fingerprint
+from sql_cache import bump_sql_version
+from read_and_fill_facts import (
+    ACCOUNT_TRANSLATIONS, COMPANY_CONFIGS, SHEET_NAME,
+    read_and_fill_facts
+)
+from agent_wrapper import (
+    DATA_DIR, create_hnsw, fill_periods_table, insert_table, load_embeddings, period_records, save_embeddings
+)
+
+# Arbitrary key for pg_advisory_lock, so concurrent workers bootstrap once
+BOOTSTRAP_LOCK_ID = 4_201_337
+
+# Ordered schema migrations: (version, name, sql). Never edit an applied one;
+# append a new version instead.
+SCHEMA_MIGRATIONS: list[tuple[int, str, str]] = [
+    (1, 'baseline schema', """
+        CREATE EXTENSION IF NOT EXISTS vector;
+
+        CREATE TABLE IF NOT EXISTS account (
+          account_id   SERIAL PRIMARY KEY,
+          code         TEXT   NOT NULL UNIQUE,
+          parent_account_id  INTEGER NULL REFERENCES account(account_id) ON DELETE CASCADE,
+          name         TEXT   NOT NULL UNIQUE,
+          description  TEXT   NOT NULL,
+          embedding    vector(1536)
+        );
+        CREATE INDEX IF NOT EXISTS idx_account_parent ON account(parent_account_id);
+
+        CREATE TABLE IF NOT EXISTS company (
+          company_id   SERIAL PRIMARY KEY,
+          ticker       TEXT   NOT NULL UNIQUE,
+          name         TEXT   NOT NULL UNIQUE,
+          description  TEXT   NOT NULL,
+          embedding    vector(1536)
+        );
+
+        CREATE TABLE IF NOT EXISTS period (
+          period_id   SERIAL PRIMARY KEY,
+          quarter     INTEGER NOT NULL,
+          year        INTEGER NOT NULL,
+          CONSTRAINT uq_period_year_quarter UNIQUE (year, quarter)
+        );
+
+        CREATE TABLE IF NOT EXISTS financial_fact (
+          fact_id       SERIAL       PRIMARY KEY,
+          company_id    INTEGER      NOT NULL REFERENCES company(company_id) ON DELETE CASCADE,
+          period_id     INTEGER      NOT NULL REFERENCES period(period_id) ON DELETE CASCADE,
+          account_id    INTEGER      NOT NULL REFERENCES account(account_id) ON DELETE CASCADE,
+          value         NUMERIC(18,2) NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_fin_fact_company ON financial_fact(company_id);
+        CREATE INDEX IF NOT EXISTS idx_fin_fact_period  ON financial_fact(period_id);
+        CREATE INDEX IF NOT EXISTS idx_fin_fact_account ON financial_fact(account_id);
+    """),
+    (2, 'bootstrap state', """
+        CREATE TABLE IF NOT EXISTS bootstrap_state (
+          step         TEXT        PRIMARY KEY,
+          fingerprint  TEXT        NOT NULL,
+          details      JSONB       NOT NULL DEFAULT '{}'::jsonb,
+          applied_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """),
+    (3, 'financial_fact natural key', """
+        -- one-shot dedup: keep the newest row per (company, account, period)
+        DELETE FROM financial_fact
+        WHERE fact_id IN (
+          SELECT fact_id FROM (
+            SELECT fact_id,
+                   row_number() OVER (PARTITION BY company_id, account_id, period_id
+                                      ORDER BY fact_id DESC) AS rn
+            FROM financial_fact
+          ) ranked
+          WHERE rn > 1
+        );
+
+        -- unique covering index: serves the upserts and lets
+        -- "account X for company Y across all quarters" run as an index-only scan
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_fin_fact_company_account_period
+          ON financial_fact (company_id, account_id, period_id) INCLUDE (value);
+
+        -- its leading column makes the single-column company index redundant
+        DROP INDEX IF EXISTS idx_fin_fact_company;
+    """),
+    (4, 'fact_wide read model', """
+        -- denormalized facts for the SQL tool, maintained by fact_views.refresh_fact_views;
+        -- fact_pivot is created there too, since its columns follow the account hierarchy
+        CREATE TABLE IF NOT EXISTS fact_wide (
+          ticker        TEXT          NOT NULL,
+          company_name  TEXT          NOT NULL,
+          account_code  TEXT          NOT NULL,
+          account_name  TEXT          NOT NULL,
+          parent_code   TEXT          NULL,
+          year          INTEGER       NOT NULL,
+          quarter       INTEGER       NOT NULL,
+          value         NUMERIC(18,2) NOT NULL,
+          company_id    INTEGER       NOT NULL,
+          account_id    INTEGER       NOT NULL,
+          period_id     INTEGER       NOT NULL,
+          PRIMARY KEY (ticker, account_code, year, quarter)
+        );
+        CREATE INDEX IF NOT EXISTS idx_fact_wide_account_period ON fact_wide (account_code, year, quarter);
+        CREATE INDEX IF NOT EXISTS idx_fact_wide_company ON fact_wide (company_id);
+    """),
+    (5, 'account closure and rollups', """
+        -- every (ancestor, descendant) pair of the account tree, depth 0 = self
+        CREATE TABLE IF NOT EXISTS account_closure (
+          ancestor_id    INTEGER NOT NULL REFERENCES account(account_id) ON DELETE CASCADE,
+          descendant_id  INTEGER NOT NULL REFERENCES account(account_id) ON DELETE CASCADE,
+          depth          INTEGER NOT NULL,
+          PRIMARY KEY (ancestor_id, descendant_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_account_closure_descendant ON account_closure (descendant_id, ancestor_id);
+
+        -- per company/period sum of leaf facts under every parent account
+        CREATE TABLE IF NOT EXISTS account_rollup (
+          company_id  INTEGER       NOT NULL REFERENCES company(company_id) ON DELETE CASCADE,
+          account_id  INTEGER       NOT NULL REFERENCES account(account_id) ON DELETE CASCADE,
+          period_id   INTEGER       NOT NULL REFERENCES period(period_id) ON DELETE CASCADE,
+          value       NUMERIC(18,2) NOT NULL,
+          leaf_count  INTEGER       NOT NULL,
+          PRIMARY KEY (company_id, account_id, period_id)
+        );
+
+        ALTER TABLE fact_wide ADD COLUMN IF NOT EXISTS rollup_value NUMERIC(18,2);
+    """),
+    (6, 'fact change log', """
+        -- appended by every writer of financial_fact or the fact views; NULL company_ids = all companies
+        CREATE TABLE IF NOT EXISTS fact_change_log (
+          change_id    BIGSERIAL   PRIMARY KEY,
+          company_ids  INTEGER[],
+          changed_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """),
+    (7, 'account label resolutions', """
+        -- label_resolver cache: non-exact sheet label -> account code, NULL code = unmapped;
+        -- method 'manual' rows are operator overrides and are never overwritten
+        CREATE TABLE IF NOT EXISTS account_label_resolution (
+          label         TEXT        PRIMARY KEY,
+          account_code  TEXT,
+          method        TEXT        NOT NULL,
+          score         REAL,
+          translations  TEXT,
+          resolved_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """),
+    (8, 'sql data version', """
+        -- bumped (sql_cache.bump_sql_version) by every writer of a table the SQL tool reads;
+        -- the SQL result cache is tagged with it. fact_change_log is for fact writers only.
+        CREATE TABLE IF NOT EXISTS data_version (
+          name     TEXT   PRIMARY KEY,
+          version  BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO data_version (name) VALUES ('sql') ON CONFLICT DO NOTHING;
+    """),
+]
+
+
+def fingerprint(*parts) -> str:
+    """Stable sha256 over JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_sha256(path: str) -> str | None:
+    """sha256 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def embedding_fingerprint(filename: str, id_field: str) -> str | None:
+    """Embedding version: model name + hashes of the EmbeddingStore files save_embeddings wrote."""
+    base = os.path.join(DATA_DIR, filename)
+    if not ensure_embedding_store(base, id_field):
+        return None
+    hashes = [file_sha256(f) for f in store_files(base)]
+    if None in hashes:
+        return None
+    return fingerprint(EMBEDDING_MODEL, hashes)
+
+
+def apply_migrations(cur) -> list[int]:
+    """Apply pending SCHEMA_MIGRATIONS in order; returns the versions applied."""
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version     INTEGER     PRIMARY KEY,
+          name        TEXT        NOT NULL,
+          applied_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations;")
+    done = {v for (v,) in cur.fetchall()}
+    applied = []
+    for version, name, sql in SCHEMA_MIGRATIONS:
+        if version in done:
+            continue
+        cur.execute(sql)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+            (version, name)
+        )
+        cur.connection.commit()
+        print(f"Applied schema migration {version}: {name}")
+        applied.append(version)
+    return applied
+
+
+def schema_version(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+
+def _load_state() -> dict[str, str]:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT step, fingerprint FROM bootstrap_state;")
+        return dict(cur.fetchall())
+
+
+def _mark(step: str, fp: str, details: dict) -> None:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO bootstrap_state (step, fingerprint, details, applied_at)
+            VALUES (%s, %s, %s, now())
+            ON CONFLICT (step) DO UPDATE
+              SET fingerprint = EXCLUDED.fingerprint,
+                  details     = EXCLUDED.details,
+                  applied_at  = EXCLUDED.applied_at;
+            """,
+            (step, fp, Json(details))
+        )
+
+
+def vacuum_analyze(table: str) -> None:
+    """VACUUM (ANALYZE) outside a transaction: refreshes planner stats and the
+    visibility map, which index-only scans depend on after a bulk load."""
+    conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"VACUUM (ANALYZE) {table};")
+    finally:
+        conn.close()
+
+
+def _hnsw_index_missing(table: str) -> bool:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s;",
+            (table, f"{table}_embedding_hnsw_idx")
+        )
+        return cur.fetchone() is None
+
+
+def _company_ids(tickers: list[str]) -> list[int]:
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT company_id FROM company WHERE ticker = ANY(%s);", (tickers,))
+        return [cid for (cid,) in cur.fetchall()]
+
+
+def run_bootstrap(force: bool = False) -> dict:
+    """
+    Bring the database up to date with the current code and source files.
+    Returns a summary {'migrations': [...], 'applied': [...], 'skipped': [...], 'seconds': float}.
+    """
+    started = time.perf_counter()
+    applied, skipped = [], []
+
+    # dedicated session for the advisory lock, so loaders can use the pool freely
+    lock_conn = psycopg2.connect(**DB_PARAMS)
+    try:
+        with lock_conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s);", (BOOTSTRAP_LOCK_ID,))
+            migrations = apply_migrations(cur)
+            version = schema_version(cur)
+            lock_conn.commit()
+
+        state = {} if force else _load_state()
+
+        def step(name: str, fp: str | None, details: dict, action) -> bool:
+            if fp is None:
+                print(f"Bootstrap step {name}: source missing, skipped.")
+                skipped.append(name)
+                return False
+            if state.get(name) == fp:
+                skipped.append(name)
+                return False
+            action()
+            _mark(name, fp, {**details, 'schema_version': version})
+            applied.append(name)
+            return True
+
+        # 0) Catalogue embedding stores: also rebuilt when the files are gone
+        #    (new container, wiped data/), whatever bootstrap_state says
+        for filename, id_field, items in (('account', 'code', SAMPLE_ACCOUNTS),
+                                          ('company', 'ticker', SAMPLE_COMPANIES)):
+            name = f"embeddings:{filename}"
+            fp = fingerprint(EMBEDDING_MODEL, [(it[id_field], it['name'], it['description']) for it in items])
+            if state.get(name) == fp and ensure_embedding_store(os.path.join(DATA_DIR, filename), id_field):
+                skipped.append(name)
+                continue
+            save_embeddings(items, id_field, filename)
+            _mark(name, fp, {'embedding_model': EMBEDDING_MODEL, 'schema_version': version})
+            applied.append(name)
+
+        # 1) Account & company catalogues (embedding version)
+        acct_fp = embedding_fingerprint('account', 'code')
+        accounts_changed = step(
+            'accounts', acct_fp, {'embedding_model': EMBEDDING_MODEL},
+            lambda: insert_table(load_embeddings('account', 'code'), 'account', 'code',
+                                 ['code', 'name', 'description', 'embedding'])
+        )
+        comp_fp = embedding_fingerprint('company', 'ticker')
+        companies_changed = step(
+            'companies', comp_fp, {'embedding_model': EMBEDDING_MODEL},
+            lambda: insert_table(load_embeddings('company', 'ticker'), 'company', 'ticker',
+                                 ['ticker', 'name', 'description', 'embedding'])
+        )
+
+        # 2) Hierarchy and periods
+        hierarchy_changed = step('account_hierarchy', acct_fp and fingerprint(PARENT_ACCOUNT_MAP, acct_fp), {},
+                                 update_parent_accounts)
+        closure_changed = step('account_closure', acct_fp and fingerprint(PARENT_ACCOUNT_MAP, acct_fp), {},
+                               fill_account_closure)
+        periods_fp = fingerprint(period_records())
+        periods_changed = step('periods', periods_fp, {}, fill_periods_table)
+        if accounts_changed or companies_changed or hierarchy_changed or periods_changed:
+            # the catalogue loaders write on their own connections
+            with get_pool().connection() as conn, conn.cursor() as cur:
+                bump_sql_version(cur)
+
+        # 3) Facts: only companies whose workbook (or the mapping) changed
+        with get_pool().connection() as conn, conn.cursor() as cur:
+            resolver_fp = resolver_fingerprint(cur)
+        mapping_fp = fingerprint(ACCOUNT_TRANSLATIONS, SHEET_NAME, periods_fp, comp_fp, resolver_fp)
+        pending = []
+        for cfg in COMPANY_CONFIGS:
+            source_hash = file_sha256(cfg['excel_path'])
+            name = f"facts:{cfg['ticker']}"
+            if source_hash is None:
+                print(f"Bootstrap step {name}: {cfg['excel_path']} not found, skipped.")
+                skipped.append(name)
+            elif state.get(name) == fingerprint(source_hash, mapping_fp):
+                skipped.append(name)
+            else:
+                pending.append((cfg, name, source_hash))
+        loaded_ids = []
+        if pending:
+            summary = read_and_fill_facts([cfg for cfg, _, _ in pending], replace=True)
+            loaded = set(summary['loaded'])
+            if loaded:
+                loaded_ids = _company_ids(sorted(loaded))
+            for cfg, name, source_hash in pending:
+                if cfg['ticker'] not in loaded:
+                    # parse failure: leave the step pending so the next start retries it
+                    skipped.append(name)
+                    continue
+                _mark(name, fingerprint(source_hash, mapping_fp),
+                      {'source_file': cfg['excel_path'], 'source_sha256': source_hash,
+                       'schema_version': version})
+                applied.append(name)
+            vacuum_analyze('financial_fact')
+
+        # 4) Derived metrics, parent-account rollups, then the denormalized views
+        #    for the SQL tool: full rebuild when the formulas, catalogue,
+        #    hierarchy, schema or pivot layout changed, otherwise only the
+        #    reloaded companies (and only their changed derived cells)
+        derived_changed = step('derived_metrics', fingerprint(DERIVED_METRICS, acct_fp), {},
+                               recompute_derived)
+        if not derived_changed and loaded_ids:
+            recompute_derived(loaded_ids)
+        if closure_changed or derived_changed:
+            refresh_account_rollups()
+        elif loaded_ids:
+            refresh_account_rollups(loaded_ids)
+        views_fp = fingerprint(acct_fp, comp_fp, PARENT_ACCOUNT_MAP, FACT_PIVOT_MAX_DEPTH,
+                               DERIVED_METRICS, version)
+        views_rebuilt = step('fact_views', views_fp, {'pivot_max_depth': FACT_PIVOT_MAX_DEPTH},
+                             refresh_fact_views)
+        if not views_rebuilt and loaded_ids:
+            refresh_fact_views(loaded_ids)
+        if views_rebuilt or loaded_ids:
+            vacuum_analyze('fact_wide')
+            vacuum_analyze('fact_pivot')
+
+        # 5) HNSW indexes only when embeddings changed
+        for table, changed in (('account', accounts_changed), ('company', companies_changed)):
+            if changed or _hnsw_index_missing(table):
+                create_hnsw(table)
+                applied.append(f"hnsw:{table}")
+    finally:
+        try:
+            lock_conn.rollback()
+            with lock_conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s);", (BOOTSTRAP_LOCK_ID,))
+            lock_conn.commit()
+        finally:
+            lock_conn.close()
+
+    seconds = time.perf_counter() - started
+    print(f"Bootstrap finished in {seconds:.3f}s: applied {applied or 'nothing'}, "
+          f"{len(skipped)} steps up to date.")
+    return {'migrations': migrations, 'applied': applied, 'skipped': skipped, 'seconds': seconds}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Incremental FinAgent database bootstrap")
+    parser.add_argument('--force', action='store_true', help="re-run every step")
+    args = parser.parse_args()
+    run_bootstrap(force=args.force)
@@ -0,0 +1,205 @@
+# bulk_loader.py
+#
+# COPY ... FROM STDIN loaders for full-market loads. Rows are encoded into an
+# in-memory buffer (PostgreSQL text or binary COPY format) and streamed to the
+# server whenever the buffer reaches BULK_BATCH_ROWS rows or
+# BULK_MAX_BUFFER_BYTES bytes, so memory stays bounded regardless of input size.
+
+import io
+import os
+import struct
+import numpy as np
+import pandas as pd
+from fact_pipeline import FACT_COLUMNS, FACT_KEY, dedupe_facts
+from pgvector_codec import encode_vector_binary, vector_text
+
+BULK_COPY_FORMAT = os.getenv('BULK_COPY_FORMAT', 'binary')   # 'binary' or 'text'
+BULK_BATCH_ROWS = int(os.getenv('BULK_BATCH_ROWS', '200000'))
+BULK_MAX_BUFFER_BYTES = int(os.getenv('BULK_MAX_BUFFER_BYTES', str(64 * 1024 * 1024)))
+
+PGCOPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+PGCOPY_TRAILER = struct.pack('!h', -1)
+
+# Binary COPY tuple layout for a fact row staged as (int4, int4, int4, float8)
+_FACT_BINARY_DTYPE = np.dtype([
+    ('nfields', '>i2'),
+    ('len_company', '>i4'), ('company_id', '>i4'),
+    ('len_period', '>i4'), ('period_id', '>i4'),
+    ('len_account', '>i4'), ('account_id', '>i4'),
+    ('len_value', '>i4'), ('value', '>f8'),
+])
+
+_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in ('binary', 'text'):
+        raise ValueError(f"Unsupported COPY format: {fmt}")
+
+
+def _copy(cur, table: str, columns: list[str], fmt: str, payload: bytes) -> None:
+    if fmt == 'binary':
+        payload = PGCOPY_HEADER + payload + PGCOPY_TRAILER
+    cols = ', '.join(columns)
+    cur.copy_expert(f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT {fmt})", io.BytesIO(payload))
+
+
+# --- ENCODERS ---
+def encode_facts_binary(records: np.ndarray) -> bytes:
+    """FACT_DTYPE records → binary COPY tuples (value as float8), one vectorized pass."""
+    out = np.empty(len(records), dtype=_FACT_BINARY_DTYPE)
+    out['nfields'] = 4
+    out['len_company'] = out['len_period'] = out['len_account'] = 4
+    out['len_value'] = 8
+    for name in FACT_COLUMNS:
+        out[name] = records[name]
+    return out.tobytes()
+
+
+def encode_facts_text(records: np.ndarray) -> bytes:
+    """FACT_DTYPE records → text COPY lines."""
+    return pd.DataFrame(records).to_csv(
+        sep='\t', header=False, index=False, na_rep='\\N', lineterminator='\n'
+    ).encode('utf-8')
+
+
+def encode_row_binary(row: tuple, kinds: list[str]) -> bytes:
+    """One binary COPY tuple; kinds are 'text', 'int4', 'float8' or 'vector'."""
+    parts = [struct.pack('!h', len(row))]
+    for value, kind in zip(row, kinds):
+        if value is None:
+            parts.append(struct.pack('!i', -1))
+            continue
+        if kind == 'text':
+            data = str(value).encode('utf-8')
+        elif kind == 'int4':
+            data = struct.pack('!i', int(value))
+        elif kind == 'float8':
+            data = struct.pack('!d', float(value))
+        elif kind == 'vector':
+            data = encode_vector_binary(value)
+        else:
+            raise ValueError(f"Unsupported column kind: {kind}")
+        parts.append(struct.pack('!i', len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+
+def encode_row_text(row: tuple, kinds: list[str]) -> bytes:
+    fields = []
+    for value, kind in zip(row, kinds):
+        if value is None:
+            fields.append('\\N')
+        elif kind == 'vector':
+            fields.append(vector_text(value))
+        else:
+            fields.append(str(value).translate(_TEXT_ESCAPES))
+    return ('\t'.join(fields) + '\n').encode('utf-8')
+
+
+# --- LOADERS ---
+def copy_fact_records(cur,
+                      records: np.ndarray,
+                      table: str = 'financial_fact',
+                      fmt: str = BULK_COPY_FORMAT,
+                      batch_rows: int = BULK_BATCH_ROWS,
+                      max_buffer_bytes: int = BULK_MAX_BUFFER_BYTES,
+                      upsert: bool = True) -> int:
+    """
+    Stream FACT_DTYPE records into `table` with COPY. Returns the number of rows loaded.
+
+    With upsert (the default) rows are COPYed into a float8 staging table and
+    moved over with INSERT ... ON CONFLICT (company_id, account_id, period_id)
+    DO UPDATE, so reloading a company overwrites its facts instead of
+    duplicating them. The last record wins for a repeated key, and rows are
+    loaded in key order. Without upsert, text format copies straight into
+    `table` (binary still stages, since NUMERIC has no cheap binary encoding).
+    """
+    _check_format(fmt)
+    if upsert:
+        records = dedupe_facts(records)
+    if not len(records):
+        return 0
+    row_bytes = _FACT_BINARY_DTYPE.itemsize if fmt == 'binary' else 48
+    step = max(1, min(batch_rows, max_buffer_bytes // row_bytes))
+    cols = ', '.join(FACT_COLUMNS)
+    staged = upsert or fmt == 'binary'
+    move_sql = f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _fact_stage"
+    if upsert:
+        move_sql += f" ON CONFLICT ({', '.join(FACT_KEY)}) DO UPDATE SET value = EXCLUDED.value"
+
+    if staged:
+        cur.execute(
+            """
+            CREATE TEMP TABLE IF NOT EXISTS _fact_stage (
+              company_id INTEGER, period_id INTEGER, account_id INTEGER, value DOUBLE PRECISION
+            ) ON COMMIT DROP;
+            """
+        )
+
+    encode = encode_facts_binary if fmt == 'binary' else encode_facts_text
+    for start in range(0, len(records), step):
+        chunk = records[start:start + step]
+        if staged:
+            _copy(cur, '_fact_stage', FACT_COLUMNS, fmt, encode(chunk))
+            cur.execute(move_sql + ";")
+            cur.execute("TRUNCATE _fact_stage;")
+        else:
+            _copy(cur, table, FACT_COLUMNS, fmt, encode(chunk))
+    return len(records)
+
+
+def copy_rows(cur,
+              table: str,
+              columns: list[str],
+              kinds: list[str],
+              rows,
+              fmt: str = BULK_COPY_FORMAT,
+              batch_rows: int = BULK_BATCH_ROWS,
+              max_buffer_bytes: int = BULK_MAX_BUFFER_BYTES) -> int:
+    """
+    Stream an iterable of row tuples into `table` with COPY, flushing the
+    buffer every `batch_rows` rows or `max_buffer_bytes` bytes. Handles text,
+    integer, float and pgvector columns. Returns the number of rows loaded.
+    """
+    _check_format(fmt)
+    encode = encode_row_binary if fmt == 'binary' else encode_row_text
+    buf = io.BytesIO()
+    pending = total = 0
+    for row in rows:
+        buf.write(encode(row, kinds))
+        pending += 1
+        if pending >= batch_rows or buf.tell() >= max_buffer_bytes:
+            _copy(cur, table, columns, fmt, buf.getvalue())
+            total += pending
+            buf, pending = io.BytesIO(), 0
+    if pending:
+        _copy(cur, table, columns, fmt, buf.getvalue())
+        total += pending
+    return total
+
+
+def copy_upsert_rows(cur,
+                     table: str,
+                     columns: list[str],
+                     kinds: list[str],
+                     rows,
+                     conflict_column: str,
+                     fmt: str = BULK_COPY_FORMAT,
+                     batch_rows: int = BULK_BATCH_ROWS,
+                     max_buffer_bytes: int = BULK_MAX_BUFFER_BYTES) -> int:
+    """
+    COPY rows into a typed temp staging table, then upsert them into `table`
+    on `conflict_column` in one statement.
+    """
+    stage = f"_{table}_stage"
+    cols = ', '.join(columns)
+    cur.execute(f"DROP TABLE IF EXISTS {stage};")
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {cols} FROM {table} WITH NO DATA;")
+    n = copy_rows(cur, stage, columns, kinds, rows, fmt, batch_rows, max_buffer_bytes)
+    updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c != conflict_column)
+    cur.execute(
+        f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} "
+        f"ON CONFLICT ({conflict_column}) DO UPDATE SET {updates};"
+    )
+    return n
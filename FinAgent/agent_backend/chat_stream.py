@@ -0,0 +1,118 @@
+# chat_stream.py
+#
+# Server-sent events for /chat/stream. A Runner.run_streamed run is turned
+# into a small event vocabulary the frontend renders as it arrives:
+#
+#   start       {trace_id}                          sent before the run starts
+#   delta       {text}                              model output token(s)
+#   tool_start  {call_id, name, arguments}          the model called a tool
+#   tool_end    {call_id, name, output}             the tool returned (output
+#                                                   cut to STREAM_TOOL_OUTPUT_CHARS)
+#   final       {response, trace_id}                the run's final output
+#   error       {detail}                            the run failed
+#
+# While a tool runs nothing is produced, so an SSE comment is sent every
+# STREAM_KEEPALIVE_SECONDS; that keeps proxies from timing the connection
+# out and makes a closed client show up as a failed send. However the
+# stream ends (client gone, error, done) the run is cancelled, so a
+# disconnected browser does not keep tools and model calls going.
+
+import asyncio
+import json
+import os
+from collections.abc import AsyncIterator
+from openai.types.responses import ResponseOutputItemDoneEvent, ResponseTextDeltaEvent
+
+STREAM_KEEPALIVE_SECONDS = float(os.getenv('STREAM_KEEPALIVE_SECONDS', '10'))
+STREAM_TOOL_OUTPUT_CHARS = int(os.getenv('STREAM_TOOL_OUTPUT_CHARS', '500'))
+
+STREAM_STATS = {'started': 0, 'completed': 0, 'cancelled': 0, 'failed': 0}
+
+
+async def run_events(result) -> AsyncIterator[dict]:
+    """
+    Chat events for a RunResultStreaming, ending with 'final'. The run is
+    cancelled when the consumer stops early.
+    """
+    tool_names: dict[str, str] = {}
+    outcome = 'cancelled'
+    STREAM_STATS['started'] += 1
+    try:
+        async for event in result.stream_events():
+            if event.type == 'raw_response_event':
+                data = event.data
+                if isinstance(data, ResponseTextDeltaEvent) and data.delta:
+                    yield {'event': 'delta', 'text': data.delta}
+                # the model's tool call, as soon as it is complete: the run item for it
+                # is only emitted once the tools of that turn have finished
+                elif isinstance(data, ResponseOutputItemDoneEvent) and data.item.type == 'function_call':
+                    tool_names[data.item.call_id] = data.item.name
+                    yield {'event': 'tool_start', 'call_id': data.item.call_id, 'name': data.item.name,
+                           'arguments': data.item.arguments}
+            elif event.type == 'run_item_stream_event' and event.item.type == 'tool_call_output_item':
+                raw = event.item.raw_item
+                call_id = raw.get('call_id') if isinstance(raw, dict) else getattr(raw, 'call_id', None)
+                yield {'event': 'tool_end', 'call_id': call_id, 'name': tool_names.get(call_id),
+                       'output': str(event.item.output)[:STREAM_TOOL_OUTPUT_CHARS]}
+        # stream_events() swallows a cancellation and just stops, so re-raise it here
+        if asyncio.current_task().cancelling():
+            raise asyncio.CancelledError
+        outcome = 'completed'
+        yield {'event': 'final', 'response': result.final_output}
+    except Exception:
+        outcome = 'failed'
+        raise
+    finally:
+        if outcome != 'completed':
+            result.cancel()
+        STREAM_STATS[outcome] += 1
+
+
+def sse(event: dict) -> str:
+    """One SSE frame: the 'event' key becomes the event name, the rest is JSON data."""
+    data = {k: v for k, v in event.items() if k != 'event'}
+    return f"event: {event['event']}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def sse_stream(events: AsyncIterator[dict], trace_id: str,
+                     keepalive: float = STREAM_KEEPALIVE_SECONDS) -> AsyncIterator[str]:
+    """
+    SSE frames for a chat event stream: 'start' immediately, keep-alive
+    comments while it is idle, 'error' if it raises. Closing this generator
+    (client disconnect) cancels the producer, which cancels the run.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put({'event': 'error', 'detail': str(e)})
+        finally:
+            await queue.put(done)
+
+    yield sse({'event': 'start', 'trace_id': trace_id})
+    producer = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is done:
+                break
+            if event['event'] == 'final':
+                event['trace_id'] = trace_id
+            yield sse(event)
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        await events.aclose()
+
+
+def chat_stream_stats() -> dict:
+    return dict(STREAM_STATS)
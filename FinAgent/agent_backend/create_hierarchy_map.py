@@ -110,24 +110,24 @@ PARENT_ACCOUNT_MAP: Dict[str, Optional[str]] = {
     'TOTAL_EQUITY': 'TOTAL_RESOURCES',
 
     'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT' : 'TOTAL_EQUITY',
-    'PAID_IN_CAPITAL' : 'TOTAL_EQUITY',
-    'CAPITAL_ADJUSTMENT_DIFFERENCES' : 'TOTAL_EQUITY',
-    'MERGER_EQUALISATION_ACCOUNT' : 'TOTAL_EQUITY',
-    'ADDITIONAL_PAID_IN_CAPITAL' : 'TOTAL_EQUITY',
-    'CAPITAL_ADVANCE' : 'TOTAL_EQUITY',
-    'TREASURY_SHARES' : 'TOTAL_EQUITY',
-    'RECIPROCAL_INVESTMENT_CAPITAL_ADJUSTMENT' : 'TOTAL_EQUITY',
-    'SHARE_PREMIUMS' : 'TOTAL_EQUITY',
-    'EFFECT_OF_BUSINESS_COMBINATIONS_UNDER_COMMON_CONTROL' : 'TOTAL_EQUITY',
-    'SHARE_BASED_PAYMENTS' : 'TOTAL_EQUITY',
-    'ACCUMULATED_OTHER_COMPREHENSIVE_INCOME_NOT_RECLASSIFIED' : 'TOTAL_EQUITY',
-    'ACCUMULATED_OTHER_COMPREHENSIVE_INCOME_RECLASSIFIED' : 'TOTAL_EQUITY',
-    'RESTRICTED_RESERVES_APPROPRIATED_FROM_PROFIT' : 'TOTAL_EQUITY',
-    'OTHER_EQUITY_INTERESTS' : 'TOTAL_EQUITY',
-    'OTHER_RESERVES' : 'TOTAL_EQUITY',
-    'DIVIDEND_ADVANCES_PAID_NET' : 'TOTAL_EQUITY',
-    'RETAINED_EARNINGS' : 'TOTAL_EQUITY',
-    'PROFIT_OR_LOSS_FOR_THE_PERIOD' : 'TOTAL_EQUITY',
+    'PAID_IN_CAPITAL' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'CAPITAL_ADJUSTMENT_DIFFERENCES' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'MERGER_EQUALISATION_ACCOUNT' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'ADDITIONAL_PAID_IN_CAPITAL' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'CAPITAL_ADVANCE' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'TREASURY_SHARES' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'RECIPROCAL_INVESTMENT_CAPITAL_ADJUSTMENT' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'SHARE_PREMIUMS' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'EFFECT_OF_BUSINESS_COMBINATIONS_UNDER_COMMON_CONTROL' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'SHARE_BASED_PAYMENTS' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'ACCUMULATED_OTHER_COMPREHENSIVE_INCOME_NOT_RECLASSIFIED' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'ACCUMULATED_OTHER_COMPREHENSIVE_INCOME_RECLASSIFIED' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'RESTRICTED_RESERVES_APPROPRIATED_FROM_PROFIT' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'OTHER_EQUITY_INTERESTS' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'OTHER_RESERVES' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'DIVIDEND_ADVANCES_PAID_NET' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'RETAINED_EARNINGS' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
+    'PROFIT_OR_LOSS_FOR_THE_PERIOD' : 'EQUITY_ATTRIBUTABLE_TO_OWNERS_OF_PARENT',
     'NON_CONTROLLING_INTERESTS' : 'TOTAL_EQUITY',
 
     'NET_FOREIGN_CURRENCY_POSITION_INCLUDING_HEDGE' : None,
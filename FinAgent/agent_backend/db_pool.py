@@ -0,0 +1,242 @@
+# db_pool.py
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+
+# Load environment variables for DB connection
+load_dotenv()
+DB_PARAMS = {
+    'dbname': os.getenv('DB_NAME', 'database_trial'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres'),
+    'host': os.getenv('DB_HOST', 'postgres'),
+    'port': os.getenv('DB_PORT', '5432')
+}
+
+# Pool configuration
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+# Session default for pgvector HNSW search effort, applied once per connection
+DB_HNSW_EF_SEARCH = int(os.getenv('DB_HNSW_EF_SEARCH', '200'))
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 connection pool.
+
+    - grows lazily from `minconn` up to `maxconn` connections
+    - `getconn` blocks up to `timeout` seconds, then raises PoolTimeout
+    - connections idle longer than `health_check_interval` are pinged on
+      checkout and transparently replaced if dead
+    - `session_settings` (e.g. {'hnsw.ef_search': 200}) are applied once,
+      when a connection is opened
+    """
+
+    def __init__(self,
+                 dsn_params: dict = DB_PARAMS,
+                 minconn: int = DB_POOL_MIN,
+                 maxconn: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 session_settings: dict | None = None,
+                 health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"invalid pool size: min={minconn} max={maxconn}")
+        self.dsn_params = dsn_params
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.session_settings = session_settings or {}
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()   # (connection, last_used)
+        self._size = 0                # open connections, idle + in use
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {'checkouts': 0, 'timeouts': 0, 'replaced': 0, 'wait_seconds': 0.0}
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.dsn_params)
+        if self.session_settings:
+            with conn.cursor() as cur:
+                for name, value in self.session_settings.items():
+                    cur.execute("SELECT set_config(%s, %s, false);", (name, str(value)))
+            conn.commit()
+        return conn
+
+    def _is_alive(self, conn) -> bool:
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def getconn(self, timeout: float | None = None):
+        """Check out a connection, waiting at most `timeout` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        conn, last_used = None, None
+        with self._cond:
+            if self._closed:
+                raise psycopg2.InterfaceError("connection pool is closed")
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"no connection available within {timeout}s "
+                            f"({self._in_use}/{self.maxconn} in use)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+            self._counters['wait_seconds'] += time.monotonic() - started
+
+        try:
+            if conn is None:
+                return self._connect()
+            stale = time.monotonic() - last_used > self.health_check_interval
+            if conn.closed or (stale and not self._is_alive(conn)):
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+                with self._cond:
+                    self._counters['replaced'] += 1
+                return self._connect()
+            return conn
+        except Exception:
+            self._discard()
+            raise
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a connection; open transactions are rolled back, broken connections dropped."""
+        keep = not discard and not conn.closed
+        if keep:
+            status = conn.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                keep = False
+            elif status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    keep = False
+        if not keep:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+        with self._cond:
+            self._in_use -= 1
+            if keep and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                if keep:
+                    conn.close()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        """Check out a connection; commit on success, roll back on error."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def stats(self) -> dict:
+        """Pool saturation metrics."""
+        with self._cond:
+            checkouts = self._counters['checkouts']
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'min': self.minconn,
+                'max': self.maxconn,
+                'saturation': self._in_use / self.maxconn,
+                'checkouts': checkouts,
+                'timeouts': self._counters['timeouts'],
+                'replaced': self._counters['replaced'],
+                'avg_wait_ms': 1000 * self._counters['wait_seconds'] / checkouts if checkouts else 0.0,
+            }
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+            self._cond.notify_all()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(**kwargs) -> ConnectionPool:
+    """Create the shared pool (called once at FastAPI startup)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            kwargs.setdefault('session_settings', {'hnsw.ef_search': DB_HNSW_EF_SEARCH})
+            _pool = ConnectionPool(**kwargs)
+    return _pool
+
+
+def get_pool() -> ConnectionPool:
+    """Shared pool; created with defaults on first use outside FastAPI (scripts, benchmarks)."""
+    return _pool or init_pool()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
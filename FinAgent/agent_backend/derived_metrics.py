@@ -0,0 +1,206 @@
+# derived_metrics.py
+#
+# Declarative derived accounts. Each metric is a formula over account codes
+# ("TOTAL_LIABILITIES = TOTAL_SHORT_TERM_LIABILITIES + TOTAL_LONG_TERM_LIABILITIES");
+# recompute_derived loads the inputs for the requested companies/periods into
+# one (account x company x period) NumPy cube, evaluates every formula over
+# the whole cube in declaration order, upserts only the cells whose
+# rounded value changed and deletes stored cells that no longer evaluate
+# (an input was removed by a reload). Formulas may use earlier derived metrics.
+
+import ast
+import numpy as np
+from db_pool import get_pool
+from fact_pipeline import FACT_DTYPE
+from bulk_loader import copy_fact_records
+from fact_cube import log_fact_change
+
+# Evaluated top to bottom. 'name'/'description' are used to create the
+# account row when the code is not in the catalogue yet. Values are stored
+# as NUMERIC(18,2), so ratios are expressed in percent.
+DERIVED_METRICS: list[dict] = [
+    {
+        'formula': 'TOTAL_LIABILITIES = TOTAL_SHORT_TERM_LIABILITIES + TOTAL_LONG_TERM_LIABILITIES',
+    },
+    {
+        'formula': 'DEBT_TO_ASSETS = 100 * TOTAL_LIABILITIES / TOTAL_ASSETS',
+        'name': 'Debt to Assets Ratio (%)',
+        'description': 'Total liabilities as a percentage of total assets.',
+    },
+]
+
+
+def _nan_add(a, b):
+    # SUM semantics: a missing operand counts as 0 unless both are missing
+    return np.where(np.isnan(a) & np.isnan(b), np.nan, np.nan_to_num(a) + np.nan_to_num(b))
+
+
+def _nan_sub(a, b):
+    return np.where(np.isnan(a) & np.isnan(b), np.nan, np.nan_to_num(a) - np.nan_to_num(b))
+
+
+_BINOPS = {ast.Add: _nan_add, ast.Sub: _nan_sub, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+def parse_formula(formula: str) -> tuple[str, ast.expr, list[str]]:
+    """'CODE = expr' → (CODE, expression AST, input codes). Only + - * /, numbers and codes."""
+    target, sep, expr = formula.partition('=')
+    target = target.strip()
+    if not sep or not target.isidentifier():
+        raise ValueError(f"Formula must look like 'CODE = expression': {formula!r}")
+    tree = ast.parse(expr.strip(), mode='eval').body
+    inputs: list[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id not in inputs:
+                inputs.append(node.id)
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in _BINOPS:
+                raise ValueError(f"Unsupported operator in {formula!r}")
+        elif isinstance(node, ast.UnaryOp):
+            if not isinstance(node.op, ast.USub):
+                raise ValueError(f"Unsupported operator in {formula!r}")
+        elif isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant in {formula!r}")
+        elif not isinstance(node, (ast.operator, ast.unaryop, ast.Load)):
+            raise ValueError(f"Unsupported syntax in {formula!r}")
+    return target, tree, inputs
+
+
+def evaluate(tree: ast.expr, lookup) -> np.ndarray:
+    """Evaluate a parsed formula; `lookup(code)` returns that account's company x period slice."""
+    if isinstance(tree, ast.Name):
+        return lookup(tree.id)
+    if isinstance(tree, ast.Constant):
+        return np.float64(tree.value)
+    if isinstance(tree, ast.UnaryOp):
+        return -evaluate(tree.operand, lookup)
+    return _BINOPS[type(tree.op)](evaluate(tree.left, lookup), evaluate(tree.right, lookup))
+
+
+def compile_metrics(metrics: list[dict] = DERIVED_METRICS) -> list[tuple[str, ast.expr, list[str], dict]]:
+    """Parse every metric and check each one only uses base accounts or earlier metrics."""
+    compiled, defined = [], set()
+    targets = {parse_formula(m['formula'])[0] for m in metrics}
+    for m in metrics:
+        code, tree, inputs = parse_formula(m['formula'])
+        later = [c for c in inputs if c in targets and c not in defined and c != code]
+        if later or code in inputs:
+            raise ValueError(f"{code} depends on a metric defined after it: {later or [code]}")
+        compiled.append((code, tree, inputs, m))
+        defined.add(code)
+    return compiled
+
+
+def derived_codes(metrics: list[dict] = DERIVED_METRICS) -> list[str]:
+    return [parse_formula(m['formula'])[0] for m in metrics]
+
+
+def derived_account_ids(cur, metrics: list[dict] = DERIVED_METRICS) -> list[int]:
+    cur.execute("SELECT account_id FROM account WHERE code = ANY(%s);", (derived_codes(metrics),))
+    return [aid for (aid,) in cur.fetchall()]
+
+
+def ensure_derived_accounts(cur, metrics: list[dict] = DERIVED_METRICS) -> None:
+    """Create catalogue rows for derived codes that are not accounts yet (no embedding)."""
+    for code, _, _, m in compile_metrics(metrics):
+        cur.execute(
+            """
+            INSERT INTO account (code, name, description)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (code) DO NOTHING;
+            """,
+            (code, m.get('name', code), m.get('description', m['formula']))
+        )
+
+
+def describe_derived_metrics(metrics: list[dict] = DERIVED_METRICS) -> str:
+    """Agent-instruction text listing the derived accounts and their formulas."""
+    lines = [f"{m['formula']}" + (f" ({m['name']})" if 'name' in m else '') for m in metrics]
+    return ("Derived accounts are precomputed and stored like any other account: "
+            + "; ".join(lines) + ".\n")
+
+
+def recompute_derived(company_ids: list[int] | None = None,
+                      period_ids: list[int] | None = None,
+                      metrics: list[dict] = DERIVED_METRICS) -> dict:
+    """
+    Re-evaluate every derived metric for `company_ids` x `period_ids`
+    (default: all) and upsert the cells whose value changed. Cells whose
+    inputs are missing (or divide by zero) are not stored, and a stored fact
+    for such a cell is deleted.
+    Returns {'cells': evaluated cells, 'changed': upserted facts, 'deleted': deleted facts}.
+    """
+    compiled = compile_metrics(metrics)
+    codes = list(dict.fromkeys(c for code, _, inputs, _ in compiled for c in [*inputs, code]))
+    targets = [code for code, _, _, _ in compiled]
+
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        ensure_derived_accounts(cur, metrics)
+        cur.execute("SELECT code, account_id FROM account WHERE code = ANY(%s);", (codes,))
+        code_ids = dict(cur.fetchall())
+        missing = [c for c in codes if c not in code_ids]
+        if missing:
+            raise ValueError(f"Derived metrics reference unknown accounts: {missing}")
+
+        cur.execute(
+            """
+            SELECT company_id, period_id, account_id, value::float8
+            FROM financial_fact
+            WHERE account_id = ANY(%(accounts)s)
+              AND (%(companies)s::int[] IS NULL OR company_id = ANY(%(companies)s::int[]))
+              AND (%(periods)s::int[] IS NULL OR period_id = ANY(%(periods)s::int[]));
+            """,
+            {'accounts': [code_ids[c] for c in codes], 'companies': company_ids, 'periods': period_ids}
+        )
+        rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 4)
+        if not len(rows):
+            print("No input facts for derived metrics.")
+            return {'cells': 0, 'changed': 0, 'deleted': 0}
+
+        # (account, company, period) cube, NaN = no fact
+        companies, ci = np.unique(rows[:, 0].astype(np.int64), return_inverse=True)
+        periods, pi = np.unique(rows[:, 1].astype(np.int64), return_inverse=True)
+        account_pos = {code_ids[c]: i for i, c in enumerate(codes)}
+        ai = np.array([account_pos[a] for a in rows[:, 2].astype(np.int64)])
+        cube = np.full((len(codes), len(companies), len(periods)), np.nan)
+        cube[ai, ci, pi] = rows[:, 3]
+
+        target_pos = [codes.index(t) for t in targets]
+        before = np.round(cube[target_pos], 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for code, tree, _, _ in compiled:
+                result = evaluate(tree, lambda c: cube[codes.index(c)])
+                cube[codes.index(code)] = np.where(np.isfinite(result), result, np.nan)
+        after = np.round(cube[target_pos], 2)
+
+        changed = ~np.isnan(after) & (np.isnan(before) | (after != before))
+        t_idx, c_idx, p_idx = np.nonzero(changed)
+        records = np.empty(len(t_idx), dtype=FACT_DTYPE)
+        records['company_id'] = companies[c_idx]
+        records['period_id'] = periods[p_idx]
+        records['account_id'] = [code_ids[targets[t]] for t in t_idx]
+        records['value'] = after[changed]
+        copy_fact_records(cur, records)
+
+        stale = ~np.isnan(before) & np.isnan(after)
+        t_idx, c_idx, p_idx = np.nonzero(stale)
+        if len(t_idx):
+            cur.execute(
+                """
+                DELETE FROM financial_fact f
+                USING UNNEST(%s::int[], %s::int[], %s::int[]) AS s(company_id, account_id, period_id)
+                WHERE f.company_id = s.company_id AND f.account_id = s.account_id
+                  AND f.period_id = s.period_id;
+                """,
+                (companies[c_idx].tolist(), [code_ids[targets[t]] for t in t_idx], periods[p_idx].tolist())
+            )
+        touched = np.union1d(records['company_id'], companies[c_idx])
+        if len(touched):
+            log_fact_change(cur, touched.tolist())
+
+    cells = int((~np.isnan(after)).sum())
+    print(f"Derived metrics: evaluated {cells} cells, upserted {len(records)} changed facts, "
+          f"deleted {len(t_idx)} stale facts.")
+    return {'cells': cells, 'changed': len(records), 'deleted': len(t_idx)}
@@ -0,0 +1,314 @@
+# embedding_service.py
+
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from openai import OpenAI
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Embedding configuration
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-ada-002')
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '64'))
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv('EMBEDDING_MAX_IN_FLIGHT', '4'))
+EMBEDDING_CACHE_PATH = os.getenv(
+    'EMBEDDING_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'embedding_cache.sqlite3')
+)
+
+# Query-embedding cache configuration (empty path = memory only)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '1024'))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv('QUERY_EMBEDDING_CACHE_TTL', '3600'))
+QUERY_EMBEDDING_CACHE_PATH = os.getenv(
+    'QUERY_EMBEDDING_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), 'data', 'query_embedding_cache.sqlite3')
+)
+
+
+def text_hash(text: str) -> str:
+    """Content address of a text: hex sha256 of its UTF-8 bytes."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed embedding store keyed by (model, sha256(text)).
+    Vectors are kept as float32 blobs in a single SQLite file.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding (
+              model      TEXT    NOT NULL,
+              text_hash  TEXT    NOT NULL,
+              dim        INTEGER NOT NULL,
+              vector     BLOB    NOT NULL,
+              PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: list[str]) -> dict[str, np.ndarray]:
+        """Return {text_hash: vector} for every hash present in the cache."""
+        found: dict[str, np.ndarray] = {}
+        # stay well below SQLite's bound-parameter limit
+        step = 500
+        with self._lock:
+            for i in range(0, len(hashes), step):
+                chunk = hashes[i:i + step]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embedding "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, items: list[tuple[str, np.ndarray]]) -> None:
+        """Store (text_hash, vector) pairs, replacing any existing entries."""
+        rows = [
+            (model, h, int(vec.shape[0]), np.asarray(vec, dtype=np.float32).tobytes())
+            for h, vec in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding (model, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """
+    Batched, cached embedding client.
+
+    Inputs are de-duplicated, looked up in the persistent cache, and only the
+    misses are sent to the embeddings endpoint in chunks of `batch_size`, with
+    at most `max_in_flight` chunks running concurrently.
+
+    The endpoint follows the OpenAI client configuration, so pointing
+    OPENAI_BASE_URL at a local fake server (see fake_embedding_server.py) is
+    enough to exercise the service without network access.
+    """
+
+    def __init__(self,
+                 client: OpenAI | None = None,
+                 model: str = EMBEDDING_MODEL,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+                 cache: EmbeddingCache | None = None):
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError("batch_size and max_in_flight must be positive")
+        self.client = client or OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.model = model
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self._stats_lock = threading.Lock()
+        self.stats = {'requests': 0, 'embedded': 0, 'cache_hits': 0}
+
+    def _embed_chunk(self, chunk: list[str]) -> list[np.ndarray]:
+        resp = self.client.embeddings.create(model=self.model, input=chunk)
+        ordered = sorted(resp.data, key=lambda d: d.index)
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['embedded'] += len(chunk)
+        return [np.asarray(d.embedding, dtype=np.float32) for d in ordered]
+
+    def embed_many(self, texts: list[str]) -> np.ndarray:
+        """Embed `texts` and return a (len(texts), dim) float32 matrix in input order."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        hashes = [text_hash(t) for t in texts]
+        vectors = self.cache.get_many(self.model, list(set(hashes)))
+        with self._stats_lock:
+            self.stats['cache_hits'] += sum(1 for h in hashes if h in vectors)
+
+        # unique texts that still need a network round-trip
+        missing: dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in vectors and h not in missing:
+                missing[h] = t
+
+        if missing:
+            miss_hashes = list(missing)
+            chunks = [miss_hashes[i:i + self.batch_size]
+                      for i in range(0, len(miss_hashes), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+                results = pool.map(
+                    lambda hs: self._embed_chunk([missing[h] for h in hs]), chunks
+                )
+                for hs, embs in zip(chunks, results):
+                    new_items = list(zip(hs, embs))
+                    self.cache.put_many(self.model, new_items)
+                    vectors.update(new_items)
+
+        return np.vstack([vectors[h] for h in hashes])
+
+    def embed(self, text: str) -> list[float]:
+        """Embed a single text; same return type as agent_wrapper.get_embedding."""
+        return self.embed_many([text])[0].tolist()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-process LRU + TTL cache for search-query embeddings.
+
+    A miss in memory falls through to the optional on-disk EmbeddingCache
+    before calling `fetch`. Disk entries carry no TTL: they are keyed by
+    (model, sha256(text)), so a stored vector never goes stale.
+    """
+
+    def __init__(self,
+                 maxsize: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl: float = QUERY_EMBEDDING_CACHE_TTL,
+                 model: str = EMBEDDING_MODEL,
+                 disk: EmbeddingCache | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model = model
+        self.disk = disk
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _get_memory(self, key: str) -> list[float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, vec = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def _put_memory(self, key: str, vec: list[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vec)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, text: str, fetch) -> list[float]:
+        """Return the cached embedding of `text`, calling `fetch(text)` on a full miss."""
+        key = text_hash(text)
+        vec = self._get_memory(key)
+        if vec is not None:
+            return vec
+
+        if self.disk is not None:
+            stored = self.disk.get_many(self.model, [key]).get(key)
+            if stored is not None:
+                vec = stored.tolist()
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, vec)
+                return vec
+
+        with self._lock:
+            self.misses += 1
+        vec = fetch(text)
+        self._put_memory(key, vec)
+        if self.disk is not None:
+            self.disk.put_many(self.model, [(key, np.asarray(vec, dtype=np.float32))])
+        return vec
+
+    async def aget_or_compute(self, text: str, fetch) -> list[float]:
+        """Async variant of get_or_compute; `fetch` is a coroutine function."""
+        key = text_hash(text)
+        vec = self._get_memory(key)
+        if vec is not None:
+            return vec
+
+        if self.disk is not None:
+            found = await asyncio.to_thread(self.disk.get_many, self.model, [key])
+            stored = found.get(key)
+            if stored is not None:
+                vec = stored.tolist()
+                with self._lock:
+                    self.disk_hits += 1
+                self._put_memory(key, vec)
+                return vec
+
+        with self._lock:
+            self.misses += 1
+        vec = await fetch(text)
+        self._put_memory(key, vec)
+        if self.disk is not None:
+            await asyncio.to_thread(
+                self.disk.put_many, self.model, [(key, np.asarray(vec, dtype=np.float32))]
+            )
+        return vec
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+_service: EmbeddingService | None = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide EmbeddingService, created on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+    return _service
+
+
+_query_cache: QueryEmbeddingCache | None = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Process-wide QueryEmbeddingCache, disk-backed unless QUERY_EMBEDDING_CACHE_PATH is empty."""
+    global _query_cache
+    with _service_lock:
+        if _query_cache is None:
+            disk = EmbeddingCache(QUERY_EMBEDDING_CACHE_PATH) if QUERY_EMBEDDING_CACHE_PATH else None
+            _query_cache = QueryEmbeddingCache(disk=disk)
+    return _query_cache
@@ -0,0 +1,133 @@
+# embedding_store.py
+#
+# On-disk catalogue of embedded items (accounts, companies), written by
+# save_embeddings and read by the DB loader and the in-memory vector index:
+#
+#   {base}_embs.npy      float32 (n, dim) matrix, opened with mmap_mode='r'
+#                        so rows are paged in on demand and never boxed
+#   {base}_strings.bin   UTF-8 ids, names and descriptions, back to back
+#   {base}_strings.npy   int64 offsets into the blob, 3 * n + 1 of them
+#                        (field f of row i spans offsets[f*n+i:f*n+i+2])
+#
+# Nothing is pickled. An id -> row dict is built on open for O(1) lookups.
+# Catalogues saved in the older per-field .npy layout ({base}_{id_field}s.npy,
+# _names.npy, _descs.npy) are converted on first open.
+
+import os
+import numpy as np
+
+FIELDS = ('id', 'name', 'description')
+
+
+def store_files(base: str) -> list[str]:
+    return [f"{base}_embs.npy", f"{base}_strings.bin", f"{base}_strings.npy"]
+
+
+def write_embedding_store(base: str, ids, names, descriptions, embeddings) -> None:
+    """Write a catalogue in the store layout (the matrix is saved as float32)."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if not (len(ids) == len(names) == len(descriptions) == len(matrix)):
+        raise ValueError("ids, names, descriptions and embeddings must have the same length")
+    encoded = [str(s).encode('utf-8') for field in (ids, names, descriptions) for s in field]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    # write beside and rename, so a store that is open (mapped) elsewhere keeps its old files
+    for path, data in ((f"{base}_strings.bin", b''.join(encoded)),
+                       (f"{base}_strings.npy", offsets), (f"{base}_embs.npy", matrix)):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                np.save(f, data)
+        os.replace(tmp, path)
+
+
+def convert_legacy_store(base: str, id_field: str) -> bool:
+    """Build the string table from the old per-field .npy files; False if there are none."""
+    legacy = [f"{base}_{id_field}s.npy", f"{base}_names.npy", f"{base}_descs.npy"]
+    if not all(os.path.exists(f) for f in legacy + [f"{base}_embs.npy"]):
+        return False
+    ids, names, descs = (np.load(f, allow_pickle=False) for f in legacy)
+    write_embedding_store(base, ids, names, descs, np.load(f"{base}_embs.npy", allow_pickle=False))
+    print(f"Converted {os.path.basename(base)} embeddings to the string-table layout.")
+    return True
+
+
+def ensure_embedding_store(base: str, id_field: str) -> bool:
+    """Whether a store exists at `base`, converting a legacy one if needed."""
+    if all(os.path.exists(f) for f in store_files(base)):
+        return True
+    return convert_legacy_store(base, id_field)
+
+
+class EmbeddingStore:
+    """
+    Read-only view of a saved catalogue. `matrix` is the memory-mapped
+    float32 matrix itself, so the vector index and the COPY loader work on
+    its pages directly; strings are decoded from the blob when asked for.
+    """
+
+    def __init__(self, base: str, id_field: str):
+        self.id_field = id_field
+        self.matrix = np.load(f"{base}_embs.npy", mmap_mode='r')
+        if self.matrix.dtype != np.float32 or self.matrix.ndim != 2:
+            raise ValueError(f"{base}_embs.npy is not a float32 matrix")
+        self._offsets = np.load(f"{base}_strings.npy", allow_pickle=False)
+        with open(f"{base}_strings.bin", 'rb') as f:
+            self._blob = f.read()
+        self._n = len(self.matrix)
+        if len(self._offsets) != 3 * self._n + 1:
+            raise ValueError(f"{base}_strings.npy does not match {self._n} embeddings")
+        self._row_of = {id_: i for i, id_ in enumerate(self.column('id'))}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._row_of
+
+    def _string(self, field: int, i: int) -> str:
+        k = field * self._n + i
+        return self._blob[self._offsets[k]:self._offsets[k + 1]].decode('utf-8')
+
+    def column(self, field: str) -> list[str]:
+        """All values of 'id', 'name' or 'description', in row order."""
+        f = FIELDS.index(field)
+        bounds = self._offsets[f * self._n:(f + 1) * self._n + 1].tolist()
+        blob = self._blob
+        return [blob[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+    def row_of(self, id_: str) -> int:
+        """Row number of `id_` (KeyError if absent)."""
+        return self._row_of[id_]
+
+    def vector(self, id_: str) -> np.ndarray:
+        """The embedding of `id_` as a view into the matrix."""
+        return self.matrix[self._row_of[id_]]
+
+    def record(self, i: int) -> dict:
+        """Row `i` as {id_field, 'name', 'description'}."""
+        return {self.id_field: self._string(0, i), 'name': self._string(1, i),
+                'description': self._string(2, i)}
+
+    def get(self, id_: str) -> dict | None:
+        i = self._row_of.get(id_)
+        return None if i is None else self.record(i)
+
+    def records(self) -> list[dict]:
+        """All rows as {id_field, 'name', 'description'} dicts, without embeddings."""
+        return [{self.id_field: i, 'name': n, 'description': d}
+                for i, n, d in zip(self.column('id'), self.column('name'), self.column('description'))]
+
+    def rows(self):
+        """(id, name, description, embedding view) tuples for the DB loaders."""
+        return zip(self.column('id'), self.column('name'), self.column('description'), self.matrix)
+
+
+def open_embedding_store(data_dir: str, filename: str, id_field: str) -> EmbeddingStore | None:
+    """Open the catalogue saved under `filename`; None if it has not been saved."""
+    base = os.path.join(data_dir, filename)
+    if not ensure_embedding_store(base, id_field):
+        return None
+    return EmbeddingStore(base, id_field)
@@ -0,0 +1,337 @@
+# fact_cube.py
+#
+# In-memory (company x period x account) float64 cube of financial_fact, NaN
+# where there is no fact. The whole market is a few million cells, so point
+# lookups, time series, cross-sections and rankings are NumPy indexing on one
+# array instead of SQL round-trips.
+#
+# Loaders append the companies they touched to fact_change_log; the cube
+# polls that log at most every FACT_CUBE_SYNC_INTERVAL seconds and reloads
+# only those companies (or everything, for a NULL entry / new catalogue rows).
+# A (re)load builds a new CubeSnapshot and publishes it with one assignment,
+# so lookups running meanwhile keep reading the previous, consistent one.
+
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+import numpy as np
+from db_pool import get_pool
+from sql_cache import bump_sql_version
+
+FACT_CUBE_SYNC_INTERVAL = float(os.getenv('FACT_CUBE_SYNC_INTERVAL', '5'))
+
+
+# pg_advisory_xact_lock key taken before every fact_change_log insert: writers
+# then commit their entries in change_id order, so a reader that has seen
+# change N can never later find an uncommitted N-1 appearing behind it
+FACT_CHANGE_LOCK = 0x66616374   # 'fact'
+
+
+def log_fact_change(cur, company_ids: list[int] | None = None) -> None:
+    """
+    Record that facts of `company_ids` (None = all companies) changed, in the
+    caller's transaction; also bumps the SQL cache version.
+    """
+    bump_sql_version(cur)
+    cur.execute("SELECT pg_advisory_xact_lock(%s);", (FACT_CHANGE_LOCK,))
+    cur.execute(
+        "INSERT INTO fact_change_log (company_ids) VALUES (%s);",
+        (sorted({int(c) for c in company_ids}) if company_ids is not None else None,)
+    )
+
+
+def current_fact_version(cur) -> int:
+    cur.execute("SELECT COALESCE(MAX(change_id), 0) FROM fact_change_log;")
+    return cur.fetchone()[0]
+
+
+class CubeSnapshot:
+    """
+    Catalogues and values of one load. Never modified once published (values
+    is made read-only): a reload builds a new snapshot and FactCube swaps it
+    in with a single assignment, so a reader holding one sees a consistent
+    state.
+    """
+
+    def __init__(self, companies: list[tuple], periods: list[tuple], accounts: list[tuple],
+                 values: np.ndarray | None = None):
+        self.catalogues = (companies, periods, accounts)
+        self.company_ids = np.array([c[0] for c in companies], dtype=np.int64)
+        self.tickers = [c[1] for c in companies]
+        self.company_names = [c[2] for c in companies]
+        self.period_ids = np.array([p[0] for p in periods], dtype=np.int64)
+        self.periods = [(p[1], p[2]) for p in periods]
+        self.account_ids = np.array([a[0] for a in accounts], dtype=np.int64)
+        self.codes = [a[1] for a in accounts]
+
+        self.ticker_pos = {t: i for i, t in enumerate(self.tickers)}
+        self.period_pos = {p: i for i, p in enumerate(self.periods)}
+        self.code_pos = {c: i for i, c in enumerate(self.codes)}
+        self.company_id_pos = {int(c): i for i, c in enumerate(self.company_ids)}
+
+        if values is None:
+            values = np.full((len(self.tickers), len(self.periods), len(self.codes)), np.nan)
+        self.values = values
+
+    def with_values(self, values: np.ndarray) -> 'CubeSnapshot':
+        return CubeSnapshot(*self.catalogues, values)
+
+    def company(self, ticker: str) -> int:
+        try:
+            return self.ticker_pos[ticker.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown ticker: {ticker}") from None
+
+    def account(self, code: str) -> int:
+        try:
+            return self.code_pos[code.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown account code: {code}") from None
+
+    def period(self, year: int, quarter: int) -> int:
+        try:
+            return self.period_pos[(int(year), int(quarter))]
+        except KeyError:
+            raise ValueError(f"Unknown period: {year}Q{quarter}") from None
+
+
+class FactCube:
+    """
+    values[c, p, a] is the fact for company c, period p, account a.
+    Companies are addressed by ticker, accounts by code and periods by
+    (year, quarter); periods are stored in chronological order.
+
+    The state lives in `snapshot`; every lookup reads that attribute once.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = CubeSnapshot([], [], [])
+        self.version = 0
+        self.last_sync = 0.0
+        self.load_seconds = 0.0
+
+    # --- LOADING ---
+    @staticmethod
+    def _read_catalogues(cur) -> tuple[list, list, list]:
+        cur.execute("SELECT company_id, ticker, name FROM company ORDER BY ticker;")
+        companies = cur.fetchall()
+        cur.execute("SELECT period_id, year, quarter FROM period ORDER BY year, quarter;")
+        periods = cur.fetchall()
+        cur.execute("SELECT account_id, code FROM account ORDER BY account_id;")
+        accounts = cur.fetchall()
+        return companies, periods, accounts
+
+    @staticmethod
+    def _catalogue_changed(cur, snap: CubeSnapshot) -> bool:
+        cur.execute(
+            "SELECT (SELECT array_agg(company_id ORDER BY company_id) FROM company), "
+            "(SELECT array_agg(period_id ORDER BY period_id) FROM period), "
+            "(SELECT array_agg(account_id ORDER BY account_id) FROM account);"
+        )
+        companies, periods, accounts = (sorted(x or []) for x in cur.fetchone())
+        return (companies != sorted(snap.company_ids.tolist())
+                or periods != sorted(snap.period_ids.tolist())
+                or accounts != sorted(snap.account_ids.tolist()))
+
+    def _fill(self, cur, snap: CubeSnapshot, values: np.ndarray, company_ids: list[int] | None) -> None:
+        cur.execute(
+            """
+            SELECT company_id, period_id, account_id, value::float8
+            FROM financial_fact
+            WHERE %(ids)s::int[] IS NULL OR company_id = ANY(%(ids)s::int[]);
+            """,
+            {'ids': company_ids}
+        )
+        rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 4)
+        if not len(rows):
+            return
+        ci = self._positions(snap.company_ids, rows[:, 0])
+        pi = self._positions(snap.period_ids, rows[:, 1])
+        ai = self._positions(snap.account_ids, rows[:, 2])
+        values[ci, pi, ai] = rows[:, 3]
+
+    @staticmethod
+    def _positions(ids: np.ndarray, wanted: np.ndarray) -> np.ndarray:
+        """Index of each of `wanted` in the (unsorted) id array `ids`."""
+        order = np.argsort(ids)
+        return order[np.searchsorted(ids, wanted, sorter=order)]
+
+    def load(self) -> 'FactCube':
+        """Full (re)load of catalogues and facts."""
+        started = time.perf_counter()
+        with get_pool().connection() as conn, conn.cursor() as cur:
+            version = current_fact_version(cur)
+            snap = CubeSnapshot(*self._read_catalogues(cur))
+            self._fill(cur, snap, snap.values, None)
+        self._publish(snap, version)
+        self.last_sync = time.monotonic()
+        self.load_seconds = time.perf_counter() - started
+        print(f"Loaded fact cube {snap.values.shape} ({snap.values.nbytes / 1e6:.1f} MB, "
+              f"{int((~np.isnan(snap.values)).sum())} facts) in {self.load_seconds:.2f}s.")
+        return self
+
+    def _publish(self, snap: CubeSnapshot, version: int | None) -> None:
+        snap.values.flags.writeable = False
+        self.snapshot = snap
+        if version is not None:
+            self.version = version
+
+    def refresh(self, company_ids: list[int] | None = None, version: int | None = None) -> None:
+        """Reload the facts of `company_ids` (None = everything); `version` = last change applied."""
+        snap = self.snapshot
+        with get_pool().connection() as conn, conn.cursor() as cur:
+            full = company_ids is None or self._catalogue_changed(cur, snap)
+            if not full:
+                values = snap.values.copy()
+                values[[snap.company_id_pos[c] for c in company_ids]] = np.nan
+                self._fill(cur, snap, values, company_ids)
+        if full:
+            self.load()
+            return
+        self._publish(snap.with_values(values), version)
+        print(f"Refreshed fact cube for {len(company_ids)} companies.")
+
+    def sync(self, force: bool = False) -> bool:
+        """Apply pending fact_change_log entries; polls at most every FACT_CUBE_SYNC_INTERVAL s."""
+        if not force and time.monotonic() - self.last_sync < FACT_CUBE_SYNC_INTERVAL:
+            return False
+        with self.lock:
+            with get_pool().connection() as conn, conn.cursor() as cur:
+                cur.execute(
+                    "SELECT change_id, company_ids FROM fact_change_log WHERE change_id > %s ORDER BY change_id;",
+                    (self.version,)
+                )
+                changes = cur.fetchall()
+            self.last_sync = time.monotonic()
+            if not changes:
+                return False
+            if any(ids is None for _, ids in changes):
+                self.load()
+            else:
+                self.refresh(sorted({c for _, ids in changes for c in ids}), version=changes[-1][0])
+            return True
+
+    # --- LOOKUPS ---
+    @staticmethod
+    def _num(v: float) -> float | None:
+        return None if np.isnan(v) else float(v)
+
+    def value(self, ticker: str, code: str, year: int, quarter: int) -> float | None:
+        s = self.snapshot
+        return self._num(s.values[s.company(ticker), s.period(year, quarter), s.account(code)])
+
+    def slice(self, tickers: list[str] | None = None, codes: list[str] | None = None,
+              periods: list[tuple[int, int]] | None = None) -> np.ndarray:
+        """Sub-cube (companies x periods x accounts) in the order requested; None = all."""
+        s = self.snapshot
+        ci = [s.company(t) for t in tickers] if tickers is not None else slice(None)
+        pi = [s.period(*p) for p in periods] if periods is not None else slice(None)
+        ai = [s.account(c) for c in codes] if codes is not None else slice(None)
+        return s.values[ci][:, pi][:, :, ai]
+
+    def time_series(self, ticker: str, code: str,
+                    start: tuple[int, int] | None = None,
+                    end: tuple[int, int] | None = None) -> list[dict]:
+        """
+        Chronological [{'year', 'quarter', 'value'}] between start and end
+        (inclusive), facts only. Bounds need not be loaded periods: the range
+        is clamped to the periods that fall inside it.
+        """
+        s = self.snapshot
+        series = s.values[s.company(ticker), :, s.account(code)]
+        lo = bisect_left(s.periods, tuple(start)) if start else 0
+        hi = bisect_right(s.periods, tuple(end)) if end else len(s.periods)
+        return [
+            {'year': s.periods[i][0], 'quarter': s.periods[i][1], 'value': float(series[i])}
+            for i in range(lo, hi) if not np.isnan(series[i])
+        ]
+
+    def cross_section(self, code: str, year: int, quarter: int) -> list[dict]:
+        """[{'ticker', 'value'}] for every company with a fact, by ticker."""
+        s = self.snapshot
+        col = s.values[:, s.period(year, quarter), s.account(code)]
+        return [{'ticker': s.tickers[i], 'value': float(col[i])} for i in np.flatnonzero(~np.isnan(col))]
+
+    def top_n(self, code: str, year: int, quarter: int, n: int = 3, ascending: bool = False) -> list[dict]:
+        """Top `n` companies by value (largest first unless ascending)."""
+        s = self.snapshot
+        col = s.values[:, s.period(year, quarter), s.account(code)]
+        idx = np.flatnonzero(~np.isnan(col))
+        order = idx[np.argsort(col[idx] if ascending else -col[idx], kind='stable')][:max(0, int(n))]
+        return [
+            {'rank': r, 'ticker': s.tickers[i], 'name': s.company_names[i], 'value': float(col[i])}
+            for r, i in enumerate(order, 1)
+        ]
+
+    def rank(self, ticker: str, code: str, year: int, quarter: int, ascending: bool = False) -> dict:
+        """Position of one company among all companies with a fact (1 = largest unless ascending)."""
+        s = self.snapshot
+        col = s.values[:, s.period(year, quarter), s.account(code)]
+        v = col[s.company(ticker)]
+        valid = col[~np.isnan(col)]
+        if np.isnan(v):
+            return {'ticker': ticker.upper(), 'value': None, 'rank': None, 'of': len(valid)}
+        better = (valid < v).sum() if ascending else (valid > v).sum()
+        return {'ticker': ticker.upper(), 'value': float(v), 'rank': int(better) + 1, 'of': len(valid)}
+
+    def change(self, code: str, year: int, quarter: int, lag: int = 1,
+               by: str = 'change', ascending: bool = False) -> tuple[tuple[int, int], list[dict]]:
+        """
+        Period-over-period change of an account for every company with both
+        values: against `lag` quarters earlier (1 = previous quarter, 4 = same
+        quarter last year). Ranked by 'change' or 'pct', largest first unless
+        ascending. Returns (previous period, [{'rank', 'ticker', 'value',
+        'previous', 'change', 'pct'}]); pct is None when previous is 0.
+        """
+        if by not in ('change', 'pct'):
+            raise ValueError("by must be 'change' or 'pct'")
+        ordinal = int(year) * 4 + int(quarter) - 1 - int(lag)
+        previous = (ordinal // 4, ordinal % 4 + 1)
+        s = self.snapshot
+        a = s.account(code)
+        now = s.values[:, s.period(year, quarter), a]
+        before = s.values[:, s.period(*previous), a]
+        delta = now - before
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = np.where(before != 0, 100 * delta / np.abs(before), np.nan)
+        key = delta if by == 'change' else pct
+        idx = np.flatnonzero(~np.isnan(key))
+        order = idx[np.argsort(key[idx] if ascending else -key[idx], kind='stable')]
+        return previous, [
+            {'rank': r, 'ticker': s.tickers[i], 'value': float(now[i]), 'previous': float(before[i]),
+             'change': float(delta[i]), 'pct': self._num(pct[i])}
+            for r, i in enumerate(order, 1)
+        ]
+
+    def stats(self) -> dict:
+        values = self.snapshot.values
+        return {
+            'shape': list(values.shape),
+            'facts': int((~np.isnan(values)).sum()) if values.size else 0,
+            'megabytes': round(values.nbytes / 1e6, 1),
+            'version': self.version,
+            'load_seconds': round(self.load_seconds, 3),
+        }
+
+
+_cube: FactCube | None = None
+_cube_lock = threading.Lock()
+
+
+def get_fact_cube() -> FactCube:
+    """Shared cube, loaded on first use and synced with fact_change_log (throttled) on every call."""
+    global _cube
+    if _cube is None:
+        with _cube_lock:
+            if _cube is None:
+                _cube = FactCube().load()
+        return _cube
+    _cube.sync()
+    return _cube
+
+
+def fact_cube_stats() -> dict | None:
+    """Stats of the shared cube, or None before it is first loaded (never triggers a load)."""
+    return _cube.stats() if _cube is not None else None
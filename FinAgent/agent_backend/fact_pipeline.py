@@ -0,0 +1,174 @@
+# fact_pipeline.py
+#
+# Columnar transform from a wide Bilanço sheet (one row per Turkish account
+# label, one column per 'YYYY/MM' period) to long-form financial facts.
+# All work is done once per sheet with vectorized pandas/NumPy operations;
+# the output is a NumPy record array that goes straight to the bulk loader.
+# transform_long does the same from a sheet_cache long-format frame.
+
+import numpy as np
+import pandas as pd
+
+# One financial_fact row, in loader column order
+FACT_DTYPE = np.dtype([
+    ('company_id', np.int32),
+    ('period_id', np.int32),
+    ('account_id', np.int32),
+    ('value', np.float64),
+])
+
+FACT_COLUMNS = list(FACT_DTYPE.names)
+
+
+# Natural key of a fact; financial_fact has a unique index on it
+FACT_KEY = ['company_id', 'account_id', 'period_id']
+
+
+def empty_facts() -> np.ndarray:
+    return np.empty(0, dtype=FACT_DTYPE)
+
+
+def dedupe_facts(records: np.ndarray) -> np.ndarray:
+    """
+    Keep the last record per (company_id, account_id, period_id), returned in
+    key order. A single INSERT ... ON CONFLICT DO UPDATE cannot touch a row
+    twice, and key-ordered rows make sequential inserts into the unique index.
+    """
+    if len(records) < 2:
+        return records
+    order = np.lexsort((records['period_id'], records['account_id'], records['company_id']))
+    ordered = records[order]
+    last = np.ones(len(ordered), dtype=bool)
+    last[:-1] = np.logical_or.reduce([ordered[k][1:] != ordered[k][:-1] for k in FACT_KEY])
+    return ordered if last.all() else ordered[last]
+
+
+def parse_periods(headers) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized parse_period over column headers like '2024/12'.
+    Returns (year, quarter) int arrays; -1 marks headers that are not periods.
+    """
+    parts = pd.Series(list(headers), dtype=object).astype(str).str.extract(r'^\s*(\d+)/(\d+)\s*$')
+    valid = parts[0].notna().to_numpy()
+    years = np.full(len(parts), -1, dtype=np.int64)
+    quarters = np.full(len(parts), -1, dtype=np.int64)
+    years[valid] = parts.loc[valid, 0].astype(np.int64).to_numpy()
+    months = parts.loc[valid, 1].astype(np.int64).to_numpy()
+    quarters[valid] = (months - 1) // 3 + 1
+    return years, quarters
+
+
+def numeric_values(block: pd.DataFrame) -> np.ndarray:
+    """Sheet cells as a float64 array; non-numeric cells become NaN."""
+    # openpyxl usually yields float columns already; only coerce the ones that are not
+    non_numeric = [i for i, t in enumerate(block.dtypes) if not pd.api.types.is_numeric_dtype(t)]
+    if non_numeric:
+        block = block.copy()
+        for i in non_numeric:
+            block.isetitem(i, pd.to_numeric(block.iloc[:, i], errors='coerce'))
+    return block.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class FactLookups:
+    """
+    Label → account_id and (year, quarter) → period_id lookups, prepared once
+    per load as categorical code tables so every sheet is mapped with a
+    single join per axis instead of per-row dict lookups.
+    """
+
+    def __init__(self, translations: dict[str, str], account_map: dict[str, int],
+                 period_map: dict[tuple[int, int], int]):
+        # Turkish label -> account code -> account_id, folded into one table
+        self.labels = pd.Index(list(translations.keys()))
+        self.label_account_ids = (
+            pd.Series(list(translations.values()))
+            .map(account_map)
+            .fillna(-1)
+            .to_numpy(dtype=np.int32)
+        )
+        # account code -> account_id, for sheets already translated by sheet_cache
+        self.codes = pd.Index(list(account_map.keys()))
+        self.code_account_ids = np.array(list(account_map.values()), dtype=np.int32)
+        keys = list(period_map.keys())
+        self.period_keys = pd.Index([y * 10 + q for y, q in keys])
+        self.period_ids = np.array([period_map[k] for k in keys], dtype=np.int32)
+
+    @classmethod
+    def from_db(cls, cur, translations: dict[str, str]) -> 'FactLookups':
+        cur.execute("SELECT code, account_id FROM account;")
+        account_map = dict(cur.fetchall())
+        cur.execute("SELECT year, quarter, period_id FROM period;")
+        period_map = {(y, q): pid for y, q, pid in cur.fetchall()}
+        return cls(translations, account_map, period_map)
+
+    def account_ids(self, labels: pd.Series) -> np.ndarray:
+        """account_id per raw sheet label (stripped), -1 if untranslated or unknown."""
+        cleaned = labels.astype(str).str.strip()
+        codes = pd.Categorical(cleaned, categories=self.labels).codes
+        return np.where(codes >= 0, self.label_account_ids[codes], -1).astype(np.int32)
+
+    def account_ids_for_codes(self, codes) -> np.ndarray:
+        """account_id per account code, -1 if missing or unknown."""
+        idx = pd.Categorical(codes, categories=self.codes).codes
+        return np.where(idx >= 0, self.code_account_ids[idx], -1).astype(np.int32)
+
+    def period_ids_for_quarters(self, years, quarters) -> np.ndarray:
+        """period_id per (year, quarter) pair, -1 if not in the period table."""
+        keys = np.asarray(years, dtype=np.int64) * 10 + np.asarray(quarters, dtype=np.int64)
+        idx = pd.Categorical(keys, categories=self.period_keys).codes
+        return np.where(idx >= 0, self.period_ids[idx], -1).astype(np.int32)
+
+    def period_ids_for(self, headers) -> np.ndarray:
+        """period_id per column header, -1 if not a period or not in the period table."""
+        years, quarters = parse_periods(headers)
+        keys = np.where(years >= 0, years * 10 + quarters, -1)
+        codes = pd.Categorical(keys, categories=self.period_keys).codes
+        return np.where(codes >= 0, self.period_ids[codes], -1).astype(np.int32)
+
+
+def transform_sheet(df: pd.DataFrame, company_id: int, lookups: FactLookups) -> np.ndarray:
+    """
+    Wide Bilanço sheet → FACT_DTYPE records.
+
+    Same semantics as the original per-column loop: untranslated labels and
+    non-period columns are dropped, non-numeric cells become 0, and rows are
+    emitted period by period.
+    """
+    account_ids = lookups.account_ids(df.iloc[:, 0])
+    value_cols = df.columns[1:]
+    period_ids = lookups.period_ids_for(value_cols)
+
+    row_mask = account_ids >= 0
+    col_mask = period_ids >= 0
+    if not row_mask.any() or not col_mask.any():
+        return empty_facts()
+
+    values = numeric_values(df.iloc[row_mask.nonzero()[0], 1 + col_mask.nonzero()[0]])
+    values = np.where(np.isnan(values), 0.0, values)
+    n_rows, n_cols = values.shape
+
+    # melt to long form once: period-major, matching the original loop order
+    out = np.empty(n_rows * n_cols, dtype=FACT_DTYPE)
+    out['company_id'] = company_id
+    out['period_id'] = np.repeat(period_ids[col_mask], n_rows)
+    out['account_id'] = np.tile(account_ids[row_mask], n_cols)
+    out['value'] = values.T.ravel()
+    return out
+
+
+def transform_long(long: pd.DataFrame, company_id: int, lookups: FactLookups) -> np.ndarray:
+    """
+    Long-format sheet from sheet_cache → FACT_DTYPE records, same rows and
+    order as transform_sheet on the original workbook.
+    """
+    account_ids = lookups.account_ids_for_codes(long['account_code'])
+    period_ids = lookups.period_ids_for_quarters(long['year'], long['quarter'])
+    keep = (account_ids >= 0) & (period_ids >= 0)
+    values = long['value'].to_numpy(dtype=np.float64)[keep]
+
+    out = np.empty(int(keep.sum()), dtype=FACT_DTYPE)
+    out['company_id'] = company_id
+    out['period_id'] = period_ids[keep]
+    out['account_id'] = account_ids[keep]
+    out['value'] = np.where(np.isnan(values), 0.0, values)
+    return out
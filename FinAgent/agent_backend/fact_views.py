@@ -0,0 +1,157 @@
+# fact_views.py
+#
+# Denormalized read models for the agent's SQL tool, so most questions are a
+# single-table lookup instead of a 4-way join the model has to get right:
+#
+#   fact_wide   one row per (ticker, account_code, year, quarter) with company,
+#               account, parent-account and period attributes inlined, plus the
+#               account_rollup leaf sum for parent accounts
+#   fact_pivot  one row per (ticker, year, quarter), one NUMERIC column per
+#               top-level account (depth <= FACT_PIVOT_MAX_DEPTH), named lower(code)
+#
+# Both are plain indexed tables rather than MATERIALIZED VIEWs: PostgreSQL can
+# only refresh a materialized view in full, while the loaders only touch a few
+# companies at a time. refresh_fact_views(company_ids) rebuilds just those rows.
+
+import os
+import re
+from db_pool import get_pool
+from account_tree import ACCOUNT_TREE
+from sql_cache import bump_sql_version
+
+FACT_PIVOT_MAX_DEPTH = int(os.getenv('FACT_PIVOT_MAX_DEPTH', '1'))
+
+# Leading fact_pivot columns; the rest are the account columns
+PIVOT_KEY_COLUMNS = ['ticker', 'company_name', 'year', 'quarter', 'company_id', 'period_id']
+
+_SAFE_CODE = re.compile(r'^[A-Z][A-Z0-9_]*$')
+
+
+def pivot_accounts(cur, max_depth: int = FACT_PIVOT_MAX_DEPTH) -> list[str]:
+    """Account codes down to `max_depth` of the hierarchy (roots are depth 0), root-first."""
+    cur.execute("SELECT code, account_id FROM account;")
+    rows = [(ACCOUNT_TREE.depth(code), aid, code) for code, aid in cur.fetchall()
+            if code in ACCOUNT_TREE.parent_map and ACCOUNT_TREE.depth(code) <= max_depth]
+    return [code for _, _, code in sorted(rows) if _SAFE_CODE.match(code)]
+
+
+def _pivot_columns_in_db(cur) -> list[str] | None:
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'fact_pivot'
+        ORDER BY ordinal_position;
+        """
+    )
+    cols = [c for (c,) in cur.fetchall()]
+    return cols[len(PIVOT_KEY_COLUMNS):] if cols else None
+
+
+def ensure_pivot_table(cur, codes: list[str]) -> bool:
+    """(Re)create fact_pivot when its account columns differ from `codes`; True if recreated."""
+    wanted = [c.lower() for c in codes]
+    if _pivot_columns_in_db(cur) == wanted:
+        return False
+    account_cols = ''.join(f",\n  {c} NUMERIC(18,2)" for c in wanted)
+    cur.execute("DROP TABLE IF EXISTS fact_pivot;")
+    cur.execute(
+        f"""
+        CREATE TABLE fact_pivot (
+          ticker        TEXT    NOT NULL,
+          company_name  TEXT    NOT NULL,
+          year          INTEGER NOT NULL,
+          quarter       INTEGER NOT NULL,
+          company_id    INTEGER NOT NULL,
+          period_id     INTEGER NOT NULL{account_cols},
+          PRIMARY KEY (ticker, year, quarter)
+        );
+        CREATE INDEX idx_fact_pivot_period ON fact_pivot (year, quarter);
+        CREATE INDEX idx_fact_pivot_company ON fact_pivot (company_id);
+        """
+    )
+    print(f"Created fact_pivot with {len(wanted)} account columns.")
+    return True
+
+
+def refresh_fact_views(company_ids: list[int] | None = None) -> dict:
+    """
+    Rebuild fact_wide and fact_pivot rows for `company_ids` (default: all) in
+    one transaction. fact_pivot is rebuilt in full whenever its account
+    columns changed. Returns {'wide_rows': int, 'pivot_rows': int, 'full': bool}.
+    """
+    full = company_ids is None
+    scope = "" if full else "WHERE company_id = ANY(%(ids)s)"
+    params = {'ids': company_ids}
+
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        codes = pivot_accounts(cur)
+        pivot_full = ensure_pivot_table(cur, codes) or full
+
+        cur.execute(f"DELETE FROM fact_wide {scope};", params)
+        cur.execute(
+            f"""
+            INSERT INTO fact_wide
+              (ticker, company_name, account_code, account_name, parent_code,
+               year, quarter, value, company_id, account_id, period_id, rollup_value)
+            SELECT c.ticker, c.name, a.code, a.name, pa.code,
+                   p.year, p.quarter, f.value, f.company_id, f.account_id, f.period_id, r.value
+            FROM (SELECT * FROM financial_fact {scope}) f
+            JOIN company c ON c.company_id = f.company_id
+            JOIN account a ON a.account_id = f.account_id
+            LEFT JOIN account pa ON pa.account_id = a.parent_account_id
+            JOIN period p ON p.period_id = f.period_id
+            LEFT JOIN account_rollup r
+              ON r.company_id = f.company_id AND r.account_id = f.account_id AND r.period_id = f.period_id;
+            """,
+            params
+        )
+        wide_rows = cur.rowcount
+
+        pivot_scope = "" if pivot_full else scope
+        pivot_rows = 0
+        cur.execute(f"DELETE FROM fact_pivot {pivot_scope};", params)
+        if codes:
+            account_cols = ', '.join(c.lower() for c in codes)
+            pivots = ',\n'.join(
+                f"max(value) FILTER (WHERE account_code = '{c}') AS {c.lower()}" for c in codes
+            )
+            where = "WHERE account_code = ANY(%(codes)s)" + ("" if pivot_full else " AND company_id = ANY(%(ids)s)")
+            cur.execute(
+                f"""
+                INSERT INTO fact_pivot ({', '.join(PIVOT_KEY_COLUMNS)}, {account_cols})
+                SELECT ticker, company_name, year, quarter, company_id, period_id,
+                       {pivots}
+                FROM fact_wide
+                {where}
+                GROUP BY ticker, company_name, year, quarter, company_id, period_id;
+                """,
+                {**params, 'codes': codes}
+            )
+            pivot_rows = cur.rowcount
+
+        bump_sql_version(cur)
+
+    which = 'all companies' if full else f"{len(company_ids)} companies"
+    print(f"Refreshed fact views for {which}: {wide_rows} wide rows, {pivot_rows} pivot rows.")
+    return {'wide_rows': wide_rows, 'pivot_rows': pivot_rows, 'full': full}
+
+
+def describe_fact_views() -> str:
+    """Agent-instruction text for the two views, with fact_pivot's current account columns."""
+    with get_pool().connection() as conn, conn.cursor() as cur:
+        account_cols = _pivot_columns_in_db(cur) or []
+    return (
+        "Prefer these denormalized, indexed tables over joining financial_fact yourself; "
+        "most questions are a single-table lookup on them:\n"
+        "fact_wide (ticker TEXT, company_name TEXT, account_code TEXT, account_name TEXT, parent_code TEXT, "
+        "year INTEGER, quarter INTEGER, value NUMERIC(18,2), company_id INTEGER, account_id INTEGER, period_id INTEGER, "
+        "rollup_value NUMERIC(18,2), PRIMARY KEY (ticker, account_code, year, quarter)) -- one row per company, account and quarter; "
+        "for parent accounts rollup_value is the precomputed sum of the leaf accounts below it (NULL for leaves); "
+        "it is not the reported total and can differ from value, so use value for totals\n"
+        "  e.g. SELECT year, quarter, value FROM fact_wide WHERE ticker = 'KCHOL' AND account_code = 'TOTAL_ASSETS' ORDER BY year, quarter;\n"
+        "fact_pivot (ticker TEXT, company_name TEXT, year INTEGER, quarter INTEGER, company_id INTEGER, period_id INTEGER, "
+        + ''.join(f"{c} NUMERIC(18,2), " for c in account_cols)
+        + "PRIMARY KEY (ticker, year, quarter)) -- one row per company and quarter, one column per top-level account "
+        "(column name = lower-case account code)\n"
+        "  e.g. SELECT ticker, total_liabilities / NULLIF(total_equity, 0) AS debt_to_equity FROM fact_pivot WHERE year = 2024 AND quarter = 4;\n"
+    )
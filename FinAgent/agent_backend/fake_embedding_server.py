@@ -0,0 +1,90 @@
+# fake_embedding_server.py
+#
+# Minimal stand-in for the OpenAI /embeddings endpoint, used by the benchmarks
+# and for local runs without an API key:
+#
+#   python fake_embedding_server.py --port 8089 --latency-ms 150
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python ...
+
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+EMBEDDING_DIM = 1536
+
+
+def fake_vector(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Deterministic unit vector derived from the text's sha256."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vec = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+def make_handler(latency_s: float, per_input_s: float, counter: dict):
+    class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.rstrip('/').endswith('/embeddings'):
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            inputs = body['input']
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            time.sleep(latency_s + per_input_s * len(inputs))
+            counter['requests'] += 1
+            counter['inputs'] += len(inputs)
+
+            as_base64 = body.get('encoding_format') == 'base64'
+            data = []
+            for i, text in enumerate(inputs):
+                vec = fake_vector(text)
+                emb = base64.b64encode(vec.tobytes()).decode() if as_base64 else vec.tolist()
+                data.append({'object': 'embedding', 'index': i, 'embedding': emb})
+            payload = json.dumps({
+                'object': 'list',
+                'data': data,
+                'model': body.get('model'),
+                'usage': {'prompt_tokens': 0, 'total_tokens': 0},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeEmbeddingHandler
+
+
+def start_fake_server(port: int = 0, latency_ms: float = 150.0, per_input_ms: float = 0.5):
+    """
+    Start the fake endpoint on a background thread.
+    Returns (server, base_url, counter); call server.shutdown() when done.
+    """
+    counter = {'requests': 0, 'inputs': 0}
+    handler = make_handler(latency_ms / 1000.0, per_input_ms / 1000.0, counter)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return server, base_url, counter
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake OpenAI embeddings endpoint")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=150.0)
+    parser.add_argument('--per-input-ms', type=float, default=0.5)
+    args = parser.parse_args()
+    server, base_url, _ = start_fake_server(args.port, args.latency_ms, args.per_input_ms)
+    print(f"Fake embedding endpoint listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,181 @@
+# hybrid_search.py
+#
+# Lexical layer in front of the embedding search for companies and accounts:
+#
+#   exact    folded ticker/code, name (also without the legal form or "Holding") and
+#            aliases -> row; a hit is returned without embedding the query
+#   lexical  BM25 over character trigrams of the folded id, name, aliases and
+#            description, so "Koc", "koç" and "KOÇ" or a typo still match
+#   fusion   reciprocal-rank fusion of the lexical and vector rankings
+#
+# Folding is Turkish-aware: I/İ are lowered the Turkish way and ç ğ ı ö ş ü
+# (and other marks) are stripped, so "Koç Holding A.Ş." and "KOC HOLDING AS"
+# share a key.
+
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+import numpy as np
+
+HYBRID_SEARCH = os.getenv('HYBRID_SEARCH', '1') == '1'
+# how many candidates each ranking contributes to the fusion
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '20'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# trailing legal forms and group words dropped from names for exact matching
+# ("Sabancı Holding A.Ş." is also keyed as "sabanci holding" and "sabanci")
+LEGAL_SUFFIXES = ('t a s', 'a s', 'a o', 'tas', 'as')
+GROUP_SUFFIXES = ('holding', 'holdingi', 'grubu', 'group')
+
+_TURKISH_UPPER = str.maketrans({'I': 'ı', 'İ': 'i'})
+_TURKISH_LETTERS = str.maketrans('çğıöşü', 'cgiosu')
+_NON_WORD = re.compile(r'[\W_]+')
+
+HYBRID_SEARCH_STATS = {'exact': 0, 'fused': 0}
+
+
+def fold_text(text) -> str:
+    """Lowercase (Turkish rules), strip diacritics and punctuation, collapse spaces."""
+    s = str(text).translate(_TURKISH_UPPER).lower().translate(_TURKISH_LETTERS)
+    s = unicodedata.normalize('NFKD', s)
+    s = ''.join(ch for ch in s if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', s).strip()
+
+
+def _strip_suffix(folded: str, suffixes: tuple[str, ...]) -> str:
+    for suffix in suffixes:
+        if folded.endswith(' ' + suffix):
+            return folded[:-len(suffix) - 1]
+    return folded
+
+
+def name_keys(folded: str) -> set[str]:
+    """Exact-match keys for a folded name: as is, without the legal form, without the group word."""
+    bare = _strip_suffix(folded, LEGAL_SUFFIXES)
+    return {k for k in (folded, bare, _strip_suffix(bare, GROUP_SUFFIXES)) if k}
+
+
+def trigrams(folded: str) -> list[str]:
+    grams = []
+    for word in folded.split():
+        padded = f" {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[str]:
+    """Ids ordered by sum(1 / (k + rank)) over the rankings they appear in."""
+    scores: dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda id_: -scores[id_])
+
+
+class LexicalIndex:
+    """
+    Exact-key map and trigram BM25 index over catalogue rows (dicts with
+    `id_field`, 'name' and 'description'). `aliases` maps an id to extra
+    names for it. Postings store precomputed BM25 weights, so a query is a
+    scatter-add per trigram and an argpartition top-k.
+    """
+
+    def __init__(self, rows: list[dict], id_field: str, aliases: dict[str, list[str]] | None = None):
+        aliases = aliases or {}
+        self.rows = rows
+        self.id_field = id_field
+        self.row_of = {row[id_field]: i for i, row in enumerate(rows)}
+        self.exact_keys: dict[str, list[int]] = {}
+
+        docs = []
+        for i, row in enumerate(rows):
+            names = [row[id_field], row['name'], *aliases.get(row[id_field], [])]
+            for name in names:
+                for key in name_keys(fold_text(name)):
+                    hits = self.exact_keys.setdefault(key, [])
+                    if i not in hits:
+                        hits.append(i)
+            docs.append(Counter(trigrams(fold_text(' '.join(names + [row['description']])))))
+
+        n = len(docs)
+        lengths = np.array([sum(d.values()) for d in docs], dtype=np.float32)
+        avg = float(lengths.mean()) if n else 0.0
+        by_term: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for i, doc in enumerate(docs):
+            for term, tf in doc.items():
+                by_term[term].append((i, tf))
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for term, entries in by_term.items():
+            ids = np.array([i for i, _ in entries], dtype=np.int32)
+            tf = np.array([t for _, t in entries], dtype=np.float32)
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[ids] / avg)
+            self.postings[term] = (ids, (idf * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def exact(self, query: str) -> list[int]:
+        """Rows whose id, name or alias folds to the query (empty if none)."""
+        folded = fold_text(query)
+        return self.exact_keys.get(folded) or self.exact_keys.get(_strip_suffix(folded, LEGAL_SUFFIXES), [])
+
+    def search(self, query: str, k: int = HYBRID_CANDIDATES) -> list[int]:
+        """Up to `k` rows by trigram BM25, best first; rows sharing no trigram are left out."""
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        for term, qtf in Counter(trigrams(fold_text(query))).items():
+            posting = self.postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += qtf * posting[1]
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind='stable')].tolist()
+
+    def record(self, i: int, cols: list[str] | None = None) -> dict:
+        row = self.rows[i]
+        return {c: row[c] for c in cols} if cols else dict(row)
+
+    def fuse(self, query: str, vector_hits: list[dict], limit: int, materialize) -> list[dict]:
+        """
+        Merge `vector_hits` (result dicts, best first) with the lexical ranking
+        by reciprocal-rank fusion. Rows only the lexical side found are built
+        with materialize(row_index).
+        """
+        HYBRID_SEARCH_STATS['fused'] += 1
+        by_id = {hit[self.id_field]: hit for hit in vector_hits}
+        lexical = [self.rows[i][self.id_field] for i in self.search(query)]
+        fused = reciprocal_rank_fusion([list(by_id), lexical])[:limit]
+        return [by_id[id_] if id_ in by_id else materialize(self.row_of[id_]) for id_ in fused]
+
+
+def exact_hits(index: LexicalIndex | None, query: str, limit: int, materialize) -> list[dict]:
+    """Exact id/name/alias matches built with materialize(row_index); counted in the stats."""
+    if index is None:
+        return []
+    hits = index.exact(query)[:limit]
+    if hits:
+        HYBRID_SEARCH_STATS['exact'] += 1
+    return [materialize(i) for i in hits]
+
+
+def parse_aliases(items: list[dict], id_field: str) -> dict[str, list[str]]:
+    """{id: [alias, ...]} from comma-separated 'aliases' fields (as in SAMPLE_COMPANIES)."""
+    return {item[id_field]: [a.strip() for a in item.get('aliases', '').split(',') if a.strip()]
+            for item in items}
+
+
+def invert_translations(translations: dict[str, str]) -> dict[str, list[str]]:
+    """{code: [label, ...]} from a label -> code map such as ACCOUNT_TRANSLATIONS."""
+    labels: dict[str, list[str]] = defaultdict(list)
+    for label, code in translations.items():
+        labels[code].append(label)
+    return dict(labels)
+
+
+def hybrid_search_stats() -> dict:
+    return dict(HYBRID_SEARCH_STATS)
@@ -0,0 +1,252 @@
+# label_resolver.py
+#
+# Sheet label -> account code resolution for ingest, replacing the bare
+# ACCOUNT_TRANSLATIONS lookup that silently dropped any label variant. Tried
+# in order:
+#
+#   manual      account_label_resolution rows an operator entered by hand
+#   exact       ACCOUNT_TRANSLATIONS (label stripped)
+#   stored      earlier resolutions made against the same translations
+#   normalized  folded key: Turkish casefold (I/ı, İ/i), diacritics,
+#               whitespace and parentheses, so "Ticari Alacaklar ( DÖNEN )"
+#               matches "Ticari Alacaklar (Dönen)"
+#   fuzzy       best character-trigram Dice score against the translation
+#               labels, when >= LABEL_FUZZY_MIN_SCORE and at least
+#               LABEL_FUZZY_MARGIN ahead of the best other code
+#   embedding   nearest account embedding (LABEL_EMBEDDING_FALLBACK=1, main
+#               process only), when cosine >= LABEL_EMBEDDING_MIN_SCORE;
+#               a miss is stored as 'embedding_miss' and not retried
+#
+# A column is resolved once per distinct label through its categorical
+# codes, so the cost does not grow with the number of periods. Fuzzy and
+# embedding matches never take a code that a stronger match already claims
+# in the same sheet. The loader writes new resolutions, including labels
+# left unmapped (NULL code), to account_label_resolution; mapping one there
+# with method 'manual' replaces hand-patching the workbook. Each row carries
+# the fingerprint of the translations and match thresholds it was resolved
+# under, and only rows with the current fingerprint are reused.
+
+import hashlib
+import json
+import os
+from collections import Counter
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from hybrid_search import fold_text, trigrams
+from sheet_cache import translations_fingerprint
+from embedding_store import open_embedding_store
+
+LABEL_FUZZY_MIN_SCORE = float(os.getenv('LABEL_FUZZY_MIN_SCORE', '0.85'))
+LABEL_FUZZY_MARGIN = float(os.getenv('LABEL_FUZZY_MARGIN', '0.05'))
+LABEL_EMBEDDING_FALLBACK = os.getenv('LABEL_EMBEDDING_FALLBACK', '0') == '1'
+LABEL_EMBEDDING_MIN_SCORE = float(os.getenv('LABEL_EMBEDDING_MIN_SCORE', '0.85'))
+LABEL_EMBEDDING_DIR = os.getenv('LABEL_EMBEDDING_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+
+# methods whose code wins over a fuzzy/embedding claim on the same code
+STRONG_METHODS = ('manual', 'exact', 'normalized')
+# methods that are never written back (they are recomputed from the code)
+UNSTORED_METHODS = ('exact', 'manual', 'conflict')
+
+
+def normalize_label(label) -> str:
+    return fold_text(label)
+
+
+def resolution_fingerprint(translations: dict[str, str],
+                           fuzzy_min_score: float = LABEL_FUZZY_MIN_SCORE,
+                           fuzzy_margin: float = LABEL_FUZZY_MARGIN,
+                           embedding_min_score: float = LABEL_EMBEDDING_MIN_SCORE) -> str:
+    """What a stored resolution depends on: the translations and the match thresholds."""
+    payload = json.dumps([translations_fingerprint(translations), fuzzy_min_score, fuzzy_margin,
+                          embedding_min_score])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LabelResolver:
+    """
+    Resolves raw sheet labels to account codes. `stored` holds
+    account_label_resolution rows as {label: (code, method, score)}.
+    Every result is a (code or None, method, score) tuple.
+    """
+
+    def __init__(self, translations: dict[str, str],
+                 stored: dict[str, tuple[str | None, str, float | None]] | None = None,
+                 fuzzy_min_score: float = LABEL_FUZZY_MIN_SCORE,
+                 fuzzy_margin: float = LABEL_FUZZY_MARGIN):
+        self.translations = translations
+        self.fingerprint = resolution_fingerprint(translations, fuzzy_min_score, fuzzy_margin)
+        self.known = dict(stored or {})
+        self.fuzzy_min_score = fuzzy_min_score
+        self.fuzzy_margin = fuzzy_margin
+        codes_by_key: dict[str, set[str]] = {}
+        for label, code in translations.items():
+            codes_by_key.setdefault(normalize_label(label), set()).add(code)
+        # keys that fold to two different codes are ambiguous and left to the later steps
+        self.normalized = {key: codes.pop() for key, codes in codes_by_key.items() if len(codes) == 1}
+        self._grams = [(Counter(trigrams(key)), code) for key, code in self.normalized.items()]
+
+    @classmethod
+    def from_db(cls, cur, translations: dict[str, str],
+                fuzzy_min_score: float = LABEL_FUZZY_MIN_SCORE,
+                fuzzy_margin: float = LABEL_FUZZY_MARGIN) -> 'LabelResolver':
+        """
+        Resolver seeded with manual rows and rows resolved against these
+        translations and thresholds. Rows naming an account code that does
+        not exist are ignored with a warning, so they do not drop the label
+        silently.
+        """
+        cur.execute(
+            """
+            SELECT r.label, r.account_code, r.method, r.score, r.account_code IS NULL OR a.code IS NOT NULL
+            FROM account_label_resolution r LEFT JOIN account a ON a.code = r.account_code
+            WHERE r.method = 'manual' OR r.translations = %s;
+            """,
+            (resolution_fingerprint(translations, fuzzy_min_score, fuzzy_margin),)
+        )
+        stored = {}
+        for label, code, method, score, valid in cur.fetchall():
+            if valid:
+                stored[label] = (code, method, score)
+            else:
+                print(f"account_label_resolution: {label!r} -> unknown account code {code!r}, ignored.")
+        return cls(translations, stored, fuzzy_min_score, fuzzy_margin)
+
+    def resolve(self, label: str) -> tuple[str | None, str, float | None]:
+        label = str(label).strip()
+        known = self.known.get(label)
+        if known is not None and known[1] == 'manual':
+            return known
+        code = self.translations.get(label)
+        if code is not None:
+            return code, 'exact', 1.0
+        if known is not None:
+            return known
+        key = normalize_label(label)
+        if not key or key == 'nan':
+            return None, 'blank', None
+        if key in self.normalized:
+            result = (self.normalized[key], 'normalized', 1.0)
+        else:
+            result = self._fuzzy(key)
+        self.known[label] = result
+        return result
+
+    def _fuzzy(self, key: str) -> tuple[str | None, str, float | None]:
+        grams = Counter(trigrams(key))
+        size = sum(grams.values())
+        best_by_code: dict[str, float] = {}
+        for other, code in self._grams:
+            score = 2 * sum((grams & other).values()) / (size + sum(other.values()))
+            if score > best_by_code.get(code, 0.0):
+                best_by_code[code] = score
+        ranked = sorted(best_by_code.items(), key=lambda kv: -kv[1])[:2]
+        if not ranked or ranked[0][1] == 0:
+            return None, 'unmapped', None
+        (code, score), runner_up = ranked[0], (ranked[1][1] if len(ranked) > 1 else 0.0)
+        if score >= self.fuzzy_min_score and score - runner_up >= self.fuzzy_margin:
+            return code, 'fuzzy', round(score, 4)
+        return None, 'unmapped', round(score, 4)
+
+    def resolve_column(self, labels: pd.Series) -> tuple[pd.Categorical, dict]:
+        """
+        Account code per label (NaN where unresolved), resolved once per
+        distinct stripped label. Returns (codes, report) with report =
+        {'resolved': {label: (code, method, score)} for every non-exact
+        label, 'unmapped': [labels]}.
+        """
+        cat = pd.Categorical(labels)
+        # whitespace variants of a label are one label, not rivals for its code
+        stripped = [str(label).strip() for label in cat.categories]
+        distinct = list(dict.fromkeys(stripped))
+        results = [self.resolve(label) for label in distinct]
+
+        # a fuzzy/embedding match must not take a code a stronger match holds in this sheet
+        strong = {code for code, method, _ in results if code is not None and method in STRONG_METHODS}
+        best_weak: dict[str, int] = {}
+        for i, (code, method, score) in enumerate(results):
+            if code is None or method in STRONG_METHODS:
+                continue
+            j = best_weak.get(code)
+            if code in strong or (j is not None and results[j][2] >= score):
+                results[i] = (None, 'conflict', score)
+            else:
+                if j is not None:
+                    results[j] = (None, 'conflict', results[j][2])
+                best_weak[code] = i
+
+        # label category -> code category, then one take over the row codes
+        # (the trailing -1 is what a missing label's code -1 picks)
+        account_codes = sorted({code for code, _, _ in results if code is not None})
+        position = {code: i for i, code in enumerate(account_codes)}
+        distinct_pos = {label: i for i, label in enumerate(distinct)}
+        label_to_code = np.array([position.get(results[distinct_pos[label]][0], -1) for label in stripped] + [-1],
+                                 dtype=np.int32)
+        codes = pd.Categorical.from_codes(label_to_code[cat.codes], categories=account_codes)
+        report = {'resolved': {}, 'unmapped': []}
+        for label, (code, method, score) in zip(distinct, results):
+            if method == 'blank':
+                continue
+            if method != 'exact':
+                report['resolved'][label] = (code, method, score)
+            if code is None:
+                report['unmapped'].append(label)
+        return codes, report
+
+    def resolve_by_embedding(self, labels: list[str],
+                             min_score: float = LABEL_EMBEDDING_MIN_SCORE) -> int:
+        """
+        Match still-unmapped labels to the nearest account embedding
+        (one batched embedding call). Returns how many were resolved.
+        """
+        store = open_embedding_store(LABEL_EMBEDDING_DIR, 'account', 'code')
+        labels = [label for label in labels if self.known.get(label, (None, 'unmapped'))[1] == 'unmapped']
+        if store is None or not labels:
+            return 0
+        from embedding_service import get_embedding_service  # network client, main process only
+        queries = np.asarray(get_embedding_service().embed_many(labels), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        norms = np.sqrt(np.einsum('ij,ij->i', store.matrix, store.matrix))
+        scores = (queries @ store.matrix.T) / np.where(norms == 0, 1.0, norms)
+        codes = store.column('id')
+        resolved = 0
+        for label, row in zip(labels, scores):
+            best = int(np.argmax(row))
+            if row[best] >= min_score:
+                self.known[label] = (codes[best], 'embedding', round(float(row[best]), 4))
+                resolved += 1
+            else:
+                # stored as tried, so the next load does not embed it again
+                self.known[label] = (None, 'embedding_miss', round(float(row[best]), 4))
+        return resolved
+
+
+def store_resolutions(cur, resolved: dict[str, tuple], fingerprint: str) -> int:
+    """Upsert non-exact resolutions into account_label_resolution; manual rows are never overwritten."""
+    rows = [(label, code, method, score, fingerprint)
+            for label, (code, method, score) in resolved.items() if method not in UNSTORED_METHODS]
+    if not rows:
+        return 0
+    execute_values(
+        cur,
+        """
+        INSERT INTO account_label_resolution (label, account_code, method, score, translations)
+        VALUES %s
+        ON CONFLICT (label) DO UPDATE
+          SET account_code = EXCLUDED.account_code,
+              method       = EXCLUDED.method,
+              score        = EXCLUDED.score,
+              translations = EXCLUDED.translations,
+              resolved_at  = now()
+        WHERE account_label_resolution.method <> 'manual';
+        """,
+        rows
+    )
+    return len(rows)
+
+
+def resolver_fingerprint(cur) -> list:
+    """Everything besides the translations that changes how labels resolve (for bootstrap)."""
+    cur.execute("SELECT label, account_code FROM account_label_resolution WHERE method = 'manual' ORDER BY label;")
+    return [cur.fetchall(), LABEL_FUZZY_MIN_SCORE, LABEL_FUZZY_MARGIN,
+            LABEL_EMBEDDING_FALLBACK and LABEL_EMBEDDING_MIN_SCORE]
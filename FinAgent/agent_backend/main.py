@@ -1,11 +1,21 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import os
 from dotenv import load_dotenv
 from agents import Agent, Runner, gen_trace_id, trace, WebSearchTool
-from agent_wrapper import send_message, initialize_agent_global
+from agent_wrapper import send_message, stream_message, initialize_agent_global
+from chat_stream import sse_stream, chat_stream_stats
+from embedding_service import get_query_embedding_cache
+from db_pool import init_pool, get_pool, close_pool
+from async_db import init_async_pool, close_async_pool, async_pool_stats
+from fact_cube import fact_cube_stats
+from sql_guard import sql_guard_stats
+from hybrid_search import hybrid_search_stats
+from sql_cache import get_sql_cache
+from session_store import get_session_store
 import asyncio
 # Load environment variables
 
@@ -24,9 +34,16 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    # Initialize agent during application startup
+    # Open the shared DB connection pools, then initialize the agent
+    init_pool()
+    await init_async_pool()
     await initialize_agent_global()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_pool()
+    close_pool()
+
 class ChatRequest(BaseModel):
     message: str
     trace_id: Optional[str] = None
@@ -38,10 +55,10 @@ class ChatResponse(BaseModel):
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
-        # Generate a new trace_id if not provided
+        # Generate a new trace_id if not provided; it also keys the conversation's session
         trace_id = request.trace_id or gen_trace_id()
 
-        result = await send_message(request.message)
+        result = await send_message(request.message, trace_id)
 
         response = result
         # Process the message with the agent
@@ -54,10 +71,35 @@ async def chat(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_streamed(request: ChatRequest):
+    # Same request as /chat, answered as server-sent events (see chat_stream.py)
+    trace_id = request.trace_id or gen_trace_id()
+    print(f"Received message (stream): {request.message}")
+    return StreamingResponse(
+        sse_stream(stream_message(request.message, trace_id), trace_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
 async def health_check():    
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "db_pool": get_pool().stats(),
+        "async_db_pool": async_pool_stats(),
+        "fact_cube": fact_cube_stats(),
+        "sql_guard": sql_guard_stats(),
+        "sql_cache": get_sql_cache().stats(),
+        "hybrid_search": hybrid_search_stats(),
+        "chat_stream": chat_stream_stats(),
+        "sessions": get_session_store().stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 4000))
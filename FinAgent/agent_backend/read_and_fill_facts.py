@@ -1,10 +1,20 @@
 # read_and_fill_facts.py
 
+import argparse
 import os
-import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import psycopg2
-from psycopg2.extras import execute_values
 from dotenv import load_dotenv
+from fact_pipeline import FactLookups, transform_long
+from sheet_cache import load_sheet
+from fact_views import refresh_fact_views
+from account_tree import refresh_account_rollups
+from derived_metrics import derived_account_ids, recompute_derived
+from bulk_loader import BULK_BATCH_ROWS, copy_fact_records
+from fact_cube import log_fact_change
+from label_resolver import LABEL_EMBEDDING_FALLBACK, LabelResolver, store_resolutions
 
 # Load environment variables for DB connection
 load_dotenv()
@@ -16,6 +26,12 @@ DB_PARAMS = {
     'port': os.getenv('DB_PORT', '5432')
 }
 
+# Parallel ingest: number of workbook parser processes. 1 (parse in-process)
+# unless set, because bootstrap runs this inside the API server process; the
+# CLI defaults to CLI_INGEST_WORKERS instead.
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '1'))
+CLI_INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', str(min(8, os.cpu_count() or 1))))
+
 # Sheet and file configurations
 SHEET_NAME = 'Bilanço'
 COMPANY_CONFIGS = [
@@ -165,133 +181,188 @@ def parse_period(col_name: str):
     quarter = (month - 1) // 3 + 1
     return year, quarter
 
-def read_and_fill_facts():
+def configs_from_stock_codes(codes_path: str, excel_dir: str) -> list[dict]:
+    """
+    COMPANY_CONFIGS-style entries for a WebFintables download: one ticker per
+    line of stock_codes.txt, workbooks saved as <excel_dir>/<TICKER>.xlsx.
+    Tickers without a downloaded workbook are left out.
+    """
+    with open(codes_path, encoding='utf-8') as f:
+        tickers = [line.strip() for line in f if line.strip()]
+    configs = []
+    for ticker in tickers:
+        path = os.path.join(excel_dir, f"{ticker}.xlsx")
+        if os.path.exists(path):
+            configs.append({'excel_path': path, 'ticker': ticker})
+    if len(configs) < len(tickers):
+        print(f"{len(tickers) - len(configs)} of {len(tickers)} tickers have no workbook in {excel_dir}.")
+    return configs
+
+# --- PARALLEL PARSING ---
+_worker_lookups: FactLookups | None = None
+_worker_resolver: LabelResolver | None = None
+
+def _init_parse_worker(lookups: FactLookups, resolver: LabelResolver):
+    # lookups and the label resolver are shipped once per worker process instead of once per file
+    global _worker_lookups, _worker_resolver
+    _worker_lookups, _worker_resolver = lookups, resolver
+
+def parse_workbook(cfg: dict, company_id: int, lookups: FactLookups | None = None,
+                   resolver: LabelResolver | None = None) -> dict:
+    """
+    Read one workbook (through the Parquet sheet cache, so openpyxl only runs
+    for new or changed files), resolve its labels to account codes and
+    transform it to FACT_DTYPE records. Never raises: failures are returned
+    as {'error': ...} so one bad file cannot abort a load.
+    """
+    started = time.perf_counter()
+    try:
+        long = load_sheet(cfg['excel_path'], SHEET_NAME, ACCOUNT_TRANSLATIONS)
+        long['account_code'], labels = (resolver or _worker_resolver).resolve_column(long['label'])
+        records = transform_long(long, company_id, lookups or _worker_lookups)
+        return {'ticker': cfg['ticker'], 'company_id': company_id, 'records': records,
+                'labels': labels, 'error': None, 'seconds': time.perf_counter() - started}
+    except Exception as e:
+        return {'ticker': cfg['ticker'], 'company_id': company_id, 'records': None,
+                'error': f"{type(e).__name__}: {e}", 'seconds': time.perf_counter() - started}
+
+def iter_parsed_workbooks(jobs: list[tuple[dict, int]], lookups: FactLookups,
+                          resolver: LabelResolver, workers: int):
+    """Yield parse_workbook results in completion order, using a process pool when workers > 1."""
+    if workers <= 1 or len(jobs) <= 1:
+        for cfg, company_id in jobs:
+            yield parse_workbook(cfg, company_id, lookups, resolver)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                             initargs=(lookups, resolver)) as pool:
+        futures = [pool.submit(parse_workbook, cfg, company_id) for cfg, company_id in jobs]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+def read_and_fill_facts(configs: list[dict] = COMPANY_CONFIGS, replace: bool = False,
+                        workers: int = INGEST_WORKERS) -> dict:
     """
     Reads each company's Excel Bilanço sheet, translates account names,
-    looks up company_id, account_id, and period_id, then bulk-inserts
-    financial facts into the database.
+    looks up company_id, account_id, and period_id, then bulk-loads
+    financial facts into the database with COPY.
+
+    configs: subset of COMPANY_CONFIGS to load (default: all).
+    replace: delete the existing facts of every loaded company first, in the
+             same transaction, so rows dropped from a workbook disappear too.
+             Derived accounts (derived_metrics) are neither loaded from the
+             sheet nor deleted; recompute_derived maintains them.
+    workers: parser processes; workbooks are parsed in parallel and streamed
+             to Postgres by this process, the single writer.
+
+    Sheet labels go through label_resolver (exact, normalized, fuzzy, and
+    with LABEL_EMBEDDING_FALLBACK=1 embedding matches); new resolutions are
+    stored in account_label_resolution in the same transaction and labels
+    that stay unmapped are reported per file.
+
+    Returns {'loaded': [tickers], 'failed': {ticker: error}, 'facts': int,
+    'unmapped': {ticker: [labels]}}. A workbook that fails to parse is
+    reported and skipped; its existing facts are left untouched.
     """
     # 1) Connect and build lookup maps
     with psycopg2.connect(**DB_PARAMS) as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT ticker, company_id FROM company;")
             company_map = dict(cur.fetchall())
+            lookups = FactLookups.from_db(cur, ACCOUNT_TRANSLATIONS)
+            resolver = LabelResolver.from_db(cur, ACCOUNT_TRANSLATIONS)
+            # derived accounts belong to derived_metrics; sheet rows for them are not loaded
+            derived_ids = derived_account_ids(cur)
 
-            cur.execute("SELECT code, account_id FROM account;")
-            account_map = dict(cur.fetchall())
-
-            cur.execute("SELECT year, quarter, period_id FROM period;")
-            period_map = {(y, q): pid for y, q, pid in cur.fetchall()}
-
-        records = []
-
-        # 2) Process each Excel file
-        for cfg in COMPANY_CONFIGS:
-            df = pd.read_excel(cfg['excel_path'], sheet_name=SHEET_NAME, header=0)
-
-            # Rename the first column to 'account_name'
-            first_col = df.columns[0]
-            df.rename(columns={first_col: 'account_name'}, inplace=True)
-
-            # Clean up and translate account names
-            df['account_name'] = df['account_name'].astype(str).str.strip()
-            df['account_code'] = df['account_name'].map(ACCOUNT_TRANSLATIONS)
-            df.dropna(subset=['account_code'], inplace=True)
-
+        jobs, cfg_by_ticker = [], {}
+        for cfg in configs:
             company_id = company_map.get(cfg['ticker'])
             if not company_id:
+                print(f"Skipping {cfg['ticker']}: not in the company table.")
                 continue
+            jobs.append((cfg, company_id))
+            cfg_by_ticker[cfg['ticker']] = cfg
 
-            # 3) For each period column, gather facts
-            for col in df.columns.drop(['account_name', 'account_code']):
-                try:
-                    year, quarter = parse_period(col)
-                except ValueError:
-                    continue
+        loaded, loaded_ids, failed, unmapped, resolved = [], [], {}, {}, {}
+        buffered, buffered_rows, total, deleted = [], 0, 0, 0
+        started = time.perf_counter()
 
-                period_id = period_map.get((year, quarter))
-                if not period_id:
-                    continue
+        def flush(cur):
+            nonlocal buffered, buffered_rows, total
+            if buffered:
+                total += copy_fact_records(cur, np.concatenate(buffered))
+                buffered, buffered_rows = [], 0
 
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                sub = df[['account_code', col]].dropna(subset=[col])
-                for _, row in sub.iterrows():
-                    acct_code = row['account_code']
-                    account_id = account_map.get(acct_code)
-                    if not account_id:
+        # 2) Parse workbooks (in parallel) and stream each result with COPY
+        with conn.cursor() as cur:
+            for i, result in enumerate(iter_parsed_workbooks(jobs, lookups, resolver, workers), 1):
+                ticker = result['ticker']
+                if result['error']:
+                    failed[ticker] = result['error']
+                    print(f"[{i}/{len(jobs)}] {ticker}: FAILED ({result['error']})")
+                    continue
+                if (LABEL_EMBEDDING_FALLBACK and result['labels']['unmapped']
+                        and resolver.resolve_by_embedding(result['labels']['unmapped'])):
+                    # re-run in this process with the new matches (the sheet comes from the cache)
+                    result = parse_workbook(cfg_by_ticker[ticker], result['company_id'], lookups, resolver)
+                    if result['error']:
+                        failed[ticker] = result['error']
+                        print(f"[{i}/{len(jobs)}] {ticker}: FAILED on re-parse ({result['error']})")
                         continue
-                    value = row[col]
-                    records.append((company_id, period_id, account_id, value))
-
-        # 4) Bulk-insert all collected records
-        if records:
-            with conn.cursor() as cur:
-                insert_sql = """
-                    INSERT INTO financial_fact
-                      (company_id, period_id, account_id, value)
-                    VALUES %s
-                """
-                execute_values(cur, insert_sql, records)
-            conn.commit()
-            print(f"Inserted {len(records)} new financial facts.")
-        else:
-            print("No new financial facts to insert.")
-
-def insert_total_liabilities():
-    """
-    For each company & period, sum the values of
-    TOTAL_LONG_TERM_LIABILITIES + TOTAL_SHORT_TERM_LIABILITIES
-    and insert a new financial_fact row for TOTAL_LIABILITIES.
-    """
-    conn = psycopg2.connect(**DB_PARAMS)
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                # 1) lookup the account_ids
-                codes = [
-                    'TOTAL_LIABILITIES',
-                    'TOTAL_LONG_TERM_LIABILITIES',
-                    'TOTAL_SHORT_TERM_LIABILITIES'
-                ]
-                cur.execute(
-                    "SELECT code, account_id FROM account WHERE code = ANY(%s)",
-                    (codes,)
-                )
-                acct_map: Dict[str, int] = {code: aid for code, aid in cur.fetchall()}
-                total_id = acct_map['TOTAL_LIABILITIES']
-                long_id  = acct_map['TOTAL_LONG_TERM_LIABILITIES']
-                short_id = acct_map['TOTAL_SHORT_TERM_LIABILITIES']
-
-                # 2) compute sums per company & period
-                cur.execute(
-                    """
-                    SELECT
-                      company_id,
-                      period_id,
-                      SUM(value) AS total_value
-                    FROM financial_fact
-                    WHERE account_id IN %s
-                    GROUP BY company_id, period_id
-                    """,
-                    ((long_id, short_id),)
-                )
-                sums: Tuple[int, int, float] = cur.fetchall()
-
-                # 3) prepare insert rows: (company_id, period_id, account_id, value)
-                to_insert = [
-                    (company_id, period_id, total_id, total_value)
-                    for company_id, period_id, total_value in sums
-                ]
-
-                # 4) batch‐insert them
-                insert_sql = """
-                    INSERT INTO financial_fact
-                      (company_id, period_id, account_id, value)
-                    VALUES %s
-                """
-                execute_values(cur, insert_sql, to_insert)
-
-        print(f"Inserted {len(to_insert)} TOTAL_LIABILITIES facts.")
-    finally:
-        conn.close()
-
+                resolved.update(result['labels']['resolved'])
+                if replace:
+                    cur.execute(
+                        "DELETE FROM financial_fact WHERE company_id = %s AND account_id <> ALL(%s)",
+                        (result['company_id'], derived_ids)
+                    )
+                    deleted += cur.rowcount
+                records = result['records']
+                records = records[~np.isin(records['account_id'], derived_ids)]
+                buffered.append(records)
+                buffered_rows += len(records)
+                loaded.append(ticker)
+                loaded_ids.append(result['company_id'])
+                if buffered_rows >= BULK_BATCH_ROWS:
+                    flush(cur)
+                elapsed = time.perf_counter() - started
+                print(f"[{i}/{len(jobs)}] {ticker}: {len(records)} facts "
+                      f"(parsed in {result['seconds']:.2f}s, {i / elapsed:.1f} files/s)")
+                if result['labels']['unmapped']:
+                    unmapped[ticker] = result['labels']['unmapped']
+                    print(f"    {len(unmapped[ticker])} unmapped labels: "
+                          + ', '.join(repr(label) for label in unmapped[ticker]))
+            flush(cur)
+            store_resolutions(cur, resolved, resolver.fingerprint)
+            if loaded_ids:
+                log_fact_change(cur, loaded_ids)
+        conn.commit()
+
+    if replace:
+        print(f"Deleted {deleted} existing facts for {len(loaded)} companies.")
+    if total:
+        print(f"Inserted {total} new financial facts.")
+    else:
+        print("No new financial facts to insert.")
+    if failed:
+        print(f"{len(failed)} workbooks failed to parse: {', '.join(sorted(failed))}")
+    fixed = sum(1 for code, _, _ in resolved.values() if code is not None)
+    if fixed:
+        print(f"Resolved {fixed} non-exact sheet labels (see account_label_resolution).")
+    return {'loaded': loaded, 'failed': failed, 'facts': total, 'unmapped': unmapped}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load Bilanço workbooks into financial_fact")
+    parser.add_argument('--stock-codes', help="stock_codes.txt from WebFintables (default: COMPANY_CONFIGS)")
+    parser.add_argument('--excel-dir', default='.', help="directory holding <TICKER>.xlsx files")
+    parser.add_argument('--workers', type=int, default=CLI_INGEST_WORKERS)
+    parser.add_argument('--replace', action='store_true', help="replace existing facts of loaded companies")
+    args = parser.parse_args()
+    configs = configs_from_stock_codes(args.stock_codes, args.excel_dir) if args.stock_codes else COMPANY_CONFIGS
+    summary = read_and_fill_facts(configs, replace=args.replace, workers=args.workers)
+    if summary['loaded']:
+        with psycopg2.connect(**DB_PARAMS) as conn, conn.cursor() as cur:
+            cur.execute("SELECT company_id FROM company WHERE ticker = ANY(%s);", (summary['loaded'],))
+            company_ids = [cid for (cid,) in cur.fetchall()]
+        recompute_derived(company_ids)
+        refresh_account_rollups(company_ids)
+        refresh_fact_views(company_ids)
@@ -0,0 +1,72 @@
+# search_statements.py
+#
+# Catalogue of the hot vector-search statements. They are written with $n
+# placeholders so the same text serves both drivers:
+#
+#   psycopg2  PREPAREd server-side once per pooled connection (on first use)
+#             and run with EXECUTE, so they are parsed and planned once
+#   asyncpg   prepared by the driver's statement cache; the query vector is
+#             sent in pgvector's binary format (see async_db's vector codec)
+#
+# The account search returns each match together with its direct children as
+# JSON in one round trip, instead of a match query plus a children query.
+
+import weakref
+
+ACCOUNT_SEARCH_WITH_CHILDREN = """
+WITH matches AS (
+  SELECT account_id, code, name, description, parent_account_id,
+         embedding <=> $1 AS distance
+  FROM account
+  ORDER BY embedding <=> $1
+  LIMIT $2
+)
+SELECT
+  m.code,
+  m.name,
+  m.description,
+  p.code AS parent_code,
+  COALESCE(
+    json_agg(json_build_object('code', c.code, 'name', c.name,
+                               'description', c.description, 'parent_code', m.code)
+             ORDER BY c.account_id) FILTER (WHERE c.account_id IS NOT NULL),
+    '[]'::json) AS children
+FROM matches m
+LEFT JOIN account p ON p.account_id = m.parent_account_id
+LEFT JOIN account c ON c.parent_account_id = m.account_id
+GROUP BY m.account_id, m.code, m.name, m.description, p.code, m.distance
+ORDER BY m.distance
+"""
+
+COMPANY_SEARCH = """
+SELECT ticker, name, description
+FROM company
+ORDER BY embedding <=> $1
+LIMIT $2
+"""
+
+# name -> (statement, parameter types for PREPARE)
+PREPARED_STATEMENTS: dict[str, tuple[str, list[str]]] = {
+    'account_search_with_children': (ACCOUNT_SEARCH_WITH_CHILDREN, ['vector', 'integer']),
+    'company_search': (COMPANY_SEARCH, ['vector', 'integer']),
+}
+
+# psycopg2 connections that already hold the catalogue
+_prepared_connections = weakref.WeakSet()
+
+
+def prepare_statements(cur) -> None:
+    """PREPARE the whole catalogue on the cursor's connection (once per connection)."""
+    conn = cur.connection
+    if conn in _prepared_connections:
+        return
+    for name, (sql, types) in PREPARED_STATEMENTS.items():
+        cur.execute(f"PREPARE {name} ({', '.join(types)}) AS {sql};")
+    _prepared_connections.add(conn)
+
+
+def execute_prepared(cur, name: str, params: tuple) -> None:
+    """EXECUTE a catalogue statement with psycopg2, preparing it on first use."""
+    prepare_statements(cur)
+    placeholders = ', '.join(['%s'] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders});", params)
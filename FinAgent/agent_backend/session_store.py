@@ -0,0 +1,284 @@
+# session_store.py
+#
+# Per-conversation state for /chat and /chat/stream, keyed by the request's
+# trace_id. Without it every message started a fresh run, so follow-ups
+# ("and in 2023?", "compare it with Sabancı") had to repeat the context and
+# made the agent look up the same companies, accounts and facts again.
+#
+# A session keeps:
+#
+#   turns     the Responses input items of each earlier turn (user message,
+#             tool calls and outputs, answer), replayed as the next run's input
+#   resolved  what the tools already established: search query -> top
+#             company/account, and fact values from get_fact/get_series.
+#             They are given to the model as one developer message, so it
+#             can reuse them instead of calling the tools again
+#
+# History is compacted after every turn: tool calls and outputs are kept for
+# the last SESSION_KEEP_TOOL_TURNS turns only (what they found is already in
+# `resolved`), then the oldest turns are dropped while the history is above
+# SESSION_MAX_TURNS turns or SESSION_MAX_CHARS characters of JSON.
+#
+# Sessions live in an LRU of SESSION_MAX_SESSIONS; sessions idle for
+# SESSION_IDLE_SECONDS are evicted. With SESSION_DB_PATH set they are also
+# written to SQLite after each turn, so an evicted session or one from
+# before a restart is loaded back until it has been idle that long.
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_MAX_TURNS = int(os.getenv('SESSION_MAX_TURNS', '12'))
+SESSION_MAX_CHARS = int(os.getenv('SESSION_MAX_CHARS', '24000'))
+SESSION_KEEP_TOOL_TURNS = int(os.getenv('SESSION_KEEP_TOOL_TURNS', '1'))
+SESSION_MAX_RESOLVED = int(os.getenv('SESSION_MAX_RESOLVED', '50'))   # per kind
+SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', '1000'))
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', '3600'))
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', '')   # '' = in memory only
+
+RESOLVED_KINDS = ('companies', 'accounts', 'facts')
+TOOL_ITEM_TYPES = ('function_call', 'function_call_output', 'reasoning')
+
+
+def _items_chars(items: list) -> int:
+    return len(json.dumps(items, ensure_ascii=False, separators=(',', ':'), default=str))
+
+
+def _json_output(output):
+    """Tool output as Python data (fact tools return JSON strings)."""
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except ValueError:
+            return None
+    return output
+
+
+class Session:
+    """One conversation: earlier turns as input items plus the entities resolved in them."""
+
+    def __init__(self, session_id: str, turns: list[list[dict]] | None = None,
+                 resolved: dict[str, dict[str, str]] | None = None, updated_at: float | None = None):
+        self.session_id = session_id
+        self.turns = turns or []
+        self.resolved = {kind: dict((resolved or {}).get(kind, {})) for kind in RESOLVED_KINDS}
+        self.updated_at = updated_at or time.time()
+        self.lock = asyncio.Lock()   # one run at a time per conversation
+
+    def context_message(self) -> dict | None:
+        lines = []
+        labels = {'companies': 'Companies (search -> ticker)', 'accounts': 'Accounts (search -> code)',
+                  'facts': 'Facts'}
+        for kind in RESOLVED_KINDS:
+            if self.resolved[kind]:
+                values = '; '.join(f"{k} -> {v}" if kind != 'facts' else f"{k} = {v}"
+                                   for k, v in self.resolved[kind].items())
+                lines.append(f"{labels[kind]}: {values}")
+        if not lines:
+            return None
+        return {'role': 'developer',
+                'content': "Already resolved earlier in this conversation; use these directly instead of "
+                           "calling the search or fact tools again for them:\n" + '\n'.join(lines)}
+
+    def input_for(self, message: str) -> list[dict]:
+        """Run input: resolved entities, earlier turns, then the new user message."""
+        context = self.context_message()
+        items = [context] if context else []
+        for turn in self.turns:
+            items.extend(turn)
+        items.append({'role': 'user', 'content': message})
+        return items
+
+    def record_turn(self, message: str, new_items: list) -> None:
+        """Append a finished run (its RunItems) and pick up what its tools resolved."""
+        turn = [{'role': 'user', 'content': message}]
+        turn.extend(item.to_input_item() for item in new_items)
+        self.turns.append(turn)
+        calls = {}
+        for item in new_items:
+            if item.type == 'tool_call_item' and getattr(item.raw_item, 'type', None) == 'function_call':
+                calls[item.raw_item.call_id] = item.raw_item
+            elif item.type == 'tool_call_output_item':
+                raw = item.raw_item
+                call = calls.get(raw.get('call_id') if isinstance(raw, dict) else None)
+                if call is not None:
+                    self._resolve(call.name, call.arguments, _json_output(item.output))
+        self.compact()
+        self.updated_at = time.time()
+
+    def _remember(self, kind: str, key: str, value) -> None:
+        entries = self.resolved[kind]
+        entries.pop(key, None)
+        entries[key] = value
+        while len(entries) > SESSION_MAX_RESOLVED:
+            del entries[next(iter(entries))]
+
+    def _resolve(self, tool: str, arguments: str, output) -> None:
+        try:
+            args = json.loads(arguments or '{}')
+        except ValueError:
+            return
+        if tool == 'get_similar_companies' and isinstance(output, list) and output:
+            top = output[0]
+            self._remember('companies', args.get('company_name_prompt', ''), f"{top.get('ticker')} ({top.get('name')})")
+        elif tool == 'get_similar_accounts' and isinstance(output, list) and output:
+            top = output[0]
+            self._remember('accounts', args.get('account_query_prompt', ''), f"{top.get('code')} ({top.get('name')})")
+        elif tool == 'get_fact' and isinstance(output, dict):
+            self._remember('facts', f"{output['ticker']} {output['account']} {output['period']}", output['value'])
+        elif tool == 'get_series' and isinstance(output, dict):
+            for period, value in output.get('values', {}).items():
+                self._remember('facts', f"{output['ticker']} {output['account']} {period}", value)
+
+    def compact(self) -> int:
+        """Apply the history bounds; returns how many turns were dropped."""
+        keep_tools = max(len(self.turns) - SESSION_KEEP_TOOL_TURNS, 0)
+        for i in range(keep_tools):
+            self.turns[i] = [item for item in self.turns[i] if item.get('type') not in TOOL_ITEM_TYPES]
+        dropped = 0
+        while len(self.turns) > 1 and (len(self.turns) > SESSION_MAX_TURNS
+                                       or _items_chars(self.turns) > SESSION_MAX_CHARS):
+            self.turns.pop(0)
+            dropped += 1
+        return dropped
+
+    def to_json(self) -> str:
+        return json.dumps({'turns': self.turns, 'resolved': self.resolved},
+                          ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class SessionDisk:
+    """SQLite table of session JSON, for sessions evicted from memory or across restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_session (
+              session_id  TEXT PRIMARY KEY,
+              data        TEXT NOT NULL,
+              updated_at  REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chat_session_updated_at ON chat_session (updated_at)")
+        self._conn.commit()
+
+    def load(self, session_id: str, min_updated_at: float) -> Session | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at FROM chat_session WHERE session_id = ? AND updated_at >= ?",
+                (session_id, min_updated_at)
+            ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        return Session(session_id, data['turns'], data['resolved'], row[1])
+
+    def save(self, session_id: str, data: str, updated_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chat_session (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, data, updated_at)
+            )
+            self._conn.commit()
+
+    def purge(self, before: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM chat_session WHERE updated_at < ?", (before,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SessionStore:
+    """LRU of live sessions with idle eviction, optionally backed by SessionDisk."""
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, idle_seconds: float = SESSION_IDLE_SECONDS,
+                 disk: SessionDisk | None = None):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.disk = disk
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
+        self.hits = self.disk_hits = self.created = self.evictions = self.dropped_turns = 0
+
+    def _evict(self) -> None:
+        # oldest first: drop idle sessions and, above max_sessions, the least recently used;
+        # a session with a run in progress is skipped
+        cutoff = time.time() - self.idle_seconds
+        for session_id, session in list(self.sessions.items()):
+            if len(self.sessions) <= self.max_sessions and session.updated_at >= cutoff:
+                break
+            if session.lock.locked():
+                continue
+            del self.sessions[session_id]
+            self.evictions += 1
+
+    async def get(self, session_id: str) -> Session:
+        """The conversation's session: from memory, else from disk, else a new one."""
+        session = self.sessions.get(session_id)
+        if session is not None and time.time() - session.updated_at <= self.idle_seconds:
+            self.sessions.move_to_end(session_id)
+            self.hits += 1
+            return session
+        session = None
+        if self.disk is not None:
+            session = await asyncio.to_thread(self.disk.load, session_id, time.time() - self.idle_seconds)
+            if session is not None:
+                self.disk_hits += 1
+            elif self.created % 100 == 0:
+                await asyncio.to_thread(self.disk.purge, time.time() - self.idle_seconds)
+        # a concurrent request may have set it up while this one was reading the disk
+        current = self.sessions.get(session_id)
+        if current is not None and current.updated_at >= time.time() - self.idle_seconds:
+            session = current
+        elif session is None:
+            session = Session(session_id)
+            self.created += 1
+        self.sessions[session_id] = session
+        self.sessions.move_to_end(session_id)
+        self._evict()
+        return session
+
+    async def record_turn(self, session: Session, message: str, new_items: list) -> None:
+        """Add a finished turn to the session and write it through to disk."""
+        before = len(session.turns) + 1
+        session.record_turn(message, new_items)
+        self.dropped_turns += before - len(session.turns)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.save, session.session_id, session.to_json(), session.updated_at)
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self.sessions),
+            'max_sessions': self.max_sessions,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'created': self.created,
+            'evictions': self.evictions,
+            'dropped_turns': self.dropped_turns,
+            'disk': self.disk.path if self.disk is not None else None,
+        }
+
+
+_store: SessionStore | None = None
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide SessionStore, SQLite-backed when SESSION_DB_PATH is set."""
+    global _store
+    if _store is None:
+        _store = SessionStore(disk=SessionDisk(SESSION_DB_PATH) if SESSION_DB_PATH else None)
+    return _store
@@ -0,0 +1,172 @@
+# sheet_cache.py
+#
+# Normalized Parquet cache of parsed Bilanço sheets: one file per workbook
+# sheet, in long format (row, label, account_code, period, year, quarter,
+# value), named after the ticker plus a hash of the workbook's absolute path
+# and the sheet name, so same-named workbooks in different directories, and
+# different sheets (or sheet_name=0 vs 'Bilanço') of one workbook, do not
+# share an entry. Entries are
+# validated against the source workbook (path, size + mtime, falling back to
+# a sha256 of the contents) and the sheet name, so openpyxl only runs when a
+# workbook actually changed. Translations are applied from the cached labels,
+# so changing the account mapping never re-parses Excel.
+#
+# WebFintables and vector_database import this module from here (see their
+# shared_modules.py) rather than keeping copies.
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fact_pipeline import numeric_values, parse_periods
+
+SHEET_CACHE_DIR = os.getenv(
+    'SHEET_CACHE_DIR',
+    os.path.join(os.path.dirname(__file__), 'data', 'sheet_cache')
+)
+SHEET_CACHE_VERSION = 2
+
+_META_KEY = b'sheet_cache'
+
+
+def cache_path(excel_path: str, sheet_name='Bilanço', cache_dir: str = SHEET_CACHE_DIR) -> str:
+    """<cache_dir>/<TICKER>-<hash of path and sheet>.parquet for <dir>/<TICKER>.xlsx."""
+    source = os.path.abspath(excel_path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    key = json.dumps([source, sheet_name], ensure_ascii=False)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{stem}-{digest}.parquet")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def translations_fingerprint(translations: dict[str, str] | None) -> str | None:
+    if translations is None:
+        return None
+    payload = json.dumps(translations, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def translate(labels: pd.Series, translations: dict[str, str] | None) -> pd.Categorical:
+    if translations is None:
+        return pd.Categorical([None] * len(labels))
+    return pd.Categorical(labels.astype(str).map(translations))
+
+
+def sheet_to_long(df: pd.DataFrame, translations: dict[str, str] | None = None) -> pd.DataFrame:
+    """
+    Wide sheet (first column = label, one column per 'YYYY/MM') → long frame,
+    period-major like the fact transform. Non-period columns are dropped,
+    non-numeric cells become NaN, labels are stripped.
+    """
+    labels = df.iloc[:, 0].astype(str).str.strip().to_numpy()
+    years, quarters = parse_periods(df.columns[1:])
+    keep = (years >= 0).nonzero()[0]
+    values = numeric_values(df.iloc[:, 1 + keep])
+    n_rows, n_cols = values.shape
+
+    long = pd.DataFrame({
+        'row': np.tile(np.arange(n_rows, dtype=np.int32), n_cols),
+        'label': pd.Categorical(np.tile(labels, n_cols)),
+        'period': pd.Categorical(np.repeat(df.columns[1 + keep].astype(str).to_numpy(), n_rows)),
+        'year': np.repeat(years[keep], n_rows).astype(np.int16),
+        'quarter': np.repeat(quarters[keep], n_rows).astype(np.int16),
+        'value': values.T.ravel(),
+    })
+    long.insert(2, 'account_code', translate(long['label'], translations))
+    return long
+
+
+def _read_meta(path: str) -> dict | None:
+    try:
+        raw = pq.read_schema(path).metadata or {}
+        return json.loads(raw[_META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowInvalid):
+        return None
+
+
+def _write(path: str, long: pd.DataFrame, meta: dict) -> None:
+    table = pa.Table.from_pandas(long, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _META_KEY: json.dumps(meta)})
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _source_meta(excel_path: str, sheet_name, sha256: str | None = None) -> dict:
+    st = os.stat(excel_path)
+    return {
+        'version': SHEET_CACHE_VERSION,
+        'source_path': os.path.abspath(excel_path),
+        'source_size': st.st_size,
+        'source_mtime_ns': st.st_mtime_ns,
+        'source_sha256': sha256 or file_sha256(excel_path),
+        'sheet_name': sheet_name,
+    }
+
+
+def _fresh_meta(excel_path: str, sheet_name, cache_dir: str) -> dict | None:
+    """Cached metadata if the entry still matches the workbook (refreshing a stale mtime), else None."""
+    path = cache_path(excel_path, sheet_name, cache_dir)
+    meta = _read_meta(path)
+    if (not meta or meta.get('version') != SHEET_CACHE_VERSION or meta.get('sheet_name') != sheet_name
+            or meta.get('source_path') != os.path.abspath(excel_path)):
+        return None
+    st = os.stat(excel_path)
+    if meta['source_size'] == st.st_size and meta['source_mtime_ns'] == st.st_mtime_ns:
+        return meta
+    # touched but possibly identical (re-download, copy): fall back to the content hash
+    sha = file_sha256(excel_path)
+    if sha != meta['source_sha256']:
+        return None
+    meta = {**meta, **_source_meta(excel_path, sheet_name, sha)}
+    _write(path, pq.read_table(path).to_pandas(), meta)
+    return meta
+
+
+def load_sheet(excel_path: str,
+               sheet_name='Bilanço',
+               translations: dict[str, str] | None = None,
+               cache_dir: str = SHEET_CACHE_DIR) -> pd.DataFrame:
+    """
+    Long-format frame for one workbook sheet, from the cache when it is fresh,
+    otherwise parsed with openpyxl and written back. When `translations`
+    differ from the cached ones, account_code is re-derived from the cached
+    labels and the entry rewritten; Excel is not touched.
+    """
+    path = cache_path(excel_path, sheet_name, cache_dir)
+    trans_fp = translations_fingerprint(translations)
+    meta = _fresh_meta(excel_path, sheet_name, cache_dir)
+    if meta is not None:
+        long = pq.read_table(path).to_pandas()
+        if translations is not None and meta.get('translations') != trans_fp:
+            long['account_code'] = translate(long['label'], translations)
+            _write(path, long, {**meta, 'translations': trans_fp})
+        return long
+
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, header=0)
+    long = sheet_to_long(df, translations)
+    _write(path, long, {**_source_meta(excel_path, sheet_name), 'translations': trans_fp,
+                        'sheet_rows': len(df)})
+    return long
+
+
+def sheet_row_count(excel_path: str, sheet_name='Bilanço', cache_dir: str = SHEET_CACHE_DIR) -> int:
+    """Number of data rows in the sheet; reads only Parquet metadata when the cache is fresh."""
+    meta = _fresh_meta(excel_path, sheet_name, cache_dir)
+    if meta is None:
+        load_sheet(excel_path, sheet_name, cache_dir=cache_dir)
+        meta = _read_meta(cache_path(excel_path, sheet_name, cache_dir))
+    return meta['sheet_rows']
@@ -0,0 +1,156 @@
+# sql_cache.py
+#
+# Result cache for query_with_sql. Agents and users keep sending the same
+# company/account/period lookups with different spacing and keyword case, so
+# the key is the normalized statement: comments dropped, whitespace collapsed,
+# keywords and identifiers lower-cased, string literals (plain, E'...' and
+# dollar-quoted) and quoted identifiers kept verbatim ('KCHOL' and 'kchol'
+# stay different queries).
+#
+# Entries are tagged with the data version: the 'sql' row of data_version,
+# bumped by bump_sql_version in the same transaction as every write to a
+# table the SQL tool can read (facts, catalogues, closure, rollups, views).
+# It is separate from fact_change_log, which only fact writers append to and
+# which drives the fact cube's reloads. The version is polled at most every
+# SQL_CACHE_VERSION_INTERVAL seconds, so a repeat lookup is a dict hit; when
+# it moves, the whole cache is dropped. Memory is bounded by the JSON size of
+# the cached results, evicting least recently used first.
+
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from async_db import get_async_pool
+
+SQL_CACHE_MAX_BYTES = int(os.getenv('SQL_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))   # 0 = disabled
+SQL_CACHE_VERSION_INTERVAL = float(os.getenv('SQL_CACHE_VERSION_INTERVAL', '1'))
+
+SQL_VERSION_NAME = 'sql'
+
+_TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<literal>[eE]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*'|\$(?P<tag>\w*)\$.*?\$(?P=tag)\$|"(?:[^"]|"")*")
+  | (?P<space>\s+)
+  | (?P<op><=|>=|<>|!=|::|\|\||[^\w\s])
+  | (?P<word>\w+)
+""", re.VERBOSE | re.DOTALL)
+
+# results of these change without the data changing
+_VOLATILE = re.compile(
+    r"\b(now|random|clock_timestamp|statement_timestamp|transaction_timestamp|timeofday|"
+    r"current_date|current_time|current_timestamp|localtime|localtimestamp|pg_sleep|nextval|"
+    r"gen_random_uuid|txid_current)\b")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql: str) -> str:
+    """Canonical form of a statement for cache keys (literal-aware)."""
+    tokens = []
+    for m in _TOKEN.finditer(sql):
+        kind = m.lastgroup
+        if kind in ('comment', 'space'):
+            continue
+        tokens.append(m.group() if kind == 'literal' else m.group().lower())
+    while tokens and tokens[-1] == ';':
+        tokens.pop()
+    return ' '.join(tokens)
+
+
+def is_cacheable(normalized: str) -> bool:
+    """False when the statement calls a volatile function outside a string literal."""
+    stripped = _TOKEN.sub(lambda m: "''" if m.lastgroup == 'literal' and not m.group().startswith('"')
+                          else m.group(), normalized)
+    return not _VOLATILE.search(stripped)
+
+
+def bump_sql_version(cur) -> None:
+    """Invalidate cached SQL results once the caller's transaction commits."""
+    cur.execute("UPDATE data_version SET version = version + 1 WHERE name = %s;", (SQL_VERSION_NAME,))
+
+
+class SqlResultCache:
+    """LRU of normalized SQL -> result dict, bounded by the results' JSON size."""
+
+    def __init__(self, max_bytes: int = SQL_CACHE_MAX_BYTES,
+                 version_interval: float = SQL_CACHE_VERSION_INTERVAL):
+        self.max_bytes = max_bytes
+        self.version_interval = version_interval
+        self.entries: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        self.bytes = 0
+        self.version: int | None = None
+        self.checked_at = 0.0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    async def check_version(self, force: bool = False) -> int:
+        """Current data version; polls the database at most every version_interval seconds."""
+        if force or self.version is None or time.monotonic() - self.checked_at >= self.version_interval:
+            pool = await get_async_pool()
+            version = await pool.fetchval(
+                "SELECT COALESCE((SELECT version FROM data_version WHERE name = $1), 0);", SQL_VERSION_NAME
+            )
+            self.checked_at = time.monotonic()
+            if version != self.version:
+                if self.entries:
+                    self.invalidations += 1
+                self.clear()
+                self.version = version
+        return self.version
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.bytes = 0
+
+    async def get(self, sql: str) -> tuple[str, dict | None, int]:
+        """(cache key, cached result or None, data version to store a fresh result under)."""
+        key = normalize_sql(sql)
+        version = await self.check_version()
+        hit = self.entries.get(key)
+        if hit is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return key, hit[0], version
+        self.misses += 1
+        return key, None, version
+
+    def put(self, key: str, result: dict, version: int) -> bool:
+        """Store a result computed at `version`; skipped if the data moved on meanwhile."""
+        if version != self.version or 'error' in result or not is_cacheable(key):
+            return False
+        size = len(json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + len(key)
+        if size > self.max_bytes:
+            return False
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (result, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'data_version': self.version,
+        }
+
+
+_cache: SqlResultCache | None = None
+
+
+def get_sql_cache() -> SqlResultCache:
+    global _cache
+    if _cache is None:
+        _cache = SqlResultCache()
+    return _cache
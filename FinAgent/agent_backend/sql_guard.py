@@ -0,0 +1,108 @@
+# sql_guard.py
+#
+# Resource-limited execution of model-written SQL (the query_with_sql tool).
+# Every statement runs in a READ ONLY transaction that is always rolled back,
+# with a statement_timeout; the planner's estimate is checked first and
+# expensive plans are rejected without running them; rows are streamed from a
+# server-side cursor and cut off at a row and byte budget, so a runaway cross
+# join can neither pin a backend nor pull millions of rows into the API.
+
+import datetime
+import decimal
+import json
+import os
+import uuid
+import asyncpg
+from async_db import get_async_pool
+
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv('SQL_STATEMENT_TIMEOUT_MS', '5000'))
+SQL_MAX_COST = float(os.getenv('SQL_MAX_COST', '1000000'))     # planner cost units; 0 = no check
+SQL_MAX_ROWS = int(os.getenv('SQL_MAX_ROWS', '500'))
+SQL_MAX_BYTES = int(os.getenv('SQL_MAX_BYTES', str(64 * 1024)))   # of the JSON rows
+SQL_FETCH_BATCH = int(os.getenv('SQL_FETCH_BATCH', '100'))
+
+SQL_GUARD_STATS = {'queries': 0, 'rejected_cost': 0, 'timeouts': 0, 'errors': 0, 'truncated': 0}
+
+
+def _json_value(v):
+    """asyncpg value -> JSON-safe value (NUMERIC as float, dates as ISO strings)."""
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, decimal.Decimal):
+        return float(v)
+    if isinstance(v, (datetime.date, datetime.datetime, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, (list, tuple)):
+        return [_json_value(x) for x in v]
+    if isinstance(v, dict):
+        return {k: _json_value(x) for k, x in v.items()}
+    if isinstance(v, (uuid.UUID, datetime.timedelta)):
+        return str(v)
+    return str(v)
+
+
+def _row_bytes(row: list) -> int:
+    return len(json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode('utf-8')) + 1
+
+
+async def run_guarded_query(sql: str,
+                            max_rows: int = SQL_MAX_ROWS,
+                            max_bytes: int = SQL_MAX_BYTES,
+                            max_cost: float = SQL_MAX_COST,
+                            timeout_ms: int = SQL_STATEMENT_TIMEOUT_MS) -> dict:
+    """
+    Run one read-only statement under the limits above. Returns
+    {'columns': [{'name', 'type'}], 'rows': [[...]], 'row_count', 'truncated'}
+    (plus 'note' when truncated) or {'error': message} when the statement
+    was rejected, timed out or failed; errors are for the model to correct
+    its query, so they are returned rather than raised.
+    """
+    SQL_GUARD_STATS['queries'] += 1
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        tr = conn.transaction(readonly=True)
+        await tr.start()
+        try:
+            await conn.execute(f"SET LOCAL statement_timeout = {int(timeout_ms)};")
+
+            raw = await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql)
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+            if max_cost and plan['Total Cost'] > max_cost:
+                SQL_GUARD_STATS['rejected_cost'] += 1
+                return {'error': f"Query rejected: estimated cost {plan['Total Cost']:.0f} exceeds {max_cost:.0f} "
+                                 f"(about {plan['Plan Rows']} rows). Filter on ticker/account_code/year/quarter, "
+                                 "aggregate, or avoid cross joins."}
+
+            stmt = await conn.prepare(sql)
+            columns = [{'name': a.name, 'type': a.type.name} for a in stmt.get_attributes()]
+            rows, size, truncated = [], 0, None
+            async for record in stmt.cursor(prefetch=SQL_FETCH_BATCH):
+                if len(rows) >= max_rows:
+                    truncated = f"{max_rows} rows"
+                    break
+                row = [_json_value(v) for v in record]
+                size += _row_bytes(row)
+                if size > max_bytes:
+                    truncated = f"{max_bytes} bytes"
+                    break
+                rows.append(row)
+        except asyncpg.QueryCanceledError:
+            SQL_GUARD_STATS['timeouts'] += 1
+            return {'error': f"Query cancelled after the {timeout_ms} ms statement timeout; make it more selective."}
+        except (asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            SQL_GUARD_STATS['errors'] += 1
+            return {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            # never persist anything, even if READ ONLY were bypassed
+            await tr.rollback()
+
+    result = {'columns': columns, 'rows': rows, 'row_count': len(rows), 'truncated': truncated is not None}
+    if truncated:
+        SQL_GUARD_STATS['truncated'] += 1
+        result['note'] = (f"Result truncated at {truncated}; add filters, aggregation or a LIMIT "
+                          "if you need other rows.")
+    return result
+
+
+def sql_guard_stats() -> dict:
+    return dict(SQL_GUARD_STATS)
@@ -0,0 +1,40 @@
+# synthetic_data.py
+#
+# Synthetic Bilanço sheets shaped like the fintables downloads (one row per
+# Turkish account label, one 'YYYY/MM' column per quarter, newest first),
+# used by the ingest benchmarks.
+
+import os
+import numpy as np
+import pandas as pd
+from read_and_fill_facts import ACCOUNT_TRANSLATIONS, SHEET_NAME
+
+
+def synthetic_tickers(n: int) -> list[str]:
+    return [f"T{i:04d}" for i in range(n)]
+
+
+def synthetic_sheet(rng: np.random.Generator,
+                    first_year: int = 2006,
+                    last_year: int = 2024,
+                    missing_rate: float = 0.1) -> pd.DataFrame:
+    """One company's sheet with a sprinkling of empty cells and an untranslated row."""
+    labels = list(ACCOUNT_TRANSLATIONS) + ['Açıklanmayan Kalem']
+    cols = [f"{y}/{m}" for y in range(last_year, first_year - 1, -1) for m in (12, 9, 6, 3)]
+    values = rng.integers(-10**9, 10**10, size=(len(labels), len(cols))).astype(np.float64)
+    values[rng.random(values.shape) < missing_rate] = np.nan
+    df = pd.DataFrame(values, columns=cols)
+    df.insert(0, 'Kalem', labels)
+    return df
+
+
+def write_synthetic_workbooks(out_dir: str, n: int, seed: int = 0) -> list[dict]:
+    """Write n synthetic .xlsx workbooks; returns COMPANY_CONFIGS-style entries."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    configs = []
+    for ticker in synthetic_tickers(n):
+        path = os.path.join(out_dir, f"{ticker}.xlsx")
+        synthetic_sheet(rng).to_excel(path, sheet_name=SHEET_NAME, index=False)
+        configs.append({'excel_path': path, 'ticker': ticker})
+    return configs
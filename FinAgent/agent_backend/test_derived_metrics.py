@@ -0,0 +1,49 @@
+import ast
+
+import numpy as np
+import pytest
+
+from derived_metrics import _nan_add, _nan_sub, compile_metrics, evaluate, parse_formula
+
+
+def test_parse_formula_returns_target_tree_and_inputs():
+    target, tree, inputs = parse_formula('DEBT_TO_ASSETS = 100 * TOTAL_LIABILITIES / TOTAL_ASSETS')
+    assert target == 'DEBT_TO_ASSETS'
+    assert isinstance(tree, ast.BinOp)
+    assert sorted(inputs) == ['TOTAL_ASSETS', 'TOTAL_LIABILITIES']
+    assert parse_formula('X = A + A * B')[2].count('A') == 1
+
+
+@pytest.mark.parametrize('formula', [
+    'TOTAL_ASSETS',                       # no '='
+    '1X = A + B',                         # target is not an identifier
+    'X = A ** 2',                         # unsupported operator
+    'X = A % B',
+    'X = abs(A)',                         # calls are not allowed
+    "X = A + 'B'",                        # string constant
+    'X = +A',                             # only unary minus
+])
+def test_parse_formula_rejects(formula):
+    with pytest.raises((ValueError, SyntaxError)):
+        parse_formula(formula)
+
+
+def test_nan_add_counts_a_missing_operand_as_zero_unless_both_are_missing():
+    a = np.array([1.0, np.nan, 2.0, np.nan])
+    b = np.array([3.0, 4.0, np.nan, np.nan])
+    np.testing.assert_array_equal(_nan_add(a, b), [4.0, 4.0, 2.0, np.nan])
+    np.testing.assert_array_equal(_nan_sub(a, b), [-2.0, -4.0, 2.0, np.nan])
+
+
+def test_evaluate_over_arrays():
+    _, tree, _ = parse_formula('X = 100 * (A - B) / -C')
+    data = {'A': np.array([5.0, np.nan]), 'B': np.array([3.0, 1.0]), 'C': np.array([2.0, 4.0])}
+    np.testing.assert_allclose(evaluate(tree, data.__getitem__), [-100.0, 25.0])
+
+
+def test_compile_metrics_requires_earlier_definitions():
+    compile_metrics([{'formula': 'A = B + C'}, {'formula': 'D = A * 2'}])
+    with pytest.raises(ValueError):
+        compile_metrics([{'formula': 'D = A * 2'}, {'formula': 'A = B + C'}])
+    with pytest.raises(ValueError):
+        compile_metrics([{'formula': 'A = A + 1'}])
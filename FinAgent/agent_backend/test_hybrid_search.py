@@ -0,0 +1,35 @@
+from hybrid_search import LexicalIndex, fold_text
+
+COMPANIES = [
+    {'ticker': 'KCHOL', 'name': 'Koç Holding A.Ş.', 'description': 'Conglomerate.'},
+    {'ticker': 'SAHOL', 'name': 'Hacı Ömer Sabancı Holding A.Ş.', 'description': 'Conglomerate.'},
+    {'ticker': 'THYAO', 'name': 'Türk Hava Yolları A.O.', 'description': 'Airline.'},
+]
+
+
+def test_fold_text_turkish_case_diacritics_and_punctuation():
+    assert fold_text('İSTANBUL') == 'istanbul'
+    assert fold_text('IĞDIR') == 'igdir'
+    assert fold_text('Koç Holding A.Ş.') == 'koc holding a s'
+    assert fold_text('  Ticari Alacaklar ( DÖNEN ) ') == 'ticari alacaklar donen'
+    assert fold_text('Ticari_Alacaklar') == 'ticari alacaklar'
+
+
+def test_exact_matches_ticker_name_and_name_without_legal_form_or_group_word():
+    index = LexicalIndex(COMPANIES, 'ticker', aliases={'THYAO': ['Turkish Airlines']})
+    assert index.exact('kchol') == [0]
+    assert index.exact('KOÇ HOLDİNG A.Ş.') == [0]
+    assert index.exact('Koç Holding') == [0]
+    assert index.exact('koc') == [0]
+    assert index.exact('Sabancı Holding') == []
+    assert index.exact('Hacı Ömer Sabancı') == [1]
+    assert index.exact('turkish airlines') == [2]
+    assert index.exact('Türk Hava Yolları A.O.') == [2]
+
+
+def test_exact_misses_return_empty_and_search_ranks_by_trigrams():
+    index = LexicalIndex(COMPANIES, 'ticker')
+    assert index.exact('holding') == []
+    assert index.exact('') == []
+    assert index.search('sabanci holdng')[0] == 1
+    assert index.search('zzzz') == []
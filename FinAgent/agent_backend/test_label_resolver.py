@@ -0,0 +1,56 @@
+import pandas as pd
+
+from label_resolver import LabelResolver, resolution_fingerprint
+
+TRANSLATIONS = {
+    'Nakit ve Nakit Benzerleri': 'CASH_AND_CASH_EQUIVALENTS',
+    'Ticari Alacaklar (Dönen)': 'TRADE_RECEIVABLES',
+    'Finansal Yatırımlar': 'FINANCIAL_INVESTMENTS',
+}
+
+
+def resolve(labels, stored=None):
+    codes, report = LabelResolver(TRANSLATIONS, stored).resolve_column(pd.Series(labels))
+    return [None if pd.isna(c) else c for c in codes], report
+
+
+def test_exact_normalized_and_fuzzy():
+    codes, report = resolve(['Nakit ve Nakit Benzerleri', 'Ticari Alacaklar ( DÖNEN )', 'Finansal Yatirimlarr'])
+    assert codes == ['CASH_AND_CASH_EQUIVALENTS', 'TRADE_RECEIVABLES', 'FINANCIAL_INVESTMENTS']
+    assert 'Nakit ve Nakit Benzerleri' not in report['resolved']
+    assert report['resolved']['Ticari Alacaklar ( DÖNEN )'][1] == 'normalized'
+    assert report['resolved']['Finansal Yatirimlarr'][1] == 'fuzzy'
+    assert report['unmapped'] == []
+
+
+def test_fuzzy_match_never_takes_a_code_held_by_a_stronger_match():
+    codes, report = resolve(['Nakit ve Nakit Benzerleri', 'Nakit ve Nakit Benzerlerix'])
+    assert codes == ['CASH_AND_CASH_EQUIVALENTS', None]
+    assert report['resolved']['Nakit ve Nakit Benzerlerix'][1] == 'conflict'
+    assert report['unmapped'] == ['Nakit ve Nakit Benzerlerix']
+
+
+def test_two_fuzzy_matches_on_one_code_keep_the_better_one():
+    codes, report = resolve(['Nakit ve Nakit Benzerlerix', 'Nakit ve Nakit Benzerlerixyz'])
+    assert codes == ['CASH_AND_CASH_EQUIVALENTS', None]
+    assert report['resolved']['Nakit ve Nakit Benzerlerixyz'][1] == 'conflict'
+
+
+def test_whitespace_variants_are_one_label():
+    codes, report = resolve(['Nakit ve Nakit Benzerlerix', 'Nakit ve Nakit Benzerlerix ', ' Nakit ve Nakit Benzerlerix'])
+    assert codes == ['CASH_AND_CASH_EQUIVALENTS'] * 3
+    assert list(report['resolved']) == ['Nakit ve Nakit Benzerlerix']
+    assert report['unmapped'] == []
+
+
+def test_manual_rows_win_and_blank_labels_are_skipped():
+    codes, report = resolve(['Nakit ve Nakit Benzerleri', None, '  '],
+                            stored={'Nakit ve Nakit Benzerleri': ('FINANCIAL_INVESTMENTS', 'manual', None)})
+    assert codes == ['FINANCIAL_INVESTMENTS', None, None]
+    assert report['unmapped'] == []
+
+
+def test_fingerprint_changes_with_thresholds():
+    assert resolution_fingerprint(TRANSLATIONS) == LabelResolver(TRANSLATIONS).fingerprint
+    assert resolution_fingerprint(TRANSLATIONS, 0.9) != resolution_fingerprint(TRANSLATIONS, 0.8)
+    assert resolution_fingerprint(TRANSLATIONS, fuzzy_margin=0.1) != resolution_fingerprint(TRANSLATIONS)
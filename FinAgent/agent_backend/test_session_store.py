@@ -0,0 +1,41 @@
+import session_store
+from session_store import Session
+
+
+def turn(n: int, answer: str = 'ok') -> list[dict]:
+    return [
+        {'role': 'user', 'content': f"question {n}"},
+        {'type': 'function_call', 'call_id': f"call_{n}", 'name': 'get_fact', 'arguments': '{}'},
+        {'type': 'function_call_output', 'call_id': f"call_{n}", 'output': '{}'},
+        {'type': 'message', 'role': 'assistant', 'content': answer},
+    ]
+
+
+def test_compact_strips_tool_items_outside_the_last_turns(monkeypatch):
+    monkeypatch.setattr(session_store, 'SESSION_KEEP_TOOL_TURNS', 1)
+    session = Session('s', turns=[turn(1), turn(2), turn(3)])
+    assert session.compact() == 0
+    assert [len(t) for t in session.turns] == [2, 2, 4]
+    assert all(item.get('type') != 'function_call' for t in session.turns[:2] for item in t)
+
+
+def test_compact_drops_oldest_turns_above_the_turn_limit(monkeypatch):
+    monkeypatch.setattr(session_store, 'SESSION_MAX_TURNS', 2)
+    session = Session('s', turns=[turn(i) for i in range(5)])
+    assert session.compact() == 3
+    assert [t[0]['content'] for t in session.turns] == ['question 3', 'question 4']
+
+
+def test_compact_drops_oldest_turns_above_the_char_limit_but_keeps_the_last(monkeypatch):
+    monkeypatch.setattr(session_store, 'SESSION_MAX_CHARS', 500)
+    session = Session('s', turns=[turn(1, 'x' * 200), turn(2, 'x' * 200), turn(3, 'x' * 2000)])
+    assert session.compact() == 2
+    assert [t[0]['content'] for t in session.turns] == ['question 3']
+
+
+def test_input_for_puts_resolved_context_first_and_the_message_last():
+    session = Session('s', turns=[turn(1)], resolved={'companies': {'koc': 'KCHOL (Koç Holding A.Ş.)'}})
+    items = session.input_for('and in 2023?')
+    assert items[0]['role'] == 'developer' and 'koc -> KCHOL' in items[0]['content']
+    assert items[1:-1] == turn(1)
+    assert items[-1] == {'role': 'user', 'content': 'and in 2023?'}
@@ -0,0 +1,63 @@
+import pytest
+
+from sql_cache import SqlResultCache, is_cacheable, normalize_sql
+
+
+def test_normalize_collapses_spacing_case_and_comments():
+    a = normalize_sql("SELECT  value\nFROM fact_wide -- latest\nWHERE ticker = 'KCHOL';")
+    b = normalize_sql("select value from /* x */ FACT_WIDE where TICKER='KCHOL'")
+    assert a == b == "select value from fact_wide where ticker = 'KCHOL'"
+
+
+@pytest.mark.parametrize('literal', [
+    "'KCHOL'",
+    "'KCHOL''s'",
+    "E'KCHOL\\'S'",
+    "$$KCHOL  -- not a comment$$",
+    "$q$KCHOL 'quoted' $$ inside$q$",
+])
+def test_literals_are_kept_verbatim(literal):
+    sql = f"SELECT * FROM fact_wide WHERE ticker = {literal}"
+    assert normalize_sql(sql).endswith(f"= {literal}")
+    assert normalize_sql(sql) != normalize_sql(sql.replace('KCHOL', 'kchol'))
+
+
+def test_quoted_identifiers_are_kept_verbatim():
+    assert normalize_sql('SELECT "Value" FROM t') == 'select "Value" from t'
+
+
+def test_positional_parameters_are_not_dollar_quotes():
+    assert normalize_sql("SELECT $1 , $2 FROM t") == "select $ 1 , $ 2 from t"
+
+
+@pytest.mark.parametrize('sql, cacheable', [
+    ("SELECT value FROM fact_wide WHERE year = 2024", True),
+    ("SELECT now()", False),
+    ("SELECT * FROM fact_wide WHERE year = EXTRACT(year FROM current_date)", False),
+    ("SELECT random() FROM t", False),
+    ("SELECT 'now' AS label", True),
+    ("SELECT E'random\\'s' AS label", True),
+    ("SELECT $$pg_sleep(1)$$ AS label", True),
+])
+def test_is_cacheable(sql, cacheable):
+    assert is_cacheable(normalize_sql(sql)) is cacheable
+
+
+def test_put_skips_stale_versions_errors_and_volatile_statements():
+    cache = SqlResultCache(max_bytes=1024)
+    cache.version = 3
+    assert cache.put('select 1', {'rows': [[1]]}, 3)
+    assert not cache.put('select 2', {'rows': [[2]]}, 2)
+    assert not cache.put('select 3', {'error': 'boom'}, 3)
+    assert not cache.put('select now ( )', {'rows': [[0]]}, 3)
+    assert list(cache.entries) == ['select 1']
+
+
+def test_put_evicts_least_recently_used_by_size():
+    cache = SqlResultCache(max_bytes=60)
+    cache.version = 1
+    for i in range(3):
+        cache.put(f"select {i}", {'rows': [[i] * 5]}, 1)
+    assert cache.bytes <= 60
+    assert 'select 2' in cache.entries and 'select 0' not in cache.entries
+    assert cache.evictions >= 1
@@ -0,0 +1,116 @@
+# vector_index.py
+
+import os
+import numpy as np
+from create_hierarchy_map import PARENT_ACCOUNT_MAP
+from account_tree import ACCOUNT_TREE
+from embedding_store import open_embedding_store
+
+# Catalogues up to this size are searched in memory; larger ones go to pgvector.
+VECTOR_INDEX_MAX_ROWS = int(os.getenv('VECTOR_INDEX_MAX_ROWS', '200000'))
+# 'auto' (memory when loaded and small enough), 'memory' or 'pgvector'
+VECTOR_SEARCH_BACKEND = os.getenv('VECTOR_SEARCH_BACKEND', 'auto')
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a small catalogue.
+
+    The float32 matrix is used as given (a memory-mapped EmbeddingStore
+    matrix is not copied); only the inverse row norms are kept, so a lookup
+    is a single matmul, a rescale and an argpartition top-k.
+    """
+
+    def __init__(self, rows: list[dict], embeddings: np.ndarray):
+        if len(rows) != len(embeddings):
+            raise ValueError(f"{len(rows)} rows but {len(embeddings)} embeddings")
+        self.matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.sqrt(np.einsum('ij,ij->i', self.matrix, self.matrix))
+        norms[norms == 0] = 1.0
+        self.inv_norms = (1.0 / norms).astype(np.float32)
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def top_k(self, query_vec, k: int = 5) -> np.ndarray:
+        """Row indices of the `k` nearest rows, best first."""
+        n = len(self.rows)
+        if n == 0 or k <= 0:
+            return np.empty(0, dtype=np.intp)
+        q = np.asarray(query_vec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = (self.matrix @ q) * self.inv_norms
+        k = min(k, n)
+        if k < n:
+            idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            idx = np.arange(n)
+        return idx[np.argsort(-scores[idx], kind='stable')]
+
+    def search(self, query_vec, k: int = 5, cols: list[str] | None = None) -> list[dict]:
+        """Top-`k` rows as dicts, optionally restricted to `cols`."""
+        result = []
+        for i in self.top_k(query_vec, k):
+            row = self.rows[i]
+            result.append({c: row[c] for c in cols} if cols else dict(row))
+        return result
+
+
+def load_index(data_dir: str, filename: str, id_field: str,
+               index_cls: type = VectorIndex) -> VectorIndex | None:
+    """
+    Build an index over the EmbeddingStore saved by save_embeddings, sharing
+    its memory-mapped matrix. Returns None if the catalogue is missing.
+    """
+    store = open_embedding_store(data_dir, filename, id_field)
+    if store is None:
+        return None
+    return index_cls(store.records(), store.matrix)
+
+
+def use_memory_index(index: VectorIndex | None) -> bool:
+    """Whether lookups should go to `index` rather than pgvector."""
+    if index is None or VECTOR_SEARCH_BACKEND == 'pgvector':
+        return False
+    if VECTOR_SEARCH_BACKEND == 'memory':
+        return True
+    return len(index) <= VECTOR_INDEX_MAX_ROWS
+
+
+class AccountVectorIndex(VectorIndex):
+    """
+    VectorIndex over the account catalogue that also answers the
+    search_accounts_with_children shape. Parent links come from
+    PARENT_ACCOUNT_MAP, the same source update_parent_accounts writes to the
+    account table, and the children lists are built once up front.
+    """
+
+    def __init__(self, rows: list[dict], embeddings: np.ndarray,
+                 parent_map: dict = PARENT_ACCOUNT_MAP):
+        super().__init__(rows, embeddings)
+        self.parent_map = parent_map
+        self.children_by_parent: dict[str, list[dict]] = {}
+        for row in rows:
+            parent_code = parent_map.get(row['code'])
+            if parent_code:
+                self.children_by_parent.setdefault(parent_code, []).append(self._as_account(row))
+
+    def _as_account(self, row: dict) -> dict:
+        return {
+            'code':         row['code'],
+            'name':         row['name'],
+            'description':  row['description'],
+            'parent_code':  self.parent_map.get(row['code'])
+        }
+
+    def account(self, i: int) -> dict:
+        """Row `i` in the search_accounts_with_children shape."""
+        acct = self._as_account(self.rows[i])
+        acct['ancestors'] = list(ACCOUNT_TREE.ancestors(acct['code']))
+        acct['children'] = self.children_by_parent.get(acct['code'], [])
+        return acct
+
+    def search_with_children(self, query_vec, limit: int = 5) -> list[dict]:
+        """Same result shape as agent_wrapper.search_accounts_with_children."""
+        return [self.account(i) for i in self.top_k(query_vec, limit)]
@@ -20,7 +20,11 @@ export const ChatInterface: React.FC = () => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
+    const [toolStatus, setToolStatus] = useState<string | null>(null);
+    // conversation id from the first answer, sent back so follow-ups keep their context
+    const [traceId, setTraceId] = useState<string | undefined>(undefined);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    const abortRef = useRef<AbortController | null>(null);
 
     const scrollToBottom = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -30,25 +34,44 @@ export const ChatInterface: React.FC = () => {
         scrollToBottom();
     }, [messages]);
 
+    // leaving the page closes an open stream, which stops the run on the server
+    useEffect(() => () => abortRef.current?.abort(), []);
+
+    const setAnswer = (content: string) => {
+        setMessages((prev: Message[]) => [...prev.slice(0, -1), { content, isUser: false }]);
+    };
+
     const handleSubmit = async (e: React.FormEvent) => {
         e.preventDefault();
         if (!input.trim() || isLoading) return;
 
         const userMessage = input.trim();
         setInput('');
-        setMessages((prev: Message[]) => [...prev, { content: userMessage, isUser: true }]);
+        setMessages((prev: Message[]) => [...prev, { content: userMessage, isUser: true }, { content: '', isUser: false }]);
         setIsLoading(true);
 
+        const controller = new AbortController();
+        abortRef.current = controller;
+        let streamed = '';
         try {
-            const response = await chatbotService.sendMessage(userMessage);
-            setMessages((prev: Message[]) => [...prev, { content: response.response, isUser: false }]);
+            const response = await chatbotService.streamMessage(userMessage, traceId, {
+                onDelta: (text: string) => {
+                    streamed += text;
+                    setToolStatus(null);
+                    setAnswer(streamed);
+                },
+                onToolStart: (name: string) => setToolStatus(`Running ${name}...`),
+                onToolEnd: () => setToolStatus(null),
+            }, controller.signal);
+            setAnswer(response.response);
+            setTraceId(response.trace_id);
         } catch (error) {
+            if (controller.signal.aborted) return;
             console.error('Error sending message:', error);
-            setMessages((prev: Message[]) => [...prev, {
-                content: 'Sorry, there was an error processing your request.',
-                isUser: false
-            }]);
+            setAnswer('Sorry, there was an error processing your request.');
         } finally {
+            abortRef.current = null;
+            setToolStatus(null);
             setIsLoading(false);
         }
     };
@@ -80,7 +103,7 @@ export const ChatInterface: React.FC = () => {
                         gap: 2,
                     }}
                 >
-                    {messages.map((message: Message, index: number) => (
+                    {messages.filter((message: Message) => message.isUser || message.content).map((message: Message, index: number) => (
                         <Box
                             key={index}
                             sx={{
@@ -104,8 +127,13 @@ export const ChatInterface: React.FC = () => {
                         </Box>
                     ))}
                     {isLoading && (
-                        <Box sx={{ display: 'flex', justifyContent: 'flex-start' }}>
+                        <Box sx={{ display: 'flex', justifyContent: 'flex-start', alignItems: 'center', gap: 1 }}>
                             <CircularProgress size={20} />
+                            {toolStatus && (
+                                <Typography variant="body2" color="text.secondary">
+                                    {toolStatus}
+                                </Typography>
+                            )}
                         </Box>
                     )}
                     <div ref={messagesEndRef} />
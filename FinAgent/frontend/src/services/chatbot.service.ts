@@ -10,13 +10,21 @@ interface ChatResponse {
     trace_id: string;
 }
 
+export interface StreamHandlers {
+    onDelta?: (text: string) => void;
+    onToolStart?: (name: string, args: string) => void;
+    onToolEnd?: (name: string, output: string) => void;
+}
+
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:4000';
 
 export const chatbotService = {
-    async sendMessage(message: string): Promise<ChatResponse> {
+    // Pass the trace_id of the previous answer to continue that conversation.
+    async sendMessage(message: string, traceId?: string): Promise<ChatResponse> {
         try {
             const response = await axios.post<ChatResponse>(`${API_URL}/chat`, {
                 message,
+                trace_id: traceId,
             });
             return response.data;
         } catch (error) {
@@ -25,6 +33,45 @@ export const chatbotService = {
         }
     },
 
+    // Same as sendMessage, but reads the /chat/stream server-sent events and
+    // reports tokens and tool calls as they arrive. Aborting `signal` closes
+    // the connection, which cancels the run on the server.
+    async streamMessage(message: string, traceId: string | undefined, handlers: StreamHandlers,
+                        signal?: AbortSignal): Promise<ChatResponse> {
+        const response = await fetch(`${API_URL}/chat/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message, trace_id: traceId }),
+            signal,
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`Stream request failed: ${response.status}`);
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let end;
+            while ((end = buffer.indexOf('\n\n')) >= 0) {
+                const frame = buffer.slice(0, end);
+                buffer = buffer.slice(end + 2);
+                const event = frame.match(/^event: (.*)$/m)?.[1];
+                const data = frame.match(/^data: (.*)$/m)?.[1];
+                if (!event || !data) continue;  // keep-alive comment
+                const payload = JSON.parse(data);
+                if (event === 'delta') handlers.onDelta?.(payload.text);
+                else if (event === 'tool_start') handlers.onToolStart?.(payload.name, payload.arguments);
+                else if (event === 'tool_end') handlers.onToolEnd?.(payload.name, payload.output);
+                else if (event === 'final') return { response: payload.response, trace_id: payload.trace_id };
+                else if (event === 'error') throw new Error(payload.detail);
+            }
+        }
+        throw new Error('Stream ended without an answer');
+    },
+
     async checkHealth(): Promise<{ status: string }> {
         try {
             const response = await axios.get(`${API_URL}/health`);
@@ -52,7 +52,7 @@ CREATE TABLE IF NOT EXISTS period (
 
 
 
--- 1) Create the financial_fact table (allowing multiple facts per company/period/account)
+-- 1) Create the financial_fact table (one fact per company/account/period)
 CREATE TABLE IF NOT EXISTS financial_fact (
     fact_id       SERIAL       PRIMARY KEY,
     company_id    INTEGER      NOT NULL
@@ -67,7 +67,11 @@ CREATE TABLE IF NOT EXISTS financial_fact (
     value         NUMERIC(18,2) NOT NULL
 );
 
--- 2) Indexes on the foreign-key columns for faster joins
-CREATE INDEX IF NOT EXISTS idx_fin_fact_company ON financial_fact(company_id);
+-- 2) Unique covering index on the natural key: loaders upsert against it and
+--    per-company/account lookups are answered by index-only scans
+CREATE UNIQUE INDEX IF NOT EXISTS uq_fin_fact_company_account_period
+  ON financial_fact (company_id, account_id, period_id) INCLUDE (value);
+
+-- 3) Indexes on the remaining foreign-key columns for faster joins
 CREATE INDEX IF NOT EXISTS idx_fin_fact_period  ON financial_fact(period_id);
 CREATE INDEX IF NOT EXISTS idx_fin_fact_account ON financial_fact(account_id);
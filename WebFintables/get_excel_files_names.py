@@ -1,5 +1,6 @@
 import os
-import pandas as pd
+import shared_modules  # noqa: F401  (puts FinAgent/agent_backend on sys.path)
+from sheet_cache import sheet_row_count
 
 def check_excel_files():
     # Read stock codes from the text file
@@ -22,15 +23,15 @@ def check_excel_files():
             continue
             
         try:
-            # Read the Excel file
-            df = pd.read_excel(excel_path)
+            # Row count from the Parquet sheet cache; only new/changed workbooks are parsed
+            n_rows = sheet_row_count(excel_path, sheet_name=0)
             
             # Check number of rows
-            if len(df) == 107:
+            if n_rows == 107:
                 valid_files.append(code)
             else:
                 invalid_files.append(code)
-                print(f"{code}.xlsx has {len(df)} rows")
+                print(f"{code}.xlsx has {n_rows} rows")
                 
         except Exception as e:
             print(f"Error processing {code}.xlsx: {str(e)}")
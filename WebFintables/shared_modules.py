@@ -0,0 +1,18 @@
+# shared_modules.py
+#
+# sheet_cache lives in FinAgent/agent_backend. Importing this module appends
+# that directory to sys.path, after this tree's own modules, so it is
+# imported from there instead of being copied here. AGENT_BACKEND_DIR
+# overrides the location; docker-compose mounts it at the same relative
+# path. The sheet cache stays in this tree's data/ unless SHEET_CACHE_DIR
+# is set.
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT_BACKEND_DIR = os.getenv('AGENT_BACKEND_DIR', os.path.join(HERE, '..', 'FinAgent', 'agent_backend'))
+
+os.environ.setdefault('SHEET_CACHE_DIR', os.path.join(HERE, 'data', 'sheet_cache'))
+if AGENT_BACKEND_DIR not in sys.path:
+    sys.path.append(AGENT_BACKEND_DIR)
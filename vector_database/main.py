@@ -3,12 +3,15 @@ import psycopg2
 from psycopg2.extras import execute_values, RealDictCursor
 import openai
 from dotenv import load_dotenv
-import numpy as np
 from openai import OpenAI
 from read_and_fill_facts import read_and_fill_facts, insert_total_liabilities
 from create_hierarchy_map import update_parent_accounts
 from agents import Agent, Runner, gen_trace_id, trace, function_tool, ModelSettings
 from data import SAMPLE_ACCOUNTS, SAMPLE_COMPANIES
+import shared_modules  # noqa: F401  (puts FinAgent/agent_backend on sys.path)
+from embedding_service import EMBEDDING_MODEL, get_embedding_service, get_query_embedding_cache
+from pgvector_codec import Vector
+from embedding_store import EmbeddingStore, open_embedding_store, write_embedding_store
 
 import os
 import sys
@@ -35,56 +38,41 @@ os.makedirs(DATA_DIR, exist_ok=True)
 
 
 # --- EMBEDDING UTILS ---
-def get_embedding(text: str) -> list[float]:
-    #print(text)
-    resp = client.embeddings.create(model='text-embedding-ada-002', input=text)
+def _fetch_embedding(text: str) -> list[float]:
+    resp = client.embeddings.create(model=EMBEDDING_MODEL, input=text)
     return resp.data[0].embedding
 
-# --- NPY SAVE/LOAD ---
+def get_embedding(text: str) -> list[float]:
+    # repeated search phrases are served from the LRU/TTL (+ disk) query cache
+    return get_query_embedding_cache().get_or_compute(text, _fetch_embedding)
+
+# --- EMBEDDING STORE SAVE/LOAD ---
 def save_embeddings(data: list[dict], id_field: str, filename: str):
-    """Save ids, names, descriptions, embeddings to .npy files"""
-    ids, names, descs, embs = [], [], [], []
+    """Save ids, names, descriptions and embeddings as an EmbeddingStore"""
+    ids, names, descs, texts = [], [], [], []
     for item in data:
         ids.append(item[id_field])
         names.append(item['name'])
         descs.append(item['description'])
-        txt = f"{item[id_field]} | {item['name']} | {item['description']}"
-        embs.append(get_embedding(txt))
-    arr = np.array(embs)
-    base = os.path.join(DATA_DIR, filename)
-    np.save(f"{base}_{id_field}s.npy", np.array(ids))
-    np.save(f"{base}_names.npy", np.array(names))
-    np.save(f"{base}_descs.npy", np.array(descs))
-    np.save(f"{base}_embs.npy", arr)
+        texts.append(f"{item[id_field]} | {item['name']} | {item['description']}")
+    # batched + content-addressed cache: unchanged descriptions are never re-embedded
+    arr = get_embedding_service().embed_many(texts)
+    write_embedding_store(os.path.join(DATA_DIR, filename), ids, names, descs, arr)
     print(f"Saved {filename} embeddings.")
 
 
-def load_embeddings(filename: str, id_field: str) -> list[dict]:
-    """Load items with embeddings from .npy files"""
-    base = os.path.join(DATA_DIR, filename)
-    ids = np.load(f"{base}_{id_field}s.npy", allow_pickle=True)
-    names = np.load(f"{base}_names.npy", allow_pickle=True)
-    descs = np.load(f"{base}_descs.npy", allow_pickle=True)
-    arr = np.load(f"{base}_embs.npy", allow_pickle=True)
-    data = []
-    for i in range(len(ids)):
-        data.append({
-            id_field: ids[i],
-            'name': names[i],
-            'description': descs[i],
-            'embedding': arr[i].tolist()
-        })
-    return data
+def load_embeddings(filename: str, id_field: str) -> EmbeddingStore:
+    """Open the saved catalogue (memory-mapped embeddings, no per-row lists)"""
+    store = open_embedding_store(DATA_DIR, filename, id_field)
+    if store is None:
+        raise FileNotFoundError(f"No saved embeddings for {filename} in {DATA_DIR}")
+    return store
 
 # --- DB INSERTS ---
-def insert_table(data: list[dict], table: str, id_field: str, cols: list[str]):
+def insert_table(store: EmbeddingStore, table: str, id_field: str, cols: list[str]):
     conn = psycopg2.connect(**DB_PARAMS)
     cur = conn.cursor()
-    vals = []
-    for item in data:
-        vec = '[' + ','.join(map(str, item['embedding'])) + ']'
-        row = [item[id_field], item['name'], item['description'], vec]
-        vals.append(tuple(row))
+    vals = [(id_, name, desc, Vector(emb)) for id_, name, desc, emb in store.rows()]
     cols_list = ', '.join(cols)
     sql = f"INSERT INTO {table} ({cols_list}) VALUES %s"
     execute_values(cur, sql, vals)
@@ -108,14 +96,13 @@ def create_hnsw(table: str, column: str = 'embedding', m: int = 16, ef_con: int
 
 
 def search_hnsw(table: str, query: str, id_field: str, ef_search: int = 200, limit: int = 5):
-    vec = get_embedding(query)
-    vec_lit = '[' + ','.join(map(str, vec)) + ']'
+    vec = Vector(get_embedding(query))
     conn = psycopg2.connect(**DB_PARAMS)
     cur = conn.cursor()
     cur.execute("SET vector.hnsw.ef_search = %s;", (ef_search,))
     cur.execute(
-        f"SELECT {id_field}, name FROM {table} ORDER BY embedding <=> %s::vector LIMIT {limit};",
-        (vec_lit,)
+        f"SELECT {id_field}, name FROM {table} ORDER BY embedding <=> %s LIMIT {limit};",
+        (vec,)
     )
     rows = cur.fetchall()
     cur.close()
@@ -162,8 +149,7 @@ def _search_hnsw(table: str,
                  query: str,
                  ef_search: int = 200,
                  limit: int = 5) -> list[dict]:
-    vec = get_embedding(query)
-    vec_lit = "[" + ",".join(map(str, vec)) + "]"
+    vec = Vector(get_embedding(query))
 
     with psycopg2.connect(**DB_PARAMS) as conn, \
          conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -171,8 +157,8 @@ def _search_hnsw(table: str,
         cols = ", ".join(select_cols)
         cur.execute(
             f"SELECT {cols} FROM {table} "
-            f"ORDER BY embedding <=> %s::vector LIMIT %s;",
-            (vec_lit, limit)
+            f"ORDER BY embedding <=> %s LIMIT %s;",
+            (vec, limit)
         )
         return cur.fetchall()
 def search_accounts_with_children(
@@ -188,8 +174,7 @@ def search_accounts_with_children(
       - children: list of dicts with keys code, name, description, parent_code
     """
     # embed the query
-    vec = get_embedding(query)
-    vec_lit = "[" + ",".join(map(str, vec)) + "]"
+    vec = Vector(get_embedding(query))
 
     with psycopg2.connect(**DB_PARAMS) as conn, \
          conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -209,10 +194,10 @@ def search_accounts_with_children(
             FROM account a
             LEFT JOIN account p
               ON a.parent_account_id = p.account_id
-            ORDER BY a.embedding <=> %s::vector
+            ORDER BY a.embedding <=> %s
             LIMIT %s;
             """,
-            (vec_lit, limit)
+            (vec, limit)
         )
         matches = cur.fetchall()
         matched_ids = [r['account_id'] for r in matches]
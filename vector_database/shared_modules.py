@@ -0,0 +1,21 @@
+# shared_modules.py
+#
+# sheet_cache, embedding_service, pgvector_codec and embedding_store live in
+# FinAgent/agent_backend. Importing this module appends that directory to
+# sys.path, after this tree's own modules, so they are imported from there
+# instead of being copied here. AGENT_BACKEND_DIR overrides the location;
+# docker-compose mounts it (read-only) at the same relative path. The sheet
+# cache and the embedding caches stay in this tree's data/ unless
+# SHEET_CACHE_DIR / EMBEDDING_CACHE_PATH / QUERY_EMBEDDING_CACHE_PATH are set.
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AGENT_BACKEND_DIR = os.getenv('AGENT_BACKEND_DIR', os.path.join(HERE, '..', 'FinAgent', 'agent_backend'))
+
+os.environ.setdefault('SHEET_CACHE_DIR', os.path.join(HERE, 'data', 'sheet_cache'))
+os.environ.setdefault('EMBEDDING_CACHE_PATH', os.path.join(HERE, 'data', 'embedding_cache.sqlite3'))
+os.environ.setdefault('QUERY_EMBEDDING_CACHE_PATH', os.path.join(HERE, 'data', 'query_embedding_cache.sqlite3'))
+if AGENT_BACKEND_DIR not in sys.path:
+    sys.path.append(AGENT_BACKEND_DIR)
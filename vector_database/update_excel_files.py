@@ -1,6 +1,8 @@
 import pandas as pd
 import os
 from typing import Tuple, Any
+import shared_modules  # noqa: F401  (puts FinAgent/agent_backend on sys.path)
+from sheet_cache import load_sheet
 
 # Configuration for companies and their Excel files
 COMPANY_CONFIGS = [
@@ -87,8 +89,15 @@ def merge_duplicate_rows(file_name: str, sheet_name: str) -> pd.DataFrame:
        - Writes the chosen values into the first occurrence.
        - Drops the remaining duplicate row(s).
     4) Resets the index and writes out to "<original>_merged.xlsx".
-    5) Returns the merged DataFrame.
+    5) Returns the merged DataFrame, or None if the sheet had no duplicates
+       (checked from the Parquet sheet cache without opening the workbook).
     """
+    # --- Check duplicates from the Parquet sheet cache; only open the workbook if needed ---
+    long = load_sheet(file_name, sheet_name)
+    if len(long) and not long.drop_duplicates('row')['label'].duplicated().any():
+        print(f"No duplicate rows in {file_name}.")
+        return None
+
     # --- Load ---
     df = pd.read_excel(file_name, sheet_name=sheet_name)
     key_col = df.columns[0]